@@ -1,7 +1,13 @@
 from matplotlib import pyplot as plt
+from matplotlib.figure import Figure
 from data.data_request import Token_Pair
-from data.market import Automted_Market_Maker
 from simulation.simulation import Simulation
+from analysis.drawdown import get_initial_drawdowns, get_gbm_drawdown_quantile
+from analysis.liquidation import get_liquidation_shortfalls
+from analysis.quantile_sketch import get_var_interval_ranks
+from helper.helper import get_thresholds
+from typing import Dict, List, Tuple
+import numpy as np
 import pandas as pd
 
 
@@ -28,7 +34,37 @@ class Analysis:
         return self._simulation
 
     # TODO: Refactor this, maybe even into a separate class for plots.
-    def plot_returns(self, data_label, title, type="hist"):
+    def plot_returns(
+        self,
+        data_label,
+        title,
+        type="hist",
+        quantiles: List[float] = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99],
+        n_sample_paths: int = 0,
+        filename: str = None,
+        seed: int = None,
+    ):
+        """Plots the returns of the token pair ("hist"), every simulated path ("line") or the quantile bands of the
+        simulated paths as fan chart ("fan").
+
+        The fan chart draws a constant number of artists, independent of the number of paths, and is rendered without
+        pyplot, so that it also works headless, e.g. in the worker processes of 'main.py'. For more than a few thousand
+        paths, "line" is slow and "fan" should be used instead.
+
+        Args:
+            data_label (str): Label of the histogram.
+            title (str): Title of the plot.
+            type (str, optional): One of "hist", "line" and "fan". Defaults to "hist".
+            quantiles (List[float], optional): Quantiles of the fan chart, symmetric pairs are filled as bands and the
+                median is drawn as line. Defaults to [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99].
+            n_sample_paths (int, optional): Number of randomly chosen paths drawn on top of the fan chart. Defaults to 0.
+            filename (str, optional): If given, the fan chart is saved to this file, the format is taken from its
+                extension, e.g. png or svg. Defaults to None.
+            seed (int, optional): Seed of the choice of the sample paths. Defaults to None.
+
+        Returns:
+            Figure: The figure of the fan chart, None for the other types.
+        """
         if type == "hist":
             plt.hist(
                 self._simulation.token_pair.returns,
@@ -43,14 +79,81 @@ class Analysis:
             plt.title(title)
 
         elif type == "line":
-            length = len(self._simulation._params["_paths"])
+            paths = self._get_path_array()
             f, subPlots = plt.subplots(sharex=True)
             plt.rcParams["figure.figsize"] = [16.0, 10.0]
-            f.suptitle("Path simulations n=" + str(length))
+            f.suptitle("Path simulations n=" + str(paths.shape[1]))
             subPlots.set_title(str(self._simulation.strategy))
 
-            for _, path in self._simulation.paths.iteritems():
-                subPlots.plot(path)
+            # a single call for all columns of the array
+            subPlots.plot(paths)
+
+        elif type == "fan":
+            return self._plot_fan_chart(title, quantiles, n_sample_paths, filename, seed)
+
+        else:
+            raise Exception(f"Unknown plot type {type}, supported types are hist, line and fan.")
+
+    def get_quantile_bands(
+        self, quantiles: List[float] = [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99]
+    ) -> pd.DataFrame:
+        """Computes the quantiles of the simulated prices across all paths at every step, in a single reduction over the array of paths.
+
+        Args:
+            quantiles (List[float], optional): Quantiles between 0 and 1. Defaults to [0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99].
+
+        Returns:
+            pd.DataFrame: One row per step and one column per quantile.
+        """
+        bands = np.quantile(self._get_path_array(), quantiles, axis=1)
+        return pd.DataFrame(bands.T, columns=quantiles).rename_axis("step")
+
+    def _plot_fan_chart(
+        self,
+        title: str,
+        quantiles: List[float],
+        n_sample_paths: int,
+        filename: str,
+        seed: int,
+    ) -> Figure:
+        paths = self._get_path_array()
+        quantiles = sorted(quantiles)
+        bands = self.get_quantile_bands(quantiles).to_numpy()
+        steps = np.arange(len(paths))
+
+        figure = Figure(figsize=(16.0, 10.0))
+        subPlots = figure.subplots()
+        figure.suptitle("Path simulations n=" + str(paths.shape[1]))
+        subPlots.set_title(title)
+
+        # the outer bands are drawn first and the inner bands on top of them
+        n_bands = len(quantiles) // 2
+        for i in range(n_bands):
+            subPlots.fill_between(
+                steps,
+                bands[:, i],
+                bands[:, -1 - i],
+                color="tab:blue",
+                alpha=0.15 + 0.5 * i / max(n_bands, 1),
+                linewidth=0,
+                label=f"{quantiles[i]:.0%} - {quantiles[-1 - i]:.0%}",
+            )
+        if len(quantiles) % 2:
+            subPlots.plot(steps, bands[:, n_bands], color="tab:blue", label=f"{quantiles[n_bands]:.0%}")
+
+        if n_sample_paths > 0:
+            columns = np.random.default_rng(seed).choice(
+                paths.shape[1], size=min(n_sample_paths, paths.shape[1]), replace=False
+            )
+            subPlots.plot(steps, paths[:, columns], color="grey", linewidth=0.5, alpha=0.5)
+
+        subPlots.set_xlabel("Step")
+        subPlots.set_ylabel("Price")
+        subPlots.legend(loc="upper left")
+
+        if filename is not None:
+            figure.savefig(filename)
+        return figure
 
     def get_simulated_var(self, alpha: float, at_step: int = None) -> float:
         """Estimates the premium multiplier for the threshold by getting the initial maxmimum drawdown of the i-th interval corrosponding to the given alpha.
@@ -63,42 +166,293 @@ class Analysis:
         Returns:
             float: Returns the threshold multiplier
         """
+        return self.get_simulated_var_multi(alpha, steps=[at_step])[at_step]
+
+    def get_simulated_var_multi(
+        self, alpha: float, steps: List[int] = [7, 14, 21]
+    ) -> Dict[int, float]:
+        """Estimates the VaR of the initial maximum drawdown for several steps at once (see 'get_simulated_var').
+        The running minimum of all paths is computed in a single sweep and the quantiles are selected without sorting the drawdowns.
+        If the simulation was streamed (see 'Simulation.simulate_streaming'), the VaR is read from its drawdown sketches instead.
+
+        Args:
+            alpha (float): Confidence interval.
+            steps (List[int], optional): Steps at which the paths are truncated. A step of None uses the whole time series. Defaults to [7, 14, 21].
+
+        Returns:
+            Dict[int, float]: The VaR for each of the given steps.
+        """
+        if self._simulation.path_array is None:
+            # the simulation was streamed and only kept the tails of the drawdowns
+            return {
+                at_step: self._simulation.drawdown_sketches[at_step].get_var(alpha)
+                for at_step in steps
+            }
+
+        return self._get_var_of_paths(self._simulation.path_array, alpha, steps)
+
+    def get_portfolio_var(
+        self, alpha: float, weights: Dict[str, float], steps: List[int] = [7, 14, 21]
+    ) -> Dict[int, float]:
+        """Estimates the VaR of the initial maximum drawdown of a portfolio of the assets of a 'Multi_Asset_Simulation'
+        for several steps at once (see 'get_simulated_var_multi'). The value of the portfolio along every path is computed
+        from the paths of all assets with a single matrix product, so that the correlation of the assets, i.e. the
+        diversification and joint crashes, is part of the VaR.
+
+        Args:
+            alpha (float): Confidence interval.
+            weights (Dict[str, float]): Initial value of the holdings of each asset by its ticker, e.g. the supply caps in units
+                of the debt. Assets without a weight are not held.
+            steps (List[int], optional): Steps at which the paths are truncated. Defaults to [7, 14, 21].
+
+        Returns:
+            Dict[int, float]: The VaR of the portfolio for each of the given steps.
+        """
+        paths = self._get_path_array()
+        if paths.ndim != 3:
+            raise Exception("The VaR of a portfolio needs the paths of a 'Multi_Asset_Simulation'.")
+        unknown = set(weights) - set(self._simulation.tickers)
+        if unknown:
+            raise Exception(f"The simulation has no paths of {', '.join(sorted(unknown))}.")
+
+        # the units of each asset that are held, so that the value of the holdings is the weight at the start
+        units = np.array([weights.get(ticker, 0) for ticker in self._simulation.tickers], dtype=float) / paths[0, 0]
+        portfolio_paths = paths @ units
+        return self._get_var_of_paths(portfolio_paths, alpha, steps)
+
+    def _get_var_of_paths(
+        self, paths: np.ndarray, alpha: float, steps: List[int]
+    ) -> Dict[int, float]:
+        for at_step in steps:
+            if at_step is not None and at_step > len(paths):
+                raise Exception("Step must be smaller or equal to the length of the path.")
+
+        initial_drawdowns = get_initial_drawdowns(paths, steps)
+
+        # The drawdowns are represented as negative percentage returns. The VaR is
+        # the n_th worst 'initial' drawdown, i.e. the element at position int(n * alpha)
+        # of the drawdowns sorted in descending order, which is the element at position
+        # n - 1 - int(n * alpha) of the drawdowns sorted in ascending order.
+        n = initial_drawdowns.shape[1]
+        kth = n - 1 - int(n * alpha)
+        initial_drawdowns.partition(kth, axis=1)
+
+        return {at_step: initial_drawdowns[i, kth] for i, at_step in enumerate(steps)}
+
+    def get_simulated_var_interval(
+        self, alpha: float, steps: List[int] = [7, 14, 21], confidence: float = 0.95
+    ) -> Dict[int, Tuple[float, float]]:
+        """Returns a distribution-free confidence interval of the simulated VaR for several steps (see 'get_simulated_var_multi'),
+        from the order statistics of the drawdowns around the VaR (see 'get_var_interval_ranks'). Its width is the precision of
+        the simulated VaR, which shrinks with the square root of the number of paths.
+
+        Args:
+            alpha (float): Confidence interval of the VaR.
+            steps (List[int], optional): Steps at which the paths are truncated. Defaults to [7, 14, 21].
+            confidence (float, optional): Confidence level of the interval. Defaults to 0.95.
+
+        Returns:
+            Dict[int, Tuple[float, float]]: The lower and upper bound of the VaR for each of the given steps.
+        """
+        if self._simulation.path_array is None:
+            return {
+                at_step: self._simulation.drawdown_sketches[at_step].get_var_interval(alpha, confidence)
+                for at_step in steps
+            }
+
+        initial_drawdowns = get_initial_drawdowns(self._get_path_array(), steps)
+        lower, upper = get_var_interval_ranks(initial_drawdowns.shape[1], alpha, confidence)
+        initial_drawdowns.partition([lower, upper], axis=1)
+        return {
+            at_step: (initial_drawdowns[i, lower], initial_drawdowns[i, upper])
+            for i, at_step in enumerate(steps)
+        }
+
+    def sweep(
+        self,
+        alphas: List[float],
+        period_grid: List[Dict[str, int]],
+        risk_adjustments: List[float] = [1],
+    ) -> pd.DataFrame:
+        """Computes the thresholds for every combination of confidence level, threshold periods and risk adjustment.
+        The drawdowns of all paths are computed once for every step that occurs in the grid and partially sorted once, so that
+        the VaR of every grid point is read from the same order statistics.
+
+        Args:
+            alphas (List[float]): Confidence intervals.
+            period_grid (List[Dict[str, int]]): Sets of threshold periods, each ordered from the longest to the shortest period
+                like the periods in the config, e.g. [{"liquidation": 21, "premium_redeem": 14, "safe_mint": 7}].
+                A set with a single period gives the threshold 1 / ((1 + VaR) / risk adjustment) of that period.
+            risk_adjustments (List[float], optional): Total risk adjustments, see 'get_total_risk_adjustment'. Defaults to [1].
+
+        Returns:
+            pd.DataFrame: One row per grid point and threshold with the columns alpha, periods (the index of the set of periods
+                in 'period_grid'), risk_adjustment, threshold, horizon, var and ratio (the threshold as collateralization ratio).
+        """
+        steps = sorted({step for periods in period_grid for step in periods.values()})
+
+        if self._simulation.path_array is None:
+            # the simulation was streamed and only kept the tails of the drawdowns
+            var = {
+                at_step: {
+                    alpha: self._simulation.drawdown_sketches[at_step].get_var(alpha)
+                    for alpha in alphas
+                }
+                for at_step in steps
+            }
+        else:
+            paths = self._simulation.path_array
+            for at_step in steps:
+                if at_step > len(paths):
+                    raise Exception("Step must be smaller or equal to the length of the path.")
+
+            initial_drawdowns = get_initial_drawdowns(paths, steps)
+            # see 'get_simulated_var_multi' for the position of the VaR in the sorted drawdowns,
+            # one partial sort puts the drawdowns at the positions of all confidence levels in place
+            n = initial_drawdowns.shape[1]
+            initial_drawdowns.partition(sorted({n - 1 - int(n * alpha) for alpha in alphas}), axis=1)
+            var = {
+                at_step: {alpha: initial_drawdowns[i, n - 1 - int(n * alpha)] for alpha in alphas}
+                for i, at_step in enumerate(steps)
+            }
+
+        rows = []
+        for alpha in alphas:
+            for i, periods in enumerate(period_grid):
+                for risk_adjustment in risk_adjustments:
+                    thresholds = get_thresholds(
+                        {key: (1 + var[step][alpha]) / risk_adjustment for key, step in periods.items()}
+                    )
+                    for key, step in periods.items():
+                        rows.append(
+                            {
+                                "alpha": alpha,
+                                "periods": i,
+                                "risk_adjustment": risk_adjustment,
+                                "threshold": key,
+                                "horizon": step,
+                                "var": var[step][alpha],
+                                "ratio": thresholds[key],
+                            }
+                        )
+        return pd.DataFrame(rows)
+
+    def get_analytical_var(
+        self, alpha: float, at_step: int = None, continuity_correction: bool = False
+    ) -> float:
+        """Computes the VaR of the initial maximum drawdown of a GBM from the closed form distribution of its running minimum,
+        without simulating any paths. The parameters are taken from the simulation (see 'Simulation.set_params') and 'at_step'
+        truncates the path in the same way as 'get_simulated_var'.
+
+        Args:
+            alpha (float): Confidence interval.
+            at_step (int, optional): If None, the whole time series is used for the estimation. If a step is given, the path is truncated up to that step. Defaults to None.
+            continuity_correction (bool, optional): If True, the paths are assumed to be observed once per step like the simulated paths,
+                otherwise continuously, which gives slightly larger and hence more conservative drawdowns. Defaults to False.
+
+        Returns:
+            float: The VaR at the given confidence level.
+        """
+        if self._simulation.strategy != "GBM":
+            raise Exception(
+                f"The analytical VaR is not available for strategy {self._simulation.strategy}."
+            )
+
+        params = self._simulation._params
+        n_points = len(range(params["total_steps"] + 1)[: -1 if at_step is None else at_step])
+        dt = params["maturity"] / params["total_steps"]
+
+        return get_gbm_drawdown_quantile(
+            alpha,
+            params["sigma"],
+            params["mu"],
+            horizon=(n_points - 1) * dt,
+            dt=dt if continuity_correction else 0,
+        )
+
+    def get_liquidation_shortfall(
+        self,
+        TVLs: List[float],
+        debts_outstanding: List[float],
+        threshold: float,
+        alphas: List[float] = [0.99],
+    ) -> pd.DataFrame:
+        """Simulates the liquidation of a vault at 'threshold' along the simulated paths for every combination of
+        TVL of the AMM and outstanding debt, see 'get_liquidation_shortfalls'.
+
+        Args:
+            TVLs (List[float]): Values of the AMM of the collateral and the debt, in units of the debt.
+            debts_outstanding (List[float]): Debts of the vault, in units of the debt.
+            threshold (float): Collateralization ratio at which the vault is liquidated, e.g. 1.1 for 110%.
+            alphas (List[float], optional): Confidence levels of the shortfall quantiles. Defaults to [0.99].
+
+        Returns:
+            pd.DataFrame: One row per TVL and debt with the mean shortfall, the probability of a shortfall and the
+                quantile of the shortfall for each alpha (as 'quantile_{alpha}'), all as share of the debt.
+        """
+        paths = self._get_path_array()
+        rows = []
+        for TVL in TVLs:
+            for debt_outstanding in debts_outstanding:
+                shortfalls = get_liquidation_shortfalls(paths, TVL, debt_outstanding, threshold)
+                row = {
+                    "TVL": TVL,
+                    "debt_outstanding": debt_outstanding,
+                    "mean": shortfalls.mean(),
+                    "probability": np.count_nonzero(shortfalls) / len(shortfalls),
+                }
+                for alpha, quantile in zip(alphas, np.quantile(shortfalls, alphas)):
+                    row[f"quantile_{alpha}"] = quantile
+                rows.append(row)
+        return pd.DataFrame(rows)
 
-        at_step = -1 if at_step is None else at_step
-
-        if at_step > len(self._simulation.paths[0]):
-            raise Exception("Step must be smaller or equal to the length of the path.")
-
-        initial_drawdowns = []
-        for _, path in self._simulation.paths.items():
-            initial_drawdowns.append(get_initial_drawdown(path[:at_step]))
-
-        # These drawdowns are being represented as negative percentage returns
-        # Sorting this in reverse order (descending) mean that the 99th percentile
-        # is the 99th percent lowest return
-        initial_drawdowns.sort(reverse=True)
-
-        # This is the value at risk (VaR) at a given confidence interval (=alpha)
-        # In this case, the VaR is represented as a negative number as it is the
-        # n_th worst 'initial' drawdown of the simulation
-        return initial_drawdowns[int(len(initial_drawdowns) * alpha)]
-
-    def get_liquidation_threshold(self, TVL: int, debt_outstanding: int):
-        """Experimental WIP"""
-        # It's assumed that the start of the strajectory is the unknown threshold x that has been reached at day 0.
-        # From now on, arbitrageurs will buy iBTC and burn it in exchange for collateral.
-        for _, path in self._simulation.paths.iteritems():
-            for _, value in path.iteritems():
-
-                # would be better to calculate the price change from yesterday to today and pass this as the exact slippage parameter for a swap
-                # to align the AMM back to market prices instead of instantiating it new everytime which is also imprecise I think.
-                amm = Automted_Market_Maker(
-                    self.simulation.token_pair.base_token,
-                    self.simulation.token_pair.quote_token,
-                    base_token_amount=TVL / 2 / value,
-                    quote_token_amount=TVL / 2,
-                )
-
-                """
-                
-                """
+    def get_liquidation_threshold(
+        self,
+        TVL: float,
+        debt_outstanding: float,
+        alpha: float = 0.99,
+        max_shortfall: float = 0.0,
+    ) -> float:
+        """Finds the lowest liquidation threshold for which the shortfall of the liquidation along the simulated paths
+        does not exceed 'max_shortfall' with a probability of 'alpha', see 'get_liquidation_shortfalls'.
+        It's assumed that the start of the paths is the unknown threshold x that has been reached at day 0.
+        From then on, arbitrageurs will buy the debt (e.g. iBTC) and burn it in exchange for collateral.
+
+        Args:
+            TVL (float): Value of the AMM of the collateral and the debt, in units of the debt.
+            debt_outstanding (float): Debt of the vault, in units of the debt.
+            alpha (float, optional): Confidence level. Defaults to 0.99.
+            max_shortfall (float, optional): Share of the debt that may remain uncovered. Defaults to 0.0.
+
+        Returns:
+            float: The liquidation threshold as collateralization ratio, e.g. 1.1 for 110%.
+        """
+        paths = self._get_path_array()
+
+        def shortfall(threshold: float) -> float:
+            return np.quantile(
+                get_liquidation_shortfalls(paths, TVL, debt_outstanding, threshold), alpha
+            )
+
+        # the shortfall decreases with the threshold, so the threshold is found by bisection
+        lower, upper = 1.0, 2.0
+        while shortfall(upper) > max_shortfall:
+            lower, upper = upper, upper * 2
+            if upper > 1_000:
+                raise Exception("The debt can't be liquidated for any threshold, the AMM has too little liquidity.")
+        for _ in range(50):
+            middle = (lower + upper) / 2
+            if shortfall(middle) > max_shortfall:
+                lower = middle
+            else:
+                upper = middle
+            if upper - lower < 1e-6:
+                break
+        return upper
+
+    def _get_path_array(self) -> np.ndarray:
+        if getattr(self._simulation, "path_array", None) is None:
+            raise Exception(
+                "The simulation has no paths, e.g. because it was streamed. Use 'Simulation.simulate' instead."
+            )
+        return self._simulation.path_array
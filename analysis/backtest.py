@@ -0,0 +1,198 @@
+from data.data_request import Token_Pair
+from analysis.drawdown import get_gbm_drawdown_quantile
+from analysis.historical_var import Historical_VaR
+from helper.helper import round_up_to_nearest_5, get_thresholds
+from collections import deque
+from datetime import datetime
+from typing import Dict
+import bisect
+import math
+import pandas as pd
+
+
+class Rolling_Moments:
+    """Mean and standard deviation of the last 'window' values, updated in O(1) per value with Welford's algorithm.
+    Once the window is full, every new value replaces the oldest one in the running mean and sum of squared deviations.
+    """
+
+    def __init__(self, window: int):
+        """Initializing the empty window.
+
+        Args:
+            window (int): Number of values in the window.
+        """
+        self._window = window
+        self._values = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self._values)
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1) like 'pd.DataFrame.std'."""
+        if self.count < 2:
+            return float("nan")
+        return math.sqrt(max(self._m2, 0.0) / (self.count - 1))
+
+    def add(self, value: float) -> None:
+        self._values.append(value)
+        if len(self._values) <= self._window:
+            delta = value - self._mean
+            self._mean += delta / len(self._values)
+            self._m2 += delta * (value - self._mean)
+            return
+
+        oldest = self._values.popleft()
+        mean = self._mean
+        self._mean += (value - oldest) / self._window
+        self._m2 += (value - oldest) * (value - self._mean + oldest - mean)
+
+
+class Rolling_Order_Statistics:
+    """The last 'window' values in sorted order, so that every quantile can be read in O(1).
+    A new value is inserted and the oldest value removed by bisection."""
+
+    def __init__(self, window: int):
+        """Initializing the empty window.
+
+        Args:
+            window (int): Number of values in the window.
+        """
+        self._window = window
+        self._values = deque()
+        self._sorted = []
+
+    @property
+    def count(self) -> int:
+        return len(self._values)
+
+    def add(self, value: float) -> None:
+        self._values.append(value)
+        bisect.insort(self._sorted, value)
+        if len(self._values) > self._window:
+            del self._sorted[bisect.bisect_left(self._sorted, self._values.popleft())]
+
+    def get_var(self, alpha: float) -> float:
+        """Returns the VaR of the values in the window with the same convention as 'Historical_VaR.get_var'.
+
+        Args:
+            alpha (float): Confidence interval.
+
+        Returns:
+            float: The element at position int(n * alpha) of the values sorted in descending order.
+        """
+        n = len(self._sorted)
+        return self._sorted[n - 1 - int(n * alpha)]
+
+
+class Backtest:
+    """Walks the price history of a token pair day by day and computes the thresholds that would have been
+    suggested on each day, from the prices of the sample period before that day.
+
+    The standard deviation of the returns and the historical quantiles of each threshold period are updated
+    incrementally with every new price instead of being recomputed over the whole sample period.
+    """
+
+    def __init__(
+        self,
+        token_pair: Token_Pair,
+        alpha: float,
+        periods: Dict[str, int],
+        sample_period: int = 365,
+        historical_mode: str = "return",
+        total_risk_adjustment: float = 1,
+    ):
+        """Initializing the backtest.
+
+        Args:
+            token_pair (Token_Pair): Token pair with the price history.
+            alpha (float): Confidence interval.
+            periods (Dict[str, int]): Period of each threshold in days, ordered from the longest to the shortest period.
+            sample_period (int, optional): Number of days before each day from which the VaR is estimated. Defaults to 365.
+            historical_mode (str, optional): Mode of the historical VaR, see 'Historical_VaR'. Defaults to "return".
+            total_risk_adjustment (float, optional): Multiplier of the thresholds, see 'get_total_risk_adjustment'. Defaults to 1.
+        """
+        self._token_pair = token_pair
+        self._alpha = alpha
+        self._periods = periods
+        self._sample_period = sample_period
+        self._historical_mode = historical_mode
+        self._total_risk_adjustment = total_risk_adjustment
+
+    @property
+    def token_pair(self) -> Token_Pair:
+        return self._token_pair
+
+    def run(self, start_date: str = None) -> pd.DataFrame:
+        """Computes the thresholds of every day with a full sample period before it.
+
+        Args:
+            start_date (str, optional): First day of the backtest as string in the format '%Y-%m-%d'.
+                If None, the backtest starts at the first day with a full sample period. Defaults to None.
+
+        Returns:
+            pd.DataFrame: One row per day with the standard deviation of the returns and, for each threshold, the
+                thresholds based on the analytical and historical VaR and the suggested threshold in percent.
+        """
+        prices = self._token_pair.prices["Price"].to_numpy(dtype=float)
+        dates = self._token_pair.prices.index
+        start = dates[0] if start_date is None else datetime.strptime(start_date, "%Y-%m-%d")
+        sample_bars = self._token_pair.get_bars(self._sample_period)
+        return_bars = self._token_pair.get_bars(1)
+
+        # the returns and the values of each window are computed vectorized, only their statistics are rolled
+        returns = prices[return_bars:] / prices[:-return_bars] - 1
+        moments = Rolling_Moments(sample_bars - return_bars + 1)
+
+        historical_var = Historical_VaR(self._token_pair, self._historical_mode)
+        window_bars = {key: historical_var.get_window_bars(period) for key, period in self._periods.items()}
+        window_values = {key: historical_var.get_window_values(period) for key, period in self._periods.items()}
+        order_statistics = {
+            key: Rolling_Order_Statistics(sample_bars - bars + 1) for key, bars in window_bars.items()
+        }
+
+        rows = []
+        for t in range(return_bars, len(prices)):
+            moments.add(returns[t - return_bars])
+            for key, bars in window_bars.items():
+                if t >= bars:
+                    order_statistics[key].add(window_values[key][t - bars])
+
+            if t < sample_bars or dates[t] < start:
+                continue
+
+            sigma = moments.std
+            var = {}
+            for key, period in self._periods.items():
+                # the analytical VaR of a path truncated at the step of the period, like 'Analysis.get_analytical_var'
+                # for a simulation with one step per day
+                analytical_var = get_gbm_drawdown_quantile(self._alpha, sigma, 0, horizon=period - 1)
+                var[key] = {
+                    "analytical": (1 + analytical_var) / self._total_risk_adjustment,
+                    "historical": (1 + order_statistics[key].get_var(self._alpha))
+                    / self._total_risk_adjustment,
+                }
+
+            thresholds = {
+                method: get_thresholds({key: value[method] for key, value in var.items()})
+                for method in ["analytical", "historical"]
+            }
+            row = {"Date": dates[t], "sigma": sigma}
+            for key in self._periods.keys():
+                row[f"{key}_analytical"] = thresholds["analytical"][key]
+                row[f"{key}_historical"] = thresholds["historical"][key]
+                row[key] = round_up_to_nearest_5(
+                    max(thresholds["analytical"][key], thresholds["historical"][key]) * 100
+                )
+            rows.append(row)
+
+        if not rows:
+            return pd.DataFrame(columns=["sigma"], index=pd.DatetimeIndex([], name="Date"))
+        return pd.DataFrame(rows).set_index("Date")
@@ -0,0 +1,75 @@
+from simulation.simulation import Simulation
+from analysis.analysis import Analysis
+from typing import List
+import numpy as np
+import pandas as pd
+
+
+def get_convergence_report(
+    simulation: Simulation,
+    alpha: float,
+    at_steps: List[int],
+    path_counts: List[int],
+    samplings: List[str] = ["pseudo", "antithetic", "sobol"],
+    n_repeats: int = 20,
+    seed: int = None,
+    **simulation_params,
+) -> pd.DataFrame:
+    """Estimates the standard error of the simulated VaR for different sampling modes and numbers of paths.
+    Every combination is simulated 'n_repeats' times with independent random streams and the standard error is the
+    standard deviation of the VaR across those repetitions.
+
+    Args:
+        simulation (Simulation): Simulation of which the token pair and strategy are used.
+        alpha (float): Confidence interval.
+        at_steps (List[int]): Steps at which the VaR is estimated.
+        path_counts (List[int]): Numbers of paths to compare.
+        samplings (List[str], optional): Sampling modes to compare. Defaults to ["pseudo", "antithetic", "sobol"].
+        n_repeats (int, optional): Number of repetitions of every simulation. Defaults to 20.
+        seed (int, optional): Seed from which the random streams of all repetitions are spawned. Defaults to None.
+        **simulation_params: Parameters passed to 'Simulation.simulate_streaming', e.g. steps, maturity, sigma, mu and initial_value.
+
+    Returns:
+        pd.DataFrame: One row per sampling, number of paths and step with the mean VaR, its standard error and the efficiency
+            of the sampling compared to "pseudo", i.e. how many times more pseudo-random paths are needed for the same standard error.
+    """
+    seeds = iter(
+        np.random.SeedSequence(seed).spawn(len(samplings) * len(path_counts) * n_repeats)
+    )
+
+    rows = []
+    for sampling in samplings:
+        for n_simulations in path_counts:
+            var = {at_step: [] for at_step in at_steps}
+            for _ in range(n_repeats):
+                sim = Simulation(simulation.token_pair, simulation.strategy)
+                sim.simulate_streaming(
+                    at_steps=at_steps,
+                    alpha=alpha,
+                    n_simulations=n_simulations,
+                    seed=next(seeds),
+                    sampling=sampling,
+                    **simulation_params,
+                )
+                for at_step, value in Analysis(sim).get_simulated_var_multi(alpha, at_steps).items():
+                    var[at_step].append(value)
+
+            for at_step, values in var.items():
+                rows.append(
+                    {
+                        "sampling": sampling,
+                        "n_simulations": n_simulations,
+                        "at_step": at_step,
+                        "var": np.mean(values),
+                        "standard_error": np.std(values, ddof=1),
+                    }
+                )
+
+    report = pd.DataFrame(rows)
+    if "pseudo" in samplings:
+        pseudo = report[report["sampling"] == "pseudo"].set_index(["n_simulations", "at_step"])
+        pseudo_error = pseudo.loc[
+            list(zip(report["n_simulations"], report["at_step"])), "standard_error"
+        ].to_numpy()
+        report["efficiency"] = (pseudo_error / report["standard_error"]) ** 2
+    return report
@@ -0,0 +1,99 @@
+from data.price_matrix import Price_Matrix
+from typing import Dict
+import numpy as np
+import pandas as pd
+import os
+import yaml
+
+
+def get_depeg_statistics(
+    price_matrix: Price_Matrix, pegs: Dict[str, str], tolerance: float = 0.01
+) -> pd.DataFrame:
+    """Computes the depeg statistics of tokens against the tokens they are pegged to (their proxies) for all pairs at once,
+    on a single array of the prices of each token in units of its proxy.
+
+    Args:
+        price_matrix (Price_Matrix): USD prices of the tokens and their proxies.
+        pegs (Dict[str, str]): Ticker of the proxy of each token, e.g. {"vdot": "dot"}.
+        tolerance (float, optional): A token is depegged while its price is more than 'tolerance' below its price at the
+            start of the sample. Defaults to 0.01.
+
+    Returns:
+        pd.DataFrame: One row per token with its proxy and
+            - max_depeg: the lowest price relative to the price at the start of the sample, minus 1 (negative)
+            - max_drawdown: the largest drop from a previous high, as negative percentage return
+            - depeg_days: the number of days on which the token was depegged
+            - longest_depeg_days: the longest number of consecutive days on which the token was depegged
+    """
+    tickers = list(pegs.keys())
+    prices = price_matrix.prices
+    ratios = prices[tickers].to_numpy(dtype=float) / prices[list(pegs.values())].to_numpy(dtype=float)
+
+    # every pair starts on the first day on which both prices are available
+    valid = ~np.isnan(ratios)
+    has_prices = valid.any(axis=0)
+    first = np.argmax(valid, axis=0)
+    relative = ratios / ratios[first, np.arange(len(tickers))] - 1
+
+    with np.errstate(invalid="ignore"):
+        running_max = np.fmax.accumulate(ratios, axis=0)
+        max_drawdown = np.nanmin(np.where(valid, ratios / running_max - 1, np.nan), axis=0, initial=0)
+        depegged = relative < -tolerance
+
+    # length of the current depeg on each bar: the bars since the last bar on which the token was not depegged
+    bars = np.arange(len(ratios))[:, None]
+    last_pegged = np.maximum.accumulate(np.where(depegged, -1, bars), axis=0)
+    bars_per_day = pd.Timedelta(1, "D") / (prices.index[1] - prices.index[0]) if len(prices) > 1 else 1
+
+    statistics = pd.DataFrame(
+        {
+            "proxy": list(pegs.values()),
+            "max_depeg": np.nanmin(np.where(valid, relative, np.nan), axis=0, initial=0),
+            "max_drawdown": max_drawdown,
+            "depeg_days": depegged.sum(axis=0) / bars_per_day,
+            "longest_depeg_days": (bars - last_pegged).max(axis=0, initial=0) / bars_per_day,
+        },
+        index=pd.Index(tickers, name="ticker"),
+    )
+    return statistics[has_prices]
+
+
+def write_depeg_adjustments(
+    statistics: pd.DataFrame, network: str, filename: str
+) -> Dict[str, float]:
+    """Writes the maximum depeg of each token as its depeg adjustment into a yaml file, which is read by
+    'load_depeg_adjustments'. The adjustments of other networks in the file are kept.
+
+    Args:
+        statistics (pd.DataFrame): Depeg statistics, see 'get_depeg_statistics'.
+        network (str): Network of the tokens, e.g. polkadot.
+        filename (str): The yaml file.
+
+    Returns:
+        Dict[str, float]: The depeg adjustment of each token, as positive decimal.
+    """
+    adjustments = load_depeg_adjustments(filename)
+    adjustments[network] = {
+        ticker: round(float(-max_depeg), 3)
+        for ticker, max_depeg in statistics["max_depeg"].items()
+    }
+    tmp_filename = f"{filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, "w") as f:
+        yaml.dump(adjustments, f)
+    os.replace(tmp_filename, filename)
+    return adjustments[network]
+
+
+def load_depeg_adjustments(filename: str) -> Dict[str, Dict[str, float]]:
+    """Loads the depeg adjustments written by 'write_depeg_adjustments'.
+
+    Args:
+        filename (str): The yaml file.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The depeg adjustment of each token by network, empty if the file doesn't exist.
+    """
+    if not os.path.exists(filename):
+        return {}
+    with open(filename) as f:
+        return yaml.load(f, Loader=yaml.FullLoader) or {}
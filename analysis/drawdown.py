@@ -0,0 +1,127 @@
+from typing import List
+import numpy as np
+import math
+
+
+def get_initial_drawdowns(paths: np.ndarray, at_steps: List[int]) -> np.ndarray:
+    """Computes the maximum drawdown from the first data point of every path for several steps at once.
+    The result for each step is the same as calling 'get_initial_drawdown' on every path truncated with 'path[:at_step]'.
+
+    Args:
+        paths (np.ndarray): Array with the shape (steps + 1, n_simulations) where each column is one path.
+        at_steps (List[int]): Steps at which the paths are truncated. A step of None uses the whole path except for the last step,
+            like 'Analysis.get_simulated_var'.
+
+    Returns:
+        np.ndarray: Array with the shape (len(at_steps), n_simulations) containing the initial drawdowns of each path per step.
+    """
+    # index of the last row that is included when truncating a path with path[:at_step]
+    rows = [
+        len(range(len(paths))[: -1 if at_step is None else at_step]) - 1
+        for at_step in at_steps
+    ]
+
+    # a single sweep over the rows keeps the running minimum of all paths
+    running_min = paths[0].copy()
+    initial_drawdowns = np.empty((len(rows), paths.shape[1]))
+    for row in range(max(rows) + 1):
+        np.minimum(running_min, paths[row], out=running_min)
+        for i, _row in enumerate(rows):
+            if _row == row:
+                initial_drawdowns[i] = running_min
+
+    initial_drawdowns /= paths[0]
+    initial_drawdowns -= 1
+    return initial_drawdowns
+
+
+def sliding_window_min(values: np.ndarray, window: int) -> np.ndarray:
+    """Computes the minimum of every window of 'window' consecutive values in O(n), independent of the window size,
+    with the algorithm of van Herk and Gil & Werman: the values are split into blocks of the window size, and the
+    minimum of a window is the minimum of the suffix of the block it starts in and the prefix of the block it ends in.
+
+    Args:
+        values (np.ndarray): One dimensional array of values.
+        window (int): Number of values in a window.
+
+    Returns:
+        np.ndarray: Array with the length len(values) - window + 1, where the i-th element is the minimum of values[i:i + window].
+    """
+    n = len(values)
+    if window < 1 or window > n:
+        raise Exception("Window must be between 1 and the number of values.")
+
+    n_blocks = -(-n // window)
+    blocks = np.full(n_blocks * window, np.inf)
+    blocks[:n] = values
+    blocks = blocks.reshape(n_blocks, window)
+
+    prefix_min = np.minimum.accumulate(blocks, axis=1).ravel()
+    suffix_min = np.minimum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    return np.minimum(suffix_min[: n - window + 1], prefix_min[window - 1 : n])
+
+
+def get_gbm_drawdown_probability(
+    drawdown: float, sigma: float, mu: float, horizon: float, dt: float = 0
+) -> float:
+    """Computes the probability that a geometric brownian motion falls to (1 + drawdown) times its initial value
+    or lower within the horizon, using the closed form distribution of the running minimum (reflection principle).
+
+    If the path is only observed every 'dt', the barrier is shifted with the continuity correction of Broadie, Glasserman & Kou
+    to approximate the running minimum of the discrete observations.
+
+    Args:
+        drawdown (float): The drawdown as a negative percentage return.
+        sigma (float): The standard deviation of the process per time unit.
+        mu (float): The drift of the process per time unit.
+        horizon (float): The length of the path in time units.
+        dt (float, optional): Time between two observations. If 0, the path is observed continuously. Defaults to 0.
+
+    Returns:
+        float: The probability that the initial drawdown is smaller or equal to 'drawdown'.
+    """
+    if horizon <= 0:
+        return 0.0
+
+    # the log of the price is a brownian motion with drift nu
+    nu = mu - sigma**2 / 2
+    barrier = math.log1p(drawdown) - 0.5826 * sigma * np.sqrt(dt)
+    if barrier >= 0:
+        return 1.0
+
+    def cdf(x: float) -> float:
+        return 0.5 * math.erfc(-x / math.sqrt(2))
+
+    std = sigma * math.sqrt(horizon)
+    return cdf((barrier - nu * horizon) / std) + math.exp(
+        2 * nu * barrier / sigma**2
+    ) * cdf((barrier + nu * horizon) / std)
+
+
+def get_gbm_drawdown_quantile(
+    alpha: float, sigma: float, mu: float, horizon: float, dt: float = 0
+) -> float:
+    """Solves for the initial drawdown of a geometric brownian motion that is not exceeded with a probability of 'alpha'
+    (see 'get_gbm_drawdown_probability').
+
+    Args:
+        alpha (float): Confidence interval.
+        sigma (float): The standard deviation of the process per time unit.
+        mu (float): The drift of the process per time unit.
+        horizon (float): The length of the path in time units.
+        dt (float, optional): Time between two observations. If 0, the path is observed continuously. Defaults to 0.
+
+    Returns:
+        float: The drawdown at the confidence level as a negative percentage return.
+    """
+    # bisection over the log of the barrier, which is bounded by a few standard deviations of the terminal value
+    lower, upper = (mu - sigma**2 / 2) * horizon - 10 * sigma * math.sqrt(horizon), 0.0
+    for _ in range(100):
+        middle = (lower + upper) / 2
+        if get_gbm_drawdown_probability(math.expm1(middle), sigma, mu, horizon, dt) > 1 - alpha:
+            upper = middle
+        else:
+            lower = middle
+        if upper - lower < 1e-12:
+            break
+    return math.expm1((lower + upper) / 2)
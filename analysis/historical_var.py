@@ -0,0 +1,146 @@
+from data.data_request import Token_Pair
+from analysis.drawdown import sliding_window_min
+from typing import Dict, List
+import numpy as np
+import pandas as pd
+
+
+class Historical_VaR:
+    """Historical VaR of the returns of a token pair over several horizons.
+
+    The returns of every horizon are computed from a single array of prices, with a view of the prices at the
+    start and at the end of each window, and all confidence levels of a horizon are selected with one partial sort.
+
+    In the mode "drawdown", the return of a window is the worst drawdown from the start of the window instead of the
+    return at its end, which is what the simulated and analytical VaR measure along each path. Its windows cover the
+    same days as a path that is truncated at the step of the horizon (see 'Analysis.get_simulated_var'), i.e. the
+    'horizon' daily prices from the start of the window, which span one day less than the windows of the returns.
+    """
+
+    def __init__(self, token_pair: Token_Pair, mode: str = "return"):
+        """Initializing the historical VaR.
+
+        Args:
+            token_pair (Token_Pair): Token pair with prices, the horizons are converted to bars of its granularity.
+            mode (str, optional): "return" for the return at the end of each window or "drawdown" for the worst
+                drawdown from the start of each window. Defaults to "return".
+        """
+        if mode not in ["return", "drawdown"]:
+            raise Exception(f"Unknown mode {mode}, supported modes are return and drawdown.")
+        self._token_pair = token_pair
+        self._mode = mode
+        self._prices = token_pair.prices["Price"].to_numpy(dtype=float)
+
+    @property
+    def token_pair(self) -> Token_Pair:
+        return self._token_pair
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def get_window_returns(self, horizon: int) -> np.ndarray:
+        """Returns the returns of all overlapping windows of 'horizon' days, like 'pct_change(horizon)' of the prices.
+
+        Args:
+            horizon (int): Length of the windows in days.
+
+        Returns:
+            np.ndarray: The returns in the order of the end of their windows.
+        """
+        bars = self._token_pair.get_bars(horizon)
+        returns = self._prices[bars:] / self._prices[:-bars] - 1
+        return returns[~np.isnan(returns)]
+
+    def get_window_bars(self, horizon: int) -> int:
+        """Returns the number of bars between the first and the last price of a window of 'horizon' days, depending on the mode.
+
+        Args:
+            horizon (int): Length of the windows in days.
+
+        Returns:
+            int: Number of bars.
+        """
+        if self._mode == "drawdown":
+            # like the prices of a simulated path of one step per day truncated with path[:horizon]
+            return self._token_pair.get_bars(horizon) - self._token_pair.get_bars(1)
+        return self._token_pair.get_bars(horizon)
+
+    def get_window_drawdowns(self, horizon: int) -> np.ndarray:
+        """Returns the worst drawdown from the start of all overlapping windows of 'horizon' days, i.e. the
+        initial drawdown (see 'get_initial_drawdown') of the prices of each window. A window has the same
+        'horizon' daily prices as a simulated path truncated at the step 'horizon' (see 'get_window_bars').
+
+        Args:
+            horizon (int): Length of the windows in days.
+
+        Returns:
+            np.ndarray: The drawdowns in the order of the start of their windows.
+        """
+        bars = self._token_pair.get_bars(horizon) - self._token_pair.get_bars(1)
+        if bars >= len(self._prices):
+            return np.empty(0)
+        drawdowns = sliding_window_min(self._prices, bars + 1) / self._prices[: len(self._prices) - bars] - 1
+        return drawdowns[~np.isnan(drawdowns)]
+
+    def get_window_values(self, horizon: int) -> np.ndarray:
+        """Returns the returns or drawdowns of all windows of 'horizon' days, depending on the mode."""
+        if self._mode == "drawdown":
+            return self.get_window_drawdowns(horizon)
+        return self.get_window_returns(horizon)
+
+    def get_var(self, alpha: float, horizon: int) -> float:
+        """Returns the historical VaR over 'horizon' days at the confidence level 'alpha'.
+
+        Args:
+            alpha (float): Confidence interval.
+            horizon (int): Length of the windows in days.
+
+        Returns:
+            float: The VaR as return, e.g. -0.2 for a loss of 20%.
+        """
+        return self.get_var_multi([alpha], [horizon])[horizon][alpha]
+
+    def get_var_multi(
+        self, alphas: List[float], horizons: List[int]
+    ) -> Dict[int, Dict[float, float]]:
+        """Returns the historical VaR of every combination of confidence level and horizon.
+
+        Args:
+            alphas (List[float]): Confidence intervals.
+            horizons (List[int]): Lengths of the windows in days.
+
+        Returns:
+            Dict[int, Dict[float, float]]: The VaR by confidence level for each horizon.
+        """
+        var = {}
+        for horizon in horizons:
+            returns = self.get_window_values(horizon)
+            n = len(returns)
+            if n == 0:
+                raise Exception(f"Not enough prices for a window of {horizon} days.")
+
+            # The VaR is the element at position int(n * alpha) of the returns sorted in descending
+            # order, which is the element at position n - 1 - int(n * alpha) in ascending order.
+            kths = {alpha: n - 1 - int(n * alpha) for alpha in alphas}
+            returns.partition(sorted(set(kths.values())))
+            var[horizon] = {alpha: returns[kth] for alpha, kth in kths.items()}
+        return var
+
+    def get_var_table(self, alphas: List[float], horizons: List[int]) -> pd.DataFrame:
+        """Returns the historical VaR of every combination of confidence level and horizon as a table.
+
+        Args:
+            alphas (List[float]): Confidence intervals.
+            horizons (List[int]): Lengths of the windows in days.
+
+        Returns:
+            pd.DataFrame: One row per horizon and confidence level with the columns horizon, alpha and var.
+        """
+        return pd.DataFrame(
+            [
+                {"horizon": horizon, "alpha": alpha, "var": value}
+                for horizon, var in self.get_var_multi(alphas, horizons).items()
+                for alpha, value in var.items()
+            ]
+        )
@@ -0,0 +1,46 @@
+import numpy as np
+
+
+def get_liquidation_shortfalls(
+    paths: np.ndarray, TVL: float, debt_outstanding: float, threshold: float
+) -> np.ndarray:
+    """Simulates the liquidation of a vault along every path at once and returns the share of the debt that
+    could not be covered by the seized collateral.
+
+    At step 0, the collateralization ratio of the vault reaches 'threshold' and its collateral is seized. On each of the
+    following steps, arbitrageurs first move the price of a constant product AMM of the collateral (base) and the debt
+    (quote) to the price of the path. Then an equal share of the debt is burned and the same share of the seized collateral
+    is sold to the AMM (exact input swap), which pays q * c / (b + c) debt for c collateral. The part of the debt that is
+    not covered by what the AMM pays for the collateral is the shortfall. The reserves of all paths are arrays, so that
+    each step is a single vectorized update.
+
+    Args:
+        paths (np.ndarray): Array with the shape (steps + 1, n_simulations) with the price of the collateral in units of the debt.
+        TVL (float): Value of the AMM at the price of step 0, in units of the debt.
+        debt_outstanding (float): Debt of the vault, which is bought back in equal parts over all steps.
+        threshold (float): Collateralization ratio at which the vault is liquidated, e.g. 1.1 for 110%.
+
+    Returns:
+        np.ndarray: The shortfall of each path as share of the debt, between 0 and 1.
+    """
+    n_steps = len(paths) - 1
+    if n_steps < 1:
+        raise Exception("Paths must have at least one step after the liquidation.")
+
+    # constant product of the AMM, arbitrage and swaps don't change it (no fees)
+    invariant = (TVL / 2) ** 2 / paths[0]
+    debt_per_step = debt_outstanding / n_steps
+    # the share of the seized collateral received for each part of the debt, in units of the collateral
+    collateral_per_step = threshold * debt_per_step / paths[0]
+
+    shortfalls = np.zeros(paths.shape[1])
+    for price in paths[1:]:
+        # arbitrage moves the reserves to the price of the path
+        base_reserves = np.sqrt(invariant / price)
+        quote_reserves = np.sqrt(invariant * price)
+
+        # debt paid by the AMM for the collateral of this step
+        debt_out = quote_reserves * collateral_per_step / (base_reserves + collateral_per_step)
+        shortfalls += np.maximum(0, 1 - debt_out / debt_per_step)
+
+    return shortfalls / n_steps
@@ -0,0 +1,166 @@
+from statistics import NormalDist
+from typing import Tuple
+import math
+import numpy as np
+
+
+def get_var_interval_ranks(n_values: int, alpha: float, confidence: float = 0.95) -> Tuple[int, int]:
+    """Returns the ranks of the order statistics that bound a distribution-free confidence interval of the VaR at 'alpha'.
+    The number of values below the quantile is binomially distributed, so the ranks are the rank of the VaR (see
+    'Quantile_Sketch.get_var') plus and minus the normal quantile of 'confidence' times the standard deviation of that count.
+
+    Args:
+        n_values (int): Number of values.
+        alpha (float): Confidence interval of the VaR.
+        confidence (float, optional): Confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        Tuple[int, int]: The ranks of the lower and upper bound in the values sorted in ascending order.
+    """
+    kth = n_values - 1 - int(n_values * alpha)
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(n_values * alpha * (1 - alpha))
+    return max(0, math.floor(kth - half_width)), min(n_values - 1, math.ceil(kth + half_width))
+
+
+class Quantile_Sketch:
+    """Mergeable sketch that keeps the exact lower tail of a stream of values.
+
+    Only the 'capacity' smallest values are kept, so the memory of the sketch does not depend on the
+    number of values added, but only on the size of the tail that needs to be read.
+    Quantiles in the tail are exact, i.e. the same as sorting all values that have been added.
+    """
+
+    def __init__(self, capacity: int):
+        """Initializing the sketch.
+
+        Args:
+            capacity (int): Number of the smallest values to keep.
+        """
+        self._capacity = capacity
+        self._tail = np.empty(0)
+        self._count = 0
+
+    @classmethod
+    def for_alpha(
+        cls, alpha: float, n_values: int, confidence: float = None
+    ) -> "Quantile_Sketch":
+        """Creates a sketch that is large enough to read the VaR at the confidence level 'alpha'
+        after 'n_values' have been added.
+
+        Args:
+            alpha (float): Lowest confidence level that should be readable from the sketch.
+            n_values (int): Total number of values that will be added to the sketch, or to all sketches
+                that will be merged with each other.
+            confidence (float, optional): If given, the sketch is also large enough to read the confidence interval
+                of the VaR at this level (see 'get_var_interval') after any number of values up to 'n_values'. Defaults to None.
+
+        Returns:
+            Quantile_Sketch: The empty sketch.
+        """
+        if confidence is not None:
+            return cls(get_var_interval_ranks(n_values, alpha, confidence)[1] + 1)
+        return cls(n_values - int(n_values * alpha))
+
+    @classmethod
+    def from_tail(cls, capacity: int, tail: np.ndarray, count: int) -> "Quantile_Sketch":
+        """Restores a sketch from its tail and the number of values that have been added, e.g. from a 'Simulation_Cache'.
+
+        Args:
+            capacity (int): Number of the smallest values to keep.
+            tail (np.ndarray): The smallest values that have been added.
+            count (int): Number of values that have been added.
+
+        Returns:
+            Quantile_Sketch: The sketch.
+        """
+        sketch = cls(capacity)
+        sketch._tail = tail
+        sketch._count = count
+        return sketch
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def tail(self) -> np.ndarray:
+        return self._tail
+
+    def _keep_smallest(self, values: np.ndarray) -> np.ndarray:
+        if len(values) <= self._capacity:
+            return values
+        return np.partition(values, self._capacity - 1)[: self._capacity]
+
+    def add(self, values: np.ndarray) -> None:
+        """Adds a chunk of values to the sketch. The chunk itself is not referenced by the sketch.
+
+        Args:
+            values (np.ndarray): One dimensional array of values.
+        """
+        self._tail = self._keep_smallest(
+            np.concatenate([self._tail, self._keep_smallest(values)])
+        )
+        self._count += len(values)
+
+    def merge(self, other: "Quantile_Sketch") -> "Quantile_Sketch":
+        """Merges two sketches, e.g. sketches that have been filled by different workers.
+        The tail of the merged sketch is exact up to the smaller capacity of both sketches.
+
+        Args:
+            other (Quantile_Sketch): The sketch to merge with.
+
+        Returns:
+            Quantile_Sketch: A new sketch containing the values of both sketches.
+        """
+        merged = Quantile_Sketch(min(self._capacity, other.capacity))
+        merged._tail = merged._keep_smallest(np.concatenate([self._tail, other.tail]))
+        merged._count = self._count + other.count
+        return merged
+
+    def get_var(self, alpha: float) -> float:
+        """Returns the value at position int(n * alpha) of all added values sorted in descending order,
+        which is the same convention that is used by 'Analysis.get_simulated_var'.
+
+        Args:
+            alpha (float): Confidence interval.
+
+        Raises:
+            Exception: Raises an error if the tail of the sketch is too small for the given alpha.
+
+        Returns:
+            float: The VaR at the given confidence level.
+        """
+        kth = self._count - 1 - int(self._count * alpha)
+        if not 0 <= kth < len(self._tail):
+            raise Exception(
+                f"The sketch does not contain enough values to read the VaR at alpha={alpha}."
+            )
+        return np.partition(self._tail, kth)[kth]
+
+    def get_var_interval(
+        self, alpha: float, confidence: float = 0.95
+    ) -> Tuple[float, float]:
+        """Returns a distribution-free confidence interval of the VaR at 'alpha' from the order statistics of the tail
+        (see 'get_var_interval_ranks'), e.g. to decide whether enough values have been added.
+
+        Args:
+            alpha (float): Confidence interval of the VaR.
+            confidence (float, optional): Confidence level of the interval. Defaults to 0.95.
+
+        Raises:
+            Exception: Raises an error if the tail of the sketch is too small for the upper bound of the interval.
+
+        Returns:
+            Tuple[float, float]: The lower and upper bound of the VaR.
+        """
+        lower, upper = get_var_interval_ranks(self._count, alpha, confidence)
+        if upper >= len(self._tail):
+            raise Exception(
+                f"The sketch does not contain enough values to read the confidence interval of the VaR at alpha={alpha}."
+            )
+        tail = np.partition(self._tail, [lower, upper])
+        return tail[lower], tail[upper]
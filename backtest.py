@@ -0,0 +1,144 @@
+# %%
+import yaml
+from data.data_request import Token, Token_Pair
+from data.price_cache import Price_Cache
+from data.price_matrix import Price_Matrix
+from analysis.backtest import Backtest
+from datetime import datetime, timedelta
+from helper.helper import (
+    get_total_risk_adjustment,
+    get_assets,
+    register_data_sources,
+    print_banner,
+)
+import pandas as pd
+import logging
+import os
+import sys
+import time
+
+with open("config.yaml") as f:
+    config = yaml.load(f, Loader=yaml.FullLoader)
+
+NETWORK = "polkadot"  # select between kusama and polkadot
+DEBT = "usd"  # select usd for lending market and btc for vaults
+
+
+ALPHA = config["analysis"]["alpha"]
+PERIODS = config["analysis"]["thresholds"]["periods"]
+SAMPLE_PERIOD = config["analysis"]["historical_sample_period"]
+
+debt_token = Token(config["debt"][DEBT], DEBT)
+price_cache = Price_Cache(config["data"]["cache_directory"])
+register_data_sources(config)
+DATA_SOURCE = config["data"]["source"]
+start_date = (datetime.today() - timedelta(config["backtest"]["days"])).strftime(
+    "%Y-%m-%d"
+)
+
+
+def run_backtest(
+    ticker: str, token: dict, price_matrix: Price_Matrix, granularity: str
+) -> pd.DataFrame:
+    """Computes the thresholds that would have been suggested for a collateral on every day of the backtest.
+    On days on which the pair has less than a full sample period of prices, the proxy pair is used, like in 'main.py'.
+
+    Args:
+        ticker (str): Ticker of the collateral.
+        token (dict): Config of the collateral.
+        price_matrix (Price_Matrix): USD prices of all collateral, proxies and the debt token.
+        granularity (str): Granularity of the prices.
+
+    Returns:
+        pd.DataFrame: The thresholds of every day and the pair from which they were computed.
+    """
+    if ticker == debt_token.ticker:
+        logging.info(
+            f"Skipping backtest of token pair {ticker}/{debt_token.ticker} because the tokens are the same"
+        )
+        return None
+
+    total_risk_adjustment = get_total_risk_adjustment(ticker, NETWORK, config)
+    backtests = []
+    names = {ticker: token["name"], **(token.get("proxy") or {})}
+    for pair_ticker, name in names.items():
+        if pair_ticker == debt_token.ticker:
+            continue
+        token_pair = Token_Pair(Token(name, pair_ticker), debt_token, granularity)
+        token_pair.prices = price_matrix.pair(pair_ticker, debt_token.ticker)
+        if token_pair.prices.empty:
+            continue
+
+        backtest = Backtest(
+            token_pair,
+            ALPHA,
+            PERIODS,
+            SAMPLE_PERIOD,
+            config["analysis"]["historical_mode"],
+            total_risk_adjustment,
+        ).run(start_date)
+        backtest.insert(0, "pair", f"{pair_ticker}/{debt_token.ticker}")
+        backtests.append(backtest)
+
+    if not backtests:
+        logging.info(f"No sufficient historic prices for {ticker}/{debt_token.ticker}")
+        return None
+
+    # the collateral itself is used from the first day with a full sample period, the proxy before
+    result = backtests[0]
+    for backtest in backtests[1:]:
+        if len(result):
+            backtest = backtest[backtest.index < result.index[0]]
+        result = pd.concat([backtest, result])
+    return result
+
+
+if __name__ == "__main__":
+    logger = logging.getLogger()
+    logging.basicConfig(filename="backtest.log", level=logging.DEBUG)
+    consoleHandler = logging.StreamHandler(sys.stdout)
+    consoleHandler.setLevel(logging.INFO)
+    logger.addHandler(consoleHandler)
+
+    print_banner()
+
+    logging.info(f"Date of the backtest: {datetime.today()}")
+    logging.info("====================================================================")
+    logging.info("Start running the backtest with the following parameters:")
+    logging.info(
+        f"""
+    Debt currency:              {DEBT}
+    Data source:                {DATA_SOURCE}
+    First day of the backtest:  {start_date}
+    Confidence level (alpha):   {ALPHA*100}%
+    Historical sample period:   {SAMPLE_PERIOD}
+    Historical VaR mode:        {config["analysis"]["historical_mode"]}
+    """
+    )
+    logging.info("====================================================================")
+
+    # The prices of the first day of the backtest are estimated from the sample period before it
+    collateral = config["collateral"][NETWORK]
+    price_matrix = Price_Matrix.from_assets(
+        get_assets(collateral, debt_token.ticker, debt_token.name),
+        data_source=DATA_SOURCE,
+        start_date=(
+            datetime.strptime(start_date, "%Y-%m-%d") - timedelta(SAMPLE_PERIOD)
+        ).strftime("%Y-%m-%d"),
+        cache=price_cache,
+        granularity=config["data"]["granularity"],
+    )
+
+    output_directory = config["backtest"]["output_directory"]
+    os.makedirs(output_directory, exist_ok=True)
+    for ticker, token in collateral.items():
+        started = time.perf_counter()
+        thresholds = run_backtest(ticker, token, price_matrix, config["data"]["granularity"])
+        if thresholds is None:
+            continue
+
+        filename = os.path.join(output_directory, f"{ticker}_{debt_token.ticker}.csv")
+        thresholds.to_csv(filename)
+        logging.info(
+            f"Backtested {len(thresholds)} days of {ticker} in {time.perf_counter() - started:.2f} seconds, written to {filename}"
+        )
@@ -1,15 +1,45 @@
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from data.data_source import Data_Source, get_data_source
+from data.price_cache import Price_Cache
+from data.rate_limiter import Rate_Limiter
+from typing import Dict, List, Tuple, Union
 import pandas as pd
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
-urls = {
-    "coingecko": "https://api.coingecko.com/api/v3/coins/",
+# length of a bar of each granularity
+granularities = {
+    "hourly": "1H",
+    "daily": "1D",
 }
 
 
+def resample_prices(prices: pd.DataFrame, granularity: str = "daily") -> pd.DataFrame:
+    """Resamples prices to a regular grid of bars, so that every row covers the same time span.
+    The price of a bar is the last price within it, e.g. the intraday price of today, and bars without
+    a price keep the price of the previous bar. The granularity is stored in the metadata of the prices.
+
+    Args:
+        prices (pd.DataFrame): Prices with a datetime index.
+        granularity (str, optional): Granularity of the bars, one of 'granularities'. Defaults to "daily".
+
+    Returns:
+        pd.DataFrame: The resampled prices.
+    """
+    if granularity not in granularities:
+        raise Exception(
+            f"Unknown granularity {granularity}, supported granularities are {list(granularities)}"
+        )
+    resampled = prices.resample(granularities[granularity]).last().ffill()
+    resampled.index.name = prices.index.name
+    resampled.attrs["granularity"] = granularity
+    return resampled
+
 class Token:
     """Class that represents a token"""
 
@@ -36,7 +66,9 @@ class Token:
 class Token_Pair:
     """Class representating a trading pair of two tokens."""
 
-    def __init__(self, base_token: Token, quote_token: Token) -> None:
+    def __init__(
+        self, base_token: Token, quote_token: Token, granularity: str = "daily"
+    ) -> None:
         """Initializing the token pair.
 
         Args:
@@ -44,9 +76,15 @@ class Token_Pair:
                 This can be seen as '1 unit of base token is worth x units of quote token'
             quote_token (Token): A second token that represents the quote token of the pair.
                 This can be seen as 'x unit of quote token is worth 1 unit of base token'
+            granularity (str, optional): Granularity of the bars to which the prices are resampled, one of 'granularities'. Defaults to "daily".
         """
+        if granularity not in granularities:
+            raise Exception(
+                f"Unknown granularity {granularity}, supported granularities are {list(granularities)}"
+            )
         self._base_token = base_token
         self._quote_token = quote_token
+        self._granularity = granularity
         self._prices = None
 
     # Getter & Setter
@@ -59,12 +97,20 @@ class Token_Pair:
     def quote_token(self) -> Token:
         return self._quote_token
 
+    @property
+    def granularity(self) -> str:
+        return self._granularity
+
     @property
     def prices(self) -> pd.DataFrame:
         return self._prices
 
     @prices.setter
     def prices(self, prices: pd.DataFrame) -> None:
+        # prices are resampled to bars of the granularity of the pair, so that each row covers the same time span.
+        # The data frame of a failed request has no datetime index and is kept as it is (see 'Data_Request._request_prices').
+        if isinstance(prices, pd.DataFrame) and isinstance(prices.index, pd.DatetimeIndex):
+            prices = resample_prices(prices, self._granularity)
         self._prices = prices
 
     @property
@@ -79,30 +125,55 @@ class Token_Pair:
     # TODO: If inverse = True, it should also switch base and quote token if it gets executed for the first time to correctly represent the price in terms of base and quote currency.
     def get_prices(
         self,
-        data_source: str = "coingecko",
+        data_source: Union[str, Data_Source] = "coingecko",
         start_date: str = None,
         end_date: str = None,
         inverse: bool = False,
+        cache: Price_Cache = None,
     ) -> None:
         """Requests the prices from 'source'
 
         Args:
-            data_source (str, optional): Source to get the data from. Defaults to "coingecko".
+            data_source (Union[str, Data_Source], optional): Name of a registered source (see 'data.data_source') or the source itself. Defaults to "coingecko".
             start_date (str, optional): Start date as string in the format '%Y-%m-%d'. If none is given, the start date will be the end date - 365 days. Defaults to None.
             end_date (str, optional): End date as string in the format '%Y-%m-%d'. If none is given, it will default to today. Defaults to None.
             inverse (bool, optional): Coingecko does not support every token as quote currency. For exotic tokens as quote currency, this must be set to true so that the prices will be inverted. Defaults to False.
+            cache (Price_Cache, optional): If given, the prices are read from the cache and only the missing days are requested. Defaults to None.
         """
 
-        request = Data_Request(self, data_source, start_date, end_date)
+        request = Data_Request(
+            self,
+            data_source,
+            start_date,
+            end_date,
+            granularity=self._granularity,
+            cache=cache,
+        )
         prices = request.request_historic_prices()
         if not inverse:
             self.prices = prices
         else:
             self.prices = 1 / prices
 
+    def get_bars(self, days: int) -> int:
+        """Returns the number of bars of the granularity of the pair that cover 'days' days.
+
+        Args:
+            days (int): Number of days.
+
+        Returns:
+            int: Number of bars.
+        """
+        bars = int(pd.Timedelta(days, "D") / pd.Timedelta(granularities[self._granularity]))
+        if bars < 1:
+            raise Exception(
+                f"A period of {days} days is shorter than a bar of granularity {self._granularity}"
+            )
+        return bars
+
     def calculate_returns(self, type: str = "geometric", period: str = "daily") -> None:
         shift_periods = {"daily": 1, "weekly": 7, "monthly": 31, "annualy": 365}
-        shift_period = shift_periods[period]
+        shift_period = self.get_bars(shift_periods[period])
 
         if type == "geometric":
             self.returns = self.prices.pct_change(
@@ -135,23 +206,39 @@ class Data_Request:
     def __init__(
         self,
         token_pair: Token_Pair,
-        data_source: str = "coingecko",
+        data_source: Union[str, Data_Source] = "coingecko",
         start_date: str = None,
         end_date: str = None,
+        granularity: str = "daily",
+        cache: Price_Cache = None,
+        session: requests.Session = None,
+        rate_limiter: Rate_Limiter = None,
+        max_retries: int = 5,
     ):
         """
         :Token_Pair: An instance of class Token_Pair with the two tokens for which the data should be requested
-        :data_source: Source from where the data should be requested
+        :data_source: Name of a registered Data_Source or the source itself from where the data should be requested
         :start_date: Start date as string in the format 'YYYY-MM-DD'
         :end_date: End date as string in the format 'YYYY-MM-DD', will default to today is not provided
+        :granularity: Interval between two prices requested from the source
+        :cache: Price_Cache from which the prices are read, so that only missing days are requested from the source
+        :session: Session used to send the requests, so that connections are reused
+        :rate_limiter: Rate_Limiter that is shared by all requests to the source
+        :max_retries: Number of retries if the source responds that the rate limit is exceeded
         """
 
         self._token_pair = token_pair
         self._data_source = data_source
+        self._source = get_data_source(data_source)
         self._start_date = start_date
         self._end_date = (
             end_date if end_date is not None else datetime.today().strftime("%Y-%m-%d")
         )
+        self._granularity = granularity
+        self._cache = cache
+        self._session = session
+        self._rate_limiter = rate_limiter
+        self._max_retries = max_retries
 
     def get_length_in_days(self) -> str:
         if self._start_date is None:
@@ -162,33 +249,148 @@ class Data_Request:
         )
         return str(time_delta.days)
 
-    def parse_url(self):
-        "Currently only supports price requests from coingecko"
-
-        length_in_days = self.get_length_in_days()
-
-        if self._data_source == "coingecko":
-            base_token = self._token_pair.base_token.name
-            quote_token = self._token_pair.quote_token.ticker
-            self._url_endpoint = (
-                urls[self._data_source]
-                + base_token
-                + "/market_chart?vs_currency="
-                + quote_token
-                + "&days="
-                + length_in_days
+    def parse_url(self, length_in_days: str = None):
+        "Only sources that request the prices from an url, e.g. coingecko, have an url endpoint"
+
+        if length_in_days is None:
+            length_in_days = self.get_length_in_days()
+
+        if hasattr(self._source, "parse_url"):
+            self._url_endpoint = self._source.parse_url(
+                self._token_pair.base_token.name,
+                self._token_pair.quote_token.ticker,
+                length_in_days,
+                self._granularity,
             )
 
-    def request_historic_prices(self):
-        self.parse_url()
+    def request_historic_prices(self) -> pd.DataFrame:
+        if self._cache is None or not self._source.cacheable:
+            return self._request_prices()
+        return self._request_cached_prices()
+
+    def _get(self, url: str) -> requests.Response:
+        """Sends a GET request and retries with an exponential backoff if the rate limit is exceeded."""
+        for attempt in range(self._max_retries + 1):
+            if self._rate_limiter is not None:
+                self._rate_limiter.acquire()
+            response = (self._session if self._session is not None else requests).get(url)
+            if response.status_code != 429 or attempt == self._max_retries:
+                return response
+
+            delay = float(response.headers.get("Retry-After", 2**attempt))
+            logging.info(f"Rate limit exceeded, retrying {url} in {delay} seconds...")
+            time.sleep(delay)
+
+    def _request_prices(self, length_in_days: str = None) -> pd.DataFrame:
+        if length_in_days is None:
+            length_in_days = self.get_length_in_days()
         try:
-            price_data = requests.get(self._url_endpoint).json()["prices"]
-            price_data = pd.DataFrame(price_data, columns=["Date", "Price"])
-            price_data.set_index("Date", inplace=True)
-            price_data.index = pd.to_datetime(price_data.index, unit="ms")
+            price_data = self._source.request_prices(
+                self._token_pair.base_token.name,
+                self._token_pair.quote_token.ticker,
+                length_in_days,
+                self._end_date,
+                self._granularity,
+                self._get,
+            )
         except KeyError as e:
             logging.info(f"Error {e}: could not get price data...")
             price_data = pd.DataFrame(
                 [(0, 0)], columns=["Date", "Price"]
             )  # to align with CG returning zeros for stKSM and is handled in main.py accordignly
         return price_data
+
+    def _request_cached_prices(self) -> pd.DataFrame:
+        """Reads the prices from the cache and only requests the days since the last cached price.
+        If the request fails, e.g. because there is no network, the cached prices are used."""
+        key = (
+            self._token_pair.base_token.name,
+            self._token_pair.quote_token.ticker,
+            self._granularity,
+        )
+        end = datetime.strptime(self._end_date, "%Y-%m-%d") + timedelta(1)
+        start = end - timedelta(int(self.get_length_in_days()) + 1)
+
+        cached, cached_from = self._cache.load(*key)
+        if cached is not None and cached_from <= start:
+            missing_days = (end - cached.index[-1].normalize()).days - 1
+            if missing_days <= 0:
+                return cached[start:end]
+            length_in_days = str(missing_days + 1)
+        else:
+            length_in_days = self.get_length_in_days()
+
+        try:
+            price_data = self._request_prices(length_in_days)
+        except requests.exceptions.RequestException as e:
+            if cached is None:
+                raise
+            logging.info(f"Error {e}: using cached prices for {key}...")
+            return cached[start:end]
+
+        if price_data.iloc[0, 0] == 0:
+            # the request didn't return any prices (see 'request_historic_prices')
+            return price_data if cached is None else cached[start:end]
+
+        requested_from = end - timedelta(int(length_in_days) + 1)
+        prices = self._cache.store(*key, price_data, requested_from)
+        return prices[start:end]
+
+    @staticmethod
+    def batch_request_historic_prices(
+        token_pairs: List[Token_Pair],
+        data_source: Union[str, Data_Source] = "coingecko",
+        start_date: str = None,
+        end_date: str = None,
+        cache: Price_Cache = None,
+        max_workers: int = 8,
+        rate_limiter: Rate_Limiter = None,
+        granularity: str = "daily",
+    ) -> Dict[Tuple[str, str], pd.DataFrame]:
+        """Requests the prices of several token pairs concurrently over a shared session.
+        All requests share a rate limiter that is tuned to the limits of the data source.
+
+        Args:
+            token_pairs (List[Token_Pair]): Token pairs for which the prices are requested.
+            data_source (Union[str, Data_Source], optional): Name of a registered source or the source itself. Defaults to "coingecko".
+            start_date (str, optional): Start date as string in the format '%Y-%m-%d'. Defaults to None.
+            end_date (str, optional): End date as string in the format '%Y-%m-%d'. Defaults to None.
+            cache (Price_Cache, optional): If given, the prices are stored in the cache, e.g. to prefetch them. Defaults to None.
+            max_workers (int, optional): Number of concurrent requests. Defaults to 8.
+            rate_limiter (Rate_Limiter, optional): If None, the rate limit of the data source is used, if it has one. Defaults to None.
+            granularity (str, optional): Interval between two prices requested from the source. Defaults to "daily".
+
+        Returns:
+            Dict[Tuple[str, str], pd.DataFrame]: The prices for each pair of base token name and quote token ticker.
+        """
+        rate_limit = get_data_source(data_source).rate_limit
+        if rate_limiter is None and rate_limit is not None:
+            rate_limiter = Rate_Limiter(*rate_limit)
+
+        # every pair is only requested once
+        token_pairs = {
+            (pair.base_token.name, pair.quote_token.ticker): pair for pair in token_pairs
+        }
+
+        with requests.Session() as session, ThreadPoolExecutor(max_workers) as executor:
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+
+            data_requests = [
+                Data_Request(
+                    pair,
+                    data_source,
+                    start_date,
+                    end_date,
+                    granularity=granularity,
+                    cache=cache,
+                    session=session,
+                    rate_limiter=rate_limiter,
+                )
+                for pair in token_pairs.values()
+            ]
+            prices = executor.map(
+                lambda request: request.request_historic_prices(), data_requests
+            )
+            return dict(zip(token_pairs.keys(), prices))
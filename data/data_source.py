@@ -0,0 +1,248 @@
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Tuple, Union
+import json
+import os
+import pandas as pd
+import requests
+
+urls = {
+    "coingecko": "https://api.coingecko.com/api/v3/coins/",
+}
+
+# requests per second and burst size of the public APIs
+rate_limits = {
+    "coingecko": (0.5, 5),
+}
+
+
+class Data_Source:
+    """Base class of the sources from which 'Data_Request' gets prices.
+
+    A source turns a request for the prices of 'coin_id' in 'vs_currency' over the last 'length_in_days' days
+    into a data frame with a 'Price' column and a datetime index named 'Date'. Sources that send http requests
+    receive the 'get' function of the data request, so that they share its session, rate limiter and retries.
+    """
+
+    # requests per second and burst size, None if the source is not rate limited
+    rate_limit: Tuple[float, int] = None
+    # whether the prices should be stored in a Price_Cache, local sources are not worth caching
+    cacheable: bool = True
+
+    def request_prices(
+        self,
+        coin_id: str,
+        vs_currency: str,
+        length_in_days: str,
+        end_date: str,
+        granularity: str,
+        get: Callable[[str], requests.Response],
+    ) -> pd.DataFrame:
+        """Requests the prices of a coin.
+
+        Args:
+            coin_id (str): Id of the coin at the data source, e.g. 'polkadot'.
+            vs_currency (str): Ticker of the quote currency, e.g. 'usd'.
+            length_in_days (str): Number of days before 'end_date' for which the prices are requested.
+            end_date (str): End date as string in the format '%Y-%m-%d'.
+            granularity (str): Interval between two prices, e.g. 'daily'.
+            get (Callable[[str], requests.Response]): Function that sends a GET request.
+
+        Raises:
+            KeyError: If the source has no prices for the coin.
+
+        Returns:
+            pd.DataFrame: The prices.
+        """
+        raise NotImplementedError
+
+
+class Coingecko_Source(Data_Source):
+    """Prices from the market chart endpoint of the public CoinGecko API."""
+
+    rate_limit = rate_limits["coingecko"]
+
+    def parse_url(
+        self, coin_id: str, vs_currency: str, length_in_days: str, granularity: str
+    ) -> str:
+        return (
+            urls["coingecko"]
+            + coin_id
+            + "/market_chart?vs_currency="
+            + vs_currency
+            + "&days="
+            + length_in_days
+            + "&interval="
+            + granularity
+        )
+
+    def request_response(
+        self,
+        coin_id: str,
+        vs_currency: str,
+        length_in_days: str,
+        granularity: str,
+        get: Callable[[str], requests.Response],
+    ) -> dict:
+        """Returns the raw json response of the API."""
+        return get(self.parse_url(coin_id, vs_currency, length_in_days, granularity)).json()
+
+    @staticmethod
+    def parse_response(response: dict) -> pd.DataFrame:
+        price_data = pd.DataFrame(response["prices"], columns=["Date", "Price"])
+        price_data.set_index("Date", inplace=True)
+        price_data.index = pd.to_datetime(price_data.index, unit="ms")
+        return price_data
+
+    def request_prices(
+        self,
+        coin_id: str,
+        vs_currency: str,
+        length_in_days: str,
+        end_date: str,
+        granularity: str,
+        get: Callable[[str], requests.Response],
+    ) -> pd.DataFrame:
+        return self.parse_response(
+            self.request_response(coin_id, vs_currency, length_in_days, granularity, get)
+        )
+
+
+class Local_Source(Data_Source):
+    """Prices from a local directory of csv or parquet files with the columns 'Date' and 'Price'.
+
+    The files are named '{coin_id}_{vs_currency}_{granularity}' or '{coin_id}_{vs_currency}' in lower case,
+    so that the directory of a Price_Cache can be used as a source as well. Reading parquet files requires pyarrow.
+    """
+
+    cacheable = False
+
+    def __init__(self, directory: str):
+        """Initializing the source.
+
+        Args:
+            directory (str): Directory of the price files.
+        """
+        self._directory = directory
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def _read(self, coin_id: str, vs_currency: str, granularity: str) -> pd.DataFrame:
+        for name in [f"{coin_id}_{vs_currency}_{granularity}", f"{coin_id}_{vs_currency}"]:
+            filename = os.path.join(self._directory, name.lower())
+            if os.path.exists(filename + ".csv"):
+                return pd.read_csv(filename + ".csv", index_col="Date", parse_dates=["Date"])
+            if os.path.exists(filename + ".parquet"):
+                prices = pd.read_parquet(filename + ".parquet")
+                return prices.set_index("Date") if "Date" in prices.columns else prices
+        raise KeyError(f"{coin_id}_{vs_currency}")
+
+    def request_prices(
+        self,
+        coin_id: str,
+        vs_currency: str,
+        length_in_days: str,
+        end_date: str,
+        granularity: str,
+        get: Callable[[str], requests.Response] = None,
+    ) -> pd.DataFrame:
+        prices = self._read(coin_id, vs_currency, granularity)[["Price"]].sort_index()
+        end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(1)
+        return prices[end - timedelta(int(length_in_days) + 1) : end]
+
+
+class Replay_Source(Data_Source):
+    """Records the raw responses of another source and serves them back deterministically.
+
+    In record mode, every request is forwarded to the source and its raw json response is saved as
+    '{coin_id}_{vs_currency}_{granularity}_{length_in_days}.json'. In replay mode, the saved response of the same
+    request is served without any network access, so that e.g. tests and backtests don't depend on the API.
+    """
+
+    cacheable = False
+
+    def __init__(
+        self, directory: str, record: bool = False, source: Coingecko_Source = None
+    ):
+        """Initializing the source.
+
+        Args:
+            directory (str): Directory of the recorded responses.
+            record (bool, optional): Whether the responses are recorded or replayed. Defaults to False.
+            source (Coingecko_Source, optional): Source of which the responses are recorded. Defaults to Coingecko_Source().
+        """
+        self._directory = directory
+        self._record = record
+        self._source = source if source is not None else Coingecko_Source()
+        if record:
+            self.rate_limit = self._source.rate_limit
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def record(self) -> bool:
+        return self._record
+
+    def filename(
+        self, coin_id: str, vs_currency: str, length_in_days: str, granularity: str
+    ) -> str:
+        return os.path.join(
+            self._directory,
+            f"{coin_id}_{vs_currency}_{granularity}_{length_in_days}.json".lower(),
+        )
+
+    def request_prices(
+        self,
+        coin_id: str,
+        vs_currency: str,
+        length_in_days: str,
+        end_date: str,
+        granularity: str,
+        get: Callable[[str], requests.Response] = None,
+    ) -> pd.DataFrame:
+        filename = self.filename(coin_id, vs_currency, length_in_days, granularity)
+        if self._record:
+            response = self._source.request_response(
+                coin_id, vs_currency, length_in_days, granularity, get
+            )
+            os.makedirs(self._directory, exist_ok=True)
+            tmp_filename = f"{filename}.{os.getpid()}.tmp"
+            with open(tmp_filename, "w") as f:
+                json.dump(response, f)
+            os.replace(tmp_filename, filename)
+        else:
+            if not os.path.exists(filename):
+                # like a price file that is missing in a local source, see 'Data_Request.request_historic_prices'
+                raise KeyError(f"No recorded response for {os.path.basename(filename)} in {self._directory}")
+            with open(filename) as f:
+                response = json.load(f)
+        return self._source.parse_response(response)
+
+
+data_sources: Dict[str, Data_Source] = {
+    "coingecko": Coingecko_Source(),
+}
+
+
+def register_data_source(name: str, source: Data_Source) -> None:
+    """Registers a source, so that it can be used by its name, e.g. in 'Token_Pair.get_prices(data_source=name)'.
+
+    Args:
+        name (str): Name of the source.
+        source (Data_Source): The source.
+    """
+    data_sources[name] = source
+
+
+def get_data_source(data_source: Union[str, Data_Source]) -> Data_Source:
+    """Returns a registered source by its name. Sources that are passed directly are returned as they are."""
+    if isinstance(data_source, Data_Source):
+        return data_source
+    if data_source not in data_sources:
+        raise Exception(
+            f"Unknown data source {data_source}, registered sources are {list(data_sources)}"
+        )
+    return data_sources[data_source]
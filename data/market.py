@@ -1,6 +1,120 @@
-from numpy import kaiser
 from data.data_request import Token
-from typing import Tuple
+from typing import Dict, Tuple, Union
+import numpy as np
+
+
+def constant_product_swap(
+    base_token_amounts: Union[float, np.ndarray],
+    quote_token_amounts: Union[float, np.ndarray],
+    amounts: Union[float, np.ndarray],
+    token: str = "base",
+    swap_type: str = "exact_input",
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Computes the reserves and slippage of swaps in constant product pools for arrays of amounts and pool states at once.
+    All arrays are broadcast against each other, e.g. many amounts in one pool or one amount in many pools.
+
+    Args:
+        base_token_amounts (Union[float, np.ndarray]): Reserves of the base token before the swaps.
+        quote_token_amounts (Union[float, np.ndarray]): Reserves of the quote token before the swaps.
+        amounts (Union[float, np.ndarray]): Amounts of 'token' that are swapped.
+        token (str, optional): "base" or "quote", the input token of an exact input swap or the output token of an
+            exact output swap. Defaults to "base".
+        swap_type (str, optional): "exact_input" or "exact_output". Defaults to "exact_input".
+
+    Raises:
+        Exception: If an exact output swap takes all reserves of the output token or more.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: The reserves of the base and quote token after the swaps and the
+            slippage, i.e. the relative change of the exchange rate (quote per base) caused by each swap.
+    """
+    base_token_amounts = np.asarray(base_token_amounts, dtype=float)
+    quote_token_amounts = np.asarray(quote_token_amounts, dtype=float)
+    amounts = np.asarray(amounts, dtype=float)
+    invariant = base_token_amounts * quote_token_amounts
+
+    if token not in ["base", "quote"] or swap_type not in ["exact_input", "exact_output"]:
+        raise Exception(f"Unknown swap of the {token} token with the type {swap_type}.")
+
+    if swap_type == "exact_output":
+        reserves = base_token_amounts if token == "base" else quote_token_amounts
+        if np.any(amounts >= reserves):
+            raise Exception(
+                f"Swap amount must be smaller than the amount of {token} tokens in the pool."
+            )
+        amounts = -amounts
+
+    if token == "base":
+        _base_token_amounts = base_token_amounts + amounts
+        _quote_token_amounts = invariant / _base_token_amounts
+    else:
+        _quote_token_amounts = quote_token_amounts + amounts
+        _base_token_amounts = invariant / _quote_token_amounts
+
+    _slippage = (_quote_token_amounts / _base_token_amounts) / (
+        quote_token_amounts / base_token_amounts
+    ) - 1
+    return _base_token_amounts, _quote_token_amounts, _slippage
+
+
+class Slippage_Curve:
+    """Lookup table of the slippage of swaps of increasing size in a pool, from which the slippage of any amount
+    up to the largest amount of the table is interpolated instead of being computed swap by swap."""
+
+    def __init__(self, amounts: np.ndarray, slippages: np.ndarray):
+        """Initializing the lookup table.
+
+        Args:
+            amounts (np.ndarray): Increasing swap amounts.
+            slippages (np.ndarray): Slippage of each swap amount.
+        """
+        self._amounts = amounts
+        self._slippages = slippages
+
+    @property
+    def amounts(self) -> np.ndarray:
+        return self._amounts
+
+    @property
+    def slippages(self) -> np.ndarray:
+        return self._slippages
+
+    def get_slippage(self, amounts: Union[float, np.ndarray]) -> np.ndarray:
+        """Interpolates the slippage of the given swap amounts.
+
+        Args:
+            amounts (Union[float, np.ndarray]): Swap amounts between 0 and the largest amount of the table.
+
+        Returns:
+            np.ndarray: The interpolated slippage of each amount.
+        """
+        if np.any(np.asarray(amounts) > self._amounts[-1]):
+            raise Exception(
+                f"Swap amount must be smaller or equal to the largest amount of the table {self._amounts[-1]}."
+            )
+        return np.interp(amounts, self._amounts, self._slippages)
+
+
+def get_liquidity_adjustment(
+    supply_cap: float, pool_liquidity: float, trade_share: float = 0.1
+) -> float:
+    """Derives the liquidity adjustment of a collateral from the slippage of selling a share of its supply cap into a
+    constant product pool, e.g. to liquidate the collateral.
+
+    Args:
+        supply_cap (float): Supply cap of the collateral, in units of the collateral.
+        pool_liquidity (float): Amount of the collateral in the pool.
+        trade_share (float, optional): Share of the supply cap that is sold. Defaults to 0.1.
+
+    Returns:
+        float: The liquidity adjustment as the absolute slippage in decimal, e.g. 0.05 for 5%.
+    """
+    # the slippage only depends on the size of the trade relative to the reserves
+    _, _, slippage = constant_product_swap(
+        pool_liquidity, pool_liquidity, trade_share * supply_cap, "base", "exact_input"
+    )
+    return float(abs(slippage))
+
 
 class Automted_Market_Maker():
     """
@@ -14,6 +128,8 @@ class Automted_Market_Maker():
         self._quote_token_amount = quote_token_amount
         self._swap_type = swap_type
         self._invariant = self._base_token_amount * self._quote_token_amount
+        self._slippage_curves: Dict[tuple, Slippage_Curve] = {}
+        self._slippage_curves_state = None
 
     @property
     def invariant(self) -> int:
@@ -140,34 +256,72 @@ class Automted_Market_Maker():
         return slippage
 
     def calculate_params(self, token: Token, amount: int, swap_type: str = "exact_output") -> Tuple[float, float, float]:
-        if (token.name == self.base_token.name) & (swap_type == "exact_output"):
-            # does the swap with the base token as output
-            if amount < self._base_token_amount:
-                _base_token_amount = self.base_token_amount - amount
-                _quote_token_amount = self.invariant / self._base_token_amount
-            else:
-                raise Exception(
-                    "Swap amount must be smaller than the amount of base tokens in the pool.")
-
-        elif (token.name == self.quote_token.name) & (swap_type == "exact_output"):
-            if amount < self._quote_token_amount:
-                _quote_token_amount = self._quote_token_amount - amount
-                _base_token_amount = self.invariant / _quote_token_amount
-            else:
-                raise Exception(
-                    "Swap amount must be smaller than the amount of base tokens in the pool.")
-
-        elif (token.name == self.base_token.name) & (swap_type == "exact_input"):
-            # does the swap with the base token as output
-            _base_token_amount = self.base_token_amount + amount
-            _quote_token_amount = self.invariant / _base_token_amount
-
-        elif (token.name == self.quote_token.name) & (swap_type == "exact_input"):
-            _quote_token_amount = self._quote_token_amount + amount
-            _base_token_amount = self.invariant / _quote_token_amount
-
-        _current_exchange_rate = self.exchange_rate()
-        _new_exchange_rate = _quote_token_amount / _base_token_amount
-        _slippage = float(_new_exchange_rate / _current_exchange_rate - 1)
-
-        return (_base_token_amount, _quote_token_amount, _slippage)
+        _base_token_amount, _quote_token_amount, _slippage = self.calculate_params_batch(
+            token, amount, swap_type
+        )
+        return (float(_base_token_amount), float(_quote_token_amount), float(_slippage))
+
+    def calculate_params_batch(
+        self,
+        token: Token,
+        amounts: Union[float, np.ndarray],
+        swap_type: str = "exact_output",
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Computes the reserves and slippage of many swaps in the current pool at once, without executing them
+        (see 'constant_product_swap').
+
+        Args:
+            token (Token): The input token of an exact input swap or the output token of an exact output swap.
+            amounts (Union[float, np.ndarray]): Amounts of 'token' to swap.
+            swap_type (str, optional): "exact_input" or "exact_output". Defaults to "exact_output".
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: The reserves of the base and quote token after each swap and its slippage.
+        """
+        if self._swap_type != "CPF":
+            raise Exception(f"Swaps are not implemented for the swap type {self._swap_type}.")
+        return constant_product_swap(
+            self._base_token_amount,
+            self._quote_token_amount,
+            amounts,
+            "base" if token.name == self.base_token.name else "quote",
+            swap_type,
+        )
+
+    def get_slippage_curve(
+        self,
+        token: Token,
+        swap_type: str = "exact_input",
+        max_amount: float = None,
+        n_points: int = 1_000,
+    ) -> Slippage_Curve:
+        """Returns the slippage curve of swaps of 'token' in the pool. The curve is computed once per pool state
+        and cached, so that the slippage of further swap amounts is interpolated.
+
+        Args:
+            token (Token): The input token of an exact input swap or the output token of an exact output swap.
+            swap_type (str, optional): "exact_input" or "exact_output". Defaults to "exact_input".
+            max_amount (float, optional): Largest swap amount of the curve. Defaults to half of the reserves of 'token'.
+            n_points (int, optional): Number of swap amounts in the table. Defaults to 1_000.
+
+        Returns:
+            Slippage_Curve: The slippage curve.
+        """
+        reserves = (
+            self._base_token_amount
+            if token.name == self.base_token.name
+            else self._quote_token_amount
+        )
+        max_amount = reserves / 2 if max_amount is None else max_amount
+        # the curves of previous pool states, e.g. before a swap, are outdated
+        state = (self._base_token_amount, self._quote_token_amount)
+        if state != self._slippage_curves_state:
+            self._slippage_curves = {}
+            self._slippage_curves_state = state
+
+        key = (token.name, swap_type, max_amount, n_points)
+        if key not in self._slippage_curves:
+            amounts = np.linspace(0, max_amount, n_points)
+            _, _, slippages = self.calculate_params_batch(token, amounts, swap_type)
+            self._slippage_curves[key] = Slippage_Curve(amounts, slippages)
+        return self._slippage_curves[key]
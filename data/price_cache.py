@@ -0,0 +1,104 @@
+from datetime import datetime
+from typing import Tuple
+import json
+import os
+import pandas as pd
+
+
+class Price_Cache:
+    """Local cache of price series, keyed by coin id, vs_currency and granularity.
+
+    Each series is stored in its own csv file together with a small json file that records how far back
+    the series has been requested, so that the cache also covers tokens that have a shorter history
+    than the requested sample period. Files are replaced atomically, so that several processes can
+    share the cache.
+    """
+
+    def __init__(self, directory: str = ".cache/prices"):
+        """Initializing the cache.
+
+        Args:
+            directory (str, optional): Directory in which the price series are stored. Defaults to ".cache/prices".
+        """
+        self._directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    def _filename(self, coin_id: str, vs_currency: str, granularity: str) -> str:
+        return os.path.join(
+            self._directory, f"{coin_id}_{vs_currency}_{granularity}.csv".lower()
+        )
+
+    def _read_metadata(self, filename: str) -> dict:
+        try:
+            with open(filename.replace(".csv", ".json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_metadata(self, filename: str, metadata: dict) -> None:
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "w") as f:
+            json.dump(metadata, f)
+        os.replace(tmp_filename, filename.replace(".csv", ".json"))
+
+    def load(
+        self, coin_id: str, vs_currency: str, granularity: str
+    ) -> Tuple[pd.DataFrame, datetime]:
+        """Loads a price series from the cache.
+
+        Args:
+            coin_id (str): Id of the coin at the data source, e.g. 'polkadot'.
+            vs_currency (str): Ticker of the quote currency, e.g. 'usd'.
+            granularity (str): Granularity of the prices, e.g. 'daily'.
+
+        Returns:
+            Tuple[pd.DataFrame, datetime]: The cached prices and the earliest date for which they have been requested.
+                Both are None if the series is not cached.
+        """
+        filename = self._filename(coin_id, vs_currency, granularity)
+        if not os.path.exists(filename):
+            return None, None
+
+        prices = pd.read_csv(filename, index_col="Date", parse_dates=["Date"])
+        requested_from = self._read_metadata(filename).get("requested_from")
+        return prices, pd.Timestamp(requested_from) if requested_from else prices.index[0]
+
+    def store(
+        self,
+        coin_id: str,
+        vs_currency: str,
+        granularity: str,
+        prices: pd.DataFrame,
+        requested_from: datetime,
+    ) -> pd.DataFrame:
+        """Merges new prices into the cached series. Cached prices at or after the first new timestamp are replaced,
+        e.g. the intraday price of the last day that has been cached.
+
+        Args:
+            coin_id (str): Id of the coin at the data source, e.g. 'polkadot'.
+            vs_currency (str): Ticker of the quote currency, e.g. 'usd'.
+            granularity (str): Granularity of the prices, e.g. 'daily'.
+            prices (pd.DataFrame): The new prices with a datetime index.
+            requested_from (datetime): The earliest date for which the new prices have been requested.
+
+        Returns:
+            pd.DataFrame: The merged price series.
+        """
+        filename = self._filename(coin_id, vs_currency, granularity)
+        cached, cached_from = self.load(coin_id, vs_currency, granularity)
+        if cached is not None:
+            prices = pd.concat([cached[cached.index < prices.index[0]], prices])
+            requested_from = min(requested_from, cached_from)
+
+        prices = prices[~prices.index.duplicated(keep="last")].sort_index()
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        prices.to_csv(tmp_filename, index_label="Date")
+        os.replace(tmp_filename, filename)
+        self._write_metadata(
+            filename, {"requested_from": pd.Timestamp(requested_from).isoformat()}
+        )
+        return prices
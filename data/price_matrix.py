@@ -0,0 +1,114 @@
+from data.data_request import Token, Token_Pair, Data_Request, resample_prices
+from data.price_cache import Price_Cache
+from typing import Dict, List
+import pandas as pd
+import logging
+
+
+class Price_Matrix:
+    """Date-aligned prices of several assets, all quoted in USD.
+
+    The price of any pair X/Y is derived by dividing the USD prices of X and Y, so the prices of each asset
+    only need to be requested once, no matter in which currencies they are quoted later on.
+    """
+
+    def __init__(self, prices: pd.DataFrame):
+        """Initializing the price matrix.
+
+        Args:
+            prices (pd.DataFrame): USD prices with one column per asset ticker and a datetime index of regular bars.
+        """
+        self._prices = prices
+
+    @classmethod
+    def from_assets(
+        cls,
+        assets: Dict[str, str],
+        data_source: str = "coingecko",
+        start_date: str = None,
+        end_date: str = None,
+        cache: Price_Cache = None,
+        granularity: str = "daily",
+    ) -> "Price_Matrix":
+        """Requests the USD prices of all assets concurrently and aligns them by date.
+        The ticker 'usd' is not requested, its price is always 1.
+
+        Args:
+            assets (Dict[str, str]): Names of the assets at the data source by their ticker, e.g. {"dot": "polkadot"}.
+            data_source (str, optional): Source to get the data from. Defaults to "coingecko".
+            start_date (str, optional): Start date as string in the format '%Y-%m-%d'. Defaults to None.
+            end_date (str, optional): End date as string in the format '%Y-%m-%d'. Defaults to None.
+            cache (Price_Cache, optional): Cache of the prices. Defaults to None.
+            granularity (str, optional): Granularity of the bars to which the prices are resampled. Defaults to "daily".
+
+        Returns:
+            Price_Matrix: The price matrix.
+        """
+        usd = Token("dollar", "usd")
+        token_pairs = {
+            ticker: Token_Pair(Token(name, ticker), usd, granularity)
+            for ticker, name in assets.items()
+            if ticker != "usd"
+        }
+        prices = Data_Request.batch_request_historic_prices(
+            list(token_pairs.values()),
+            data_source,
+            start_date,
+            end_date,
+            cache=cache,
+            granularity=granularity,
+        )
+
+        columns = {}
+        for ticker, pair in token_pairs.items():
+            price_data = prices[(pair.base_token.name, usd.ticker)]
+            if price_data.iloc[0, 0] == 0:
+                # the request didn't return any prices (see 'Data_Request.request_historic_prices')
+                logging.info(f"No USD prices available for {ticker}")
+                columns[ticker] = pd.Series(dtype=float)
+                continue
+            # the last price of each bar, e.g. the intraday price of today
+            columns[ticker] = resample_prices(price_data, granularity)["Price"]
+
+        matrix = pd.DataFrame(columns).sort_index()
+        if "usd" in assets:
+            matrix["usd"] = 1.0
+        matrix.index.name = "Date"
+        matrix.attrs["granularity"] = granularity
+        return cls(matrix)
+
+    @property
+    def prices(self) -> pd.DataFrame:
+        return self._prices
+
+    @property
+    def granularity(self) -> str:
+        return self._prices.attrs.get("granularity", "daily")
+
+    @property
+    def tickers(self) -> List[str]:
+        return list(self._prices.columns)
+
+    def pair(self, base_ticker: str, quote_ticker: str) -> pd.DataFrame:
+        """Returns the prices of the pair base/quote on the dates on which both prices are available.
+
+        Args:
+            base_ticker (str): Ticker of the base token.
+            quote_ticker (str): Ticker of the quote token.
+
+        Returns:
+            pd.DataFrame: The prices in the same format as 'Token_Pair.prices'.
+        """
+        prices = self._prices[base_ticker] / self._prices[quote_ticker]
+        return prices.dropna().to_frame("Price")
+
+    def quote(self, quote_ticker: str) -> pd.DataFrame:
+        """Returns the prices of all assets quoted in 'quote_ticker' with a single vectorized division.
+
+        Args:
+            quote_ticker (str): Ticker of the quote token.
+
+        Returns:
+            pd.DataFrame: Prices with one column per asset ticker.
+        """
+        return self._prices.div(self._prices[quote_ticker], axis=0)
@@ -0,0 +1,47 @@
+import threading
+import time
+
+
+class Rate_Limiter:
+    """Thread-safe token bucket that limits the rate of requests to a data source.
+
+    The bucket holds up to 'capacity' tokens and is refilled with 'rate' tokens per second.
+    Every request takes one token and waits if the bucket is empty, which allows short bursts
+    of requests while keeping the average rate below the limit of the data source.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1):
+        """Initializing the rate limiter with a full bucket.
+
+        Args:
+            rate (float): Number of requests per second.
+            capacity (int, optional): Maximum number of requests in a burst. Defaults to 1.
+        """
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def acquire(self) -> None:
+        """Takes a token from the bucket and blocks until one is available."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._capacity, self._tokens + (now - self._last_refill) * self._rate
+                )
+                self._last_refill = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            time.sleep(wait)
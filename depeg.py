@@ -0,0 +1,59 @@
+# %%
+import yaml
+from data.price_cache import Price_Cache
+from data.price_matrix import Price_Matrix
+from analysis.depeg import get_depeg_statistics, write_depeg_adjustments
+from datetime import datetime, timedelta
+from helper.helper import register_data_sources
+import logging
+import sys
+
+with open("config.yaml") as f:
+    config = yaml.load(f, Loader=yaml.FullLoader)
+
+price_cache = Price_Cache(config["data"]["cache_directory"])
+register_data_sources(config)
+DATA_SOURCE = config["data"]["source"]
+start_date = (
+    datetime.today() - timedelta(config["depeg"]["sample_period"])
+).strftime("%Y-%m-%d")
+
+
+if __name__ == "__main__":
+    logger = logging.getLogger()
+    logging.basicConfig(filename="depeg.log", level=logging.DEBUG)
+    consoleHandler = logging.StreamHandler(sys.stdout)
+    consoleHandler.setLevel(logging.INFO)
+    logger.addHandler(consoleHandler)
+
+    # Every token with a proxy is compared to the token it is pegged to, e.g. vDOT to DOT.
+    # The USD prices of all tokens of all networks are requested once.
+    pegs = {}
+    assets = {}
+    for network, collateral in config["collateral"].items():
+        pegs[network] = {}
+        for ticker, token in collateral.items():
+            if token.get("proxy"):
+                proxy_ticker, proxy_name = next(iter(token.get("proxy").items()))
+                pegs[network][ticker] = proxy_ticker
+                assets[ticker] = token["name"]
+                assets[proxy_ticker] = proxy_name
+
+    price_matrix = Price_Matrix.from_assets(
+        assets,
+        data_source=DATA_SOURCE,
+        start_date=start_date,
+        cache=price_cache,
+        granularity=config["data"]["granularity"],
+    )
+
+    for network, network_pegs in pegs.items():
+        statistics = get_depeg_statistics(
+            price_matrix, network_pegs, config["depeg"]["tolerance"]
+        )
+        logging.info(f"Depeg statistics of {network} since {start_date}:\n{statistics.to_string()}")
+
+        adjustments = write_depeg_adjustments(statistics, network, config["depeg"]["file"])
+        logging.info(
+            f"Depeg adjustments of {network} written to {config['depeg']['file']}: {adjustments}"
+        )
@@ -1,4 +1,8 @@
 import math
+from data.data_source import Local_Source, Replay_Source, register_data_source
+from data.market import get_liquidity_adjustment
+from analysis.depeg import load_depeg_adjustments
+from typing import Dict
 
 
 def round_up_to_nearest_5(num: float) -> int:
@@ -22,6 +26,11 @@ def get_total_risk_adjustment(ticker: str, network: str, config: dict()) -> floa
      - Liqudity risk (=slippage)
      - Depeg risk (=max historic depeg)
 
+    If no liquidity adjustment is given, but the liquidity of the pool of the token, it is derived from the
+    slippage of selling the 'liquidity_trade_share' of the analysis (10% by default) of the supply cap into the pool
+    (see 'get_liquidity_adjustment').
+    If no depeg adjustment is given, the one computed by 'depeg.py' is used, if there is one.
+
 
     Args:
         ticker (str): Ticker of the token
@@ -33,6 +42,12 @@ def get_total_risk_adjustment(ticker: str, network: str, config: dict()) -> floa
     token = config["collateral"][network].get(ticker)
     if token.get("risk_adjustment").get("liquidity_adjustment"):
         liquidity_adjustment = token.get("risk_adjustment").get("liquidity_adjustment")
+    elif token.get("supply_cap") and token.get("pool_liquidity"):
+        liquidity_adjustment = get_liquidity_adjustment(
+            token.get("supply_cap"),
+            token.get("pool_liquidity"),
+            config.get("analysis", {}).get("liquidity_trade_share", 0.1),
+        )
     else:
         liquidity_adjustment = 0
 
@@ -42,6 +57,9 @@ def get_total_risk_adjustment(ticker: str, network: str, config: dict()) -> floa
 
     if token.get("risk_adjustment").get("depeg_adjustment"):
         depeg_adjustment = token.get("risk_adjustment").get("depeg_adjustment")
+    elif token.get("risk_adjustment").get("depeg_adjustment") is None and config.get("depeg"):
+        depeg_adjustments = load_depeg_adjustments(config["depeg"]["file"])
+        depeg_adjustment = depeg_adjustments.get(network, {}).get(ticker, 0)
     else:
         depeg_adjustment = 0
 
@@ -52,6 +70,57 @@ def get_total_risk_adjustment(ticker: str, network: str, config: dict()) -> floa
     return liquidity_adjustment_multiplier * depeg_adjustment_multiplier
 
 
+def get_thresholds(var: Dict[str, float]) -> Dict[str, float]:
+    """Computes the thresholds from the risk adjusted VaR of each threshold period.
+
+    VaR (and hence thresholds) scale by the square root of time, so 0-7 days VaR will be a larger
+    increment than 7-14 days etc. We want large increments between safe_mint and premium_redeem
+    and need less safety margin between premium_redeem and liquidation. Each threshold is therefore
+    built from the sum of the increments between the VaR of the shorter periods.
+
+    Args:
+        var (Dict[str, float]): Risk adjusted VaR, i.e. (1 + VaR) / total risk adjustment, of each threshold
+            ordered from the longest to the shortest period, e.g. liquidation, premium_redeem and safe_mint.
+
+    Returns:
+        Dict[str, float]: The threshold of each key as collateralization ratio, e.g. 1.5 for 150%.
+    """
+    var_list = list(var.values()) + [1]
+    increments = [var_list[i + 1] - var_list[i] for i in range(len(var_list) - 1)]
+    return {key: 1 / (1 - sum(increments[: i + 1])) for i, key in enumerate(var.keys())}
+
+
+def get_assets(collateral: dict, debt_ticker: str, debt_name: str) -> Dict[str, str]:
+    """Returns the names of all collateral, their proxies and the debt token by their ticker.
+
+    Args:
+        collateral (dict): Config of the collateral of a network.
+        debt_ticker (str): Ticker of the debt token.
+        debt_name (str): Name of the debt token.
+
+    Returns:
+        Dict[str, str]: Names of the tokens at the data source by their ticker, e.g. {"dot": "polkadot"}.
+    """
+    assets = {debt_ticker: debt_name}
+    for ticker, token in collateral.items():
+        assets[ticker] = token["name"]
+        assets.update(token.get("proxy") or {})
+    return assets
+
+
+def register_data_sources(config: dict) -> None:
+    """Registers the local, record and replay data sources with the directories of the config.
+
+    Args:
+        config (dict): Imported config used for the analysis
+    """
+    register_data_source("local", Local_Source(config["data"]["local_directory"]))
+    register_data_source("replay", Replay_Source(config["data"]["recording_directory"]))
+    register_data_source(
+        "record", Replay_Source(config["data"]["recording_directory"], record=True)
+    )
+
+
 def print_banner() -> None:
     with open("banner.txt", "r") as f:
         print(f.read())
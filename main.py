@@ -1,12 +1,29 @@
 # %%
 import yaml
 from data.data_request import Token, Token_Pair
+from data.price_cache import Price_Cache
+from data.price_matrix import Price_Matrix
 from analysis.analysis import Analysis
-from simulation.simulation import Simulation
+from analysis.historical_var import Historical_VaR
+from simulation.simulation import Simulation, Path_Bank, Multi_Asset_Simulation
+from simulation.simulation_cache import Simulation_Cache
 from datetime import datetime, timedelta
-from helper.helper import round_up_to_nearest_5, get_total_risk_adjustment, print_banner
+from helper.helper import (
+    round_up_to_nearest_5,
+    get_total_risk_adjustment,
+    get_thresholds,
+    get_assets,
+    register_data_sources,
+    print_banner,
+)
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+import numpy as np
+import pandas as pd
 import logging
+import os
 import sys
+import tempfile
 
 with open("config.yaml") as f:
     config = yaml.load(f, Loader=yaml.FullLoader)
@@ -19,36 +36,87 @@ ALPHA = config["analysis"]["alpha"]
 PERIODS = config["analysis"]["thresholds"]["periods"]
 
 debt_token = Token(config["debt"][DEBT], DEBT)
+price_cache = Price_Cache(config["data"]["cache_directory"])
+# Results of the simulations are cached by their parameters, so that a rerun with the same
+# config, seed and volatility skips the simulation. Without a seed, nothing is cached.
+simulation_cache = Simulation_Cache(
+    config["analysis"]["simulation_cache_directory"],
+    config["analysis"]["simulation_cache_size"],
+)
+register_data_sources(config)
+DATA_SOURCE = config["data"]["source"]
 start_date = (
     datetime.today() - timedelta(config["analysis"]["historical_sample_period"])
 ).strftime("%Y-%m-%d")
 
-logger = logging.getLogger()
-logging.basicConfig(filename="analysis.log", level=logging.DEBUG)
-consoleHandler = logging.StreamHandler(sys.stdout)
-consoleHandler.setLevel(logging.INFO)
-logger.addHandler(consoleHandler)
 
-print_banner()
+class Record_Collector(logging.Handler):
+    """Logging handler that keeps the records of a worker process, so that they can be
+    emitted by the main process in the order of the collateral in the config."""
+
+    def __init__(self):
+        super().__init__(level=logging.DEBUG)
+        self.records = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        # the records are sent back to the main process, so everything that can't be pickled is formatted here
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        self.records.append(record)
+
+
+def init_worker() -> None:
+    """Replaces the handlers inherited from the main process with a collector."""
+    logger = logging.getLogger()
+    logger.handlers = [Record_Collector()]
+    logger.setLevel(logging.DEBUG)
+
+
+def run_job(
+    ticker: str,
+    token: dict,
+    price_matrix: Price_Matrix,
+    seed: np.random.SeedSequence,
+    path_bank_file: str = None,
+) -> List[logging.LogRecord]:
+    """Runs the analysis of a single collateral in a worker process and returns its log records."""
+    collector = logging.getLogger().handlers[0]
+    collector.records = []
+    try:
+        path_bank = Path_Bank.load(path_bank_file) if path_bank_file else None
+        analyse_collateral(ticker, token, price_matrix, seed, path_bank)
+    except Exception:
+        # a failing collateral should not stop the analysis of the others
+        logging.exception(f"Failed to analyse {ticker}")
+    return collector.records
+
+
+def has_sufficient_prices(prices: pd.DataFrame) -> bool:
+    """Checks if historic prices are available for the full sample period."""
+    return not prices.empty and (
+        prices.index[0] - timedelta(1) <= datetime.strptime(start_date, "%Y-%m-%d")
+    )
 
-logging.info(f"Date of the analysis: {datetime.today()}")
-logging.info("====================================================================")
-logging.info("Start running the collateral analysis with the following parameters:")
-logging.info(
-    f"""
-    Debt currency:              {DEBT}
-    Confidence level (alpha):   {ALPHA*100}%
-    Number of path simulations: {config["analysis"]["n_simulations"]}
-    Historical sample period:   {config["analysis"]["historical_sample_period"]}
-    Threshold period in days:
-        Safe Mint:              {PERIODS["liquidation"]}
-        Premium Redeem:         {PERIODS["premium_redeem"]}
-        Liquidations:           {PERIODS["safe_mint"]}
-    """
-)
-logging.info("====================================================================")
 
-for ticker, token in config["collateral"][NETWORK].items():
+def analyse_collateral(
+    ticker: str,
+    token: dict,
+    price_matrix: Price_Matrix,
+    seed: np.random.SeedSequence,
+    path_bank: Path_Bank = None,
+) -> None:
+    """Derives the prices, simulates the paths and computes the VaR and thresholds of a single collateral.
+
+    Args:
+        ticker (str): Ticker of the collateral.
+        token (dict): Config of the collateral.
+        price_matrix (Price_Matrix): USD prices of all collateral, proxies and the debt token.
+        seed (np.random.SeedSequence): Independent seed of the random number generator of this collateral.
+        path_bank (Path_Bank, optional): Random numbers shared by all collateral. If given, the seed is not used. Defaults to None.
+    """
     # BTC is the debt in the system and if BTC increases in price, the over-collateralization ratio drops
     # Vice versa, if the price of TOKEN decreases, the collateralization ratio drops.
     #
@@ -63,17 +131,14 @@ for ticker, token in config["collateral"][NETWORK].items():
             f"""Skipping analysis of token pair {col_token.ticker}/{debt_token.ticker}
             because the tokens are the same"""
         )
-        continue
+        return
 
     logging.info(f"Start analysing {ticker}...")
-    token_pair = Token_Pair(col_token, debt_token)
-    token_pair.get_prices(start_date=start_date)
+    token_pair = Token_Pair(col_token, debt_token, price_matrix.granularity)
+    token_pair.prices = price_matrix.pair(col_token.ticker, debt_token.ticker)
 
     # check if historic prices are available for the full sample period
-    if (token_pair.prices.iloc[0, 0] == 0) or (
-        token_pair.prices.index[0] - timedelta(1)
-        > datetime.strptime(start_date, "%Y-%m-%d")
-    ):
+    if not has_sufficient_prices(token_pair.prices):
         logging.info(
             f"No sufficient historic prices for {ticker}/{token_pair.quote_token.ticker}"
         )
@@ -86,13 +151,15 @@ for ticker, token in config["collateral"][NETWORK].items():
                 f"""Skipping analysis of token pair {col_token.ticker}/{debt_token.ticker}
             because the tokens are the same"""
             )
-            continue
+            return
 
-        token_pair = Token_Pair(Token(proxy_name, proxy_ticker), debt_token)
+        token_pair = Token_Pair(
+            Token(proxy_name, proxy_ticker), debt_token, price_matrix.granularity
+        )
         logging.info(
             f"Trying to get prices for {proxy_ticker}/{token_pair.quote_token.ticker} as proxy pair"
         )
-        token_pair.get_prices(start_date=start_date)
+        token_pair.prices = price_matrix.pair(proxy_ticker, debt_token.ticker)
 
     try:
         token_pair.calculate_returns()
@@ -100,18 +167,22 @@ for ticker, token in config["collateral"][NETWORK].items():
         logging.error(f"Failed to query prices for {ticker} and proxy {proxy_ticker}")
         pass
 
-    # Initialize and run the simulation: Each path represents the price change of the collateral/debt
-    # We simulate N trajectories with a duration of T days and daily steps
-    # and assume a normal distribution (GBM) with the std of the pair over the past sample
-    # period and a mean of 0.
+    # Each path represents the price change of the collateral/debt over T days with daily steps.
+    # The VaR of each period is read from paths of the process of the collateral in the config, e.g. a
+    # jump diffusion with the parameters of the collateral or a bootstrap of the returns. For the default,
+    # a GBM with the std of the pair over the past sample period and a mean of 0, the VaR of the initial
+    # drawdown has a closed form and the simulation is only run as an optional check.
+    strategy = token.get("strategy") or config["analysis"].get("strategy", "GBM")
+    process_params = token.get("process_params")
+    mu = 0
+    closed_form = strategy == "GBM" and mu == 0
     sim = Simulation(token_pair, strategy="GBM")
-    sim.simulate(
+    sim.set_params(
         steps=1,
         maturity=PERIODS["liquidation"],
-        n_simulations=config["analysis"]["n_simulations"],
         initial_value=1,
         sigma=token_pair.returns.std()[0],
-        mu=0,
+        mu=mu,
     )
 
     total_risk_adjustment = get_total_risk_adjustment(ticker, NETWORK, config)
@@ -126,13 +197,79 @@ for ticker, token in config["collateral"][NETWORK].items():
         "safe_mint": {"analytical": None, "historical": None},
     }
 
+    # the historical VaR over the rolling windows of each period, either of the return at the
+    # end of the window or of the worst drawdown from its start like the analytical VaR
+    historical_var = Historical_VaR(
+        token_pair, mode=config["analysis"]["historical_mode"]
+    ).get_var_multi(
+        alphas=[ALPHA], horizons=list(PERIODS.values())
+    )
+
+    check_sim = Simulation(token_pair, strategy=strategy)
+    # the bootstrap resamples historical returns instead of the random numbers of the path bank
+    if strategy == "bootstrap":
+        path_bank = None
+
+    # The paths are simulated in chunks and only the tails of the drawdowns are kept,
+    # so that the memory does not grow with the number of simulations. With a tolerance,
+    # the simulation stops as soon as the VaR of every period is precise enough.
+    if config["analysis"]["simulation_check"] or not closed_form:
+        check_sim.simulate_streaming(
+            steps=1,
+            maturity=PERIODS["liquidation"],
+            at_steps=list(PERIODS.values()),
+            alpha=ALPHA,
+            n_simulations=config["analysis"]["n_simulations"],
+            chunk_size=config["analysis"]["chunk_size"],
+            initial_value=1,
+            sigma=token_pair.returns.std()[0],
+            mu=mu,
+            seed=seed,
+            sampling=config["analysis"]["sampling"],
+            path_bank=path_bank,
+            process_params=process_params,
+            tolerance=config["analysis"].get("tolerance"),
+            cache=simulation_cache,
+        )
+        simulated_var = Analysis(check_sim).get_simulated_var_multi(
+            alpha=ALPHA, steps=list(PERIODS.values())
+        )
+        var_intervals = Analysis(check_sim).get_simulated_var_interval(
+            alpha=ALPHA, steps=list(PERIODS.values())
+        )
+        logging.info(
+            f"Simulated {check_sim.drawdown_sketches[PERIODS['liquidation']].count} paths of {ticker}, the 95% confidence interval of the simulated VaR is at most {max(upper - lower for lower, upper in var_intervals.values()) * 100:.3f} percentage points wide"
+        )
+
+    if closed_form:
+        # the running minimum is observed continuously, or once per day like the simulated paths with the continuity correction
+        analytical_var = {
+            PERIODS[key]: simple_analysis.get_analytical_var(
+                alpha=ALPHA,
+                at_step=PERIODS[key],
+                continuity_correction=config["analysis"].get("continuity_correction", False),
+            )
+            for key in var.keys()
+        }
+        if config["analysis"]["simulation_check"]:
+            for period in PERIODS.values():
+                logging.debug(
+                    f"The simulated VaR ({strategy}) over {period} days for {col_token.ticker} is {simulated_var[period]} (95% confidence interval {var_intervals[period]}), the analytical VaR is {analytical_var[period]}"
+                )
+    else:
+        logging.info(
+            f"The VaR of {ticker} is simulated with the {strategy} process, the closed form only holds for a GBM without drift"
+        )
+        analytical_var = simulated_var
+        for period in PERIODS.values():
+            logging.debug(
+                f"The simulated VaR ({strategy}) over {period} days for {col_token.ticker} is {simulated_var[period]} (95% confidence interval {var_intervals[period]})"
+            )
+
     # Get the VaR for each period using the historical and analytical
     # method.
     for key, value in var.items():
-        partial_analytical_var = simple_analysis.get_simulated_var(
-            alpha=ALPHA,
-            at_step=PERIODS[key],
-        )
+        partial_analytical_var = analytical_var[PERIODS[key]]
 
         value["analytical"] = (1 + partial_analytical_var) / total_risk_adjustment
 
@@ -148,12 +285,7 @@ for ticker, token in config["collateral"][NETWORK].items():
             f"The analytical VaR (after risk adjustment) for {col_token.ticker} is: {value['analytical']}"
         )
 
-        # create a rolling window of returns for the given window size(=PERIODS[key])
-        hist_var = token_pair.prices.pct_change(PERIODS[key]).dropna()
-        hist_var = hist_var.sort_values("Price", ascending=False)
-        partial_historical_var = hist_var.iloc[
-            int(len(hist_var) * ALPHA),
-        ][0]
+        partial_historical_var = historical_var[PERIODS[key]][ALPHA]
 
         value["historical"] = (1 + partial_historical_var) / total_risk_adjustment
 
@@ -169,52 +301,197 @@ for ticker, token in config["collateral"][NETWORK].items():
             f"The historical VaR (after risk adjustment) for {col_token.ticker} is: {value['historical']}"
         )
 
-    # Quick and dirty, this computes the increments between the thresholds!
-    # VaR (and hence thresholds) scale by the square root of time, so
-    # 0-7 days VaR will be a larger increment than 7-14 days etc.
-    # We want large increments between Safe_mint and premium_redeem
-    # and need less safety margin between premium_redeem and liquidation.
-    var_lists = {"analytical": [], "historical": []}
-    increments = {"analytical": [], "historical": []}
+    # The thresholds are computed from the increments between the VaR of the periods
     thresholds = {
-        "liquidation": {"analytical": None, "historical": None},
-        "premium_redeem": {"analytical": None, "historical": None},
-        "safe_mint": {"analytical": None, "historical": None},
+        method: get_thresholds({key: value[method] for key, value in var.items()})
+        for method in ["analytical", "historical"]
     }
 
-    for method in var_lists.keys():
-        for key in var.keys():
-            var_lists[method].append(var[key][method])
-    var_lists["analytical"].append(1)
-    var_lists["historical"].append(1)
-
-    for k in var_lists.keys():
-        for i in range(len(var_lists[k]) - 1):
-            increments[k].append(var_lists[k][i + 1] - var_lists[k][i])
-
-    for i, key in enumerate(thresholds.keys()):
+    for key in var.keys():
+        rounded_threshold = round_up_to_nearest_5(
+            max(thresholds["analytical"][key], thresholds["historical"][key]) * 100
+        )
 
         logging.debug(
-            f"The summed increments for the analytical {key} threshold are: {sum(increments['analytical'][: i + 1])}"
+            f"The {key} threshold based on the analytical VaR for a confidence level of {ALPHA*100}% of {ticker}/{token_pair.quote_token.ticker} over {PERIODS[key]} days is: {round(thresholds['analytical'][key] *100,3)}%"
         )
         logging.debug(
-            f"The summed increments for the historical {key} threshold are: {sum(increments['historical'][: i + 1])}"
+            f"The {key} threshold based on the historic VaR for a confidence level of {ALPHA*100}% of {ticker}/{token_pair.quote_token.ticker} over {PERIODS[key]} days is: {round(thresholds['historical'][key] *100,3)}%"
         )
+        logging.info(f"The suggested {key} threshold is {rounded_threshold}%")
 
-        thresholds[key]["analytical"] = 1 / (1 - sum(increments["analytical"][: i + 1]))
-        thresholds[key]["historical"] = 1 / (1 - sum(increments["historical"][: i + 1]))
-
-    for key, value in thresholds.items():
-        rounded_threshold = round_up_to_nearest_5(
-            max(thresholds[key]["analytical"], thresholds[key]["historical"]) * 100
+    # Optionally, draw the quantile bands of the simulated paths as fan chart. At most one chunk
+    # of paths is simulated for it, so that the memory stays bounded like in the simulation check.
+    if config["analysis"].get("plot_directory"):
+        check_sim.simulate(
+            steps=1,
+            maturity=PERIODS["liquidation"],
+            n_simulations=min(config["analysis"]["n_simulations"], config["analysis"]["chunk_size"]),
+            initial_value=1,
+            sigma=token_pair.returns.std()[0],
+            mu=mu,
+            backend="numpy",
+            seed=seed,
+            sampling=config["analysis"]["sampling"],
+            path_bank=path_bank,
+            process_params=process_params,
+            cache=simulation_cache,
+        )
+        os.makedirs(config["analysis"]["plot_directory"], exist_ok=True)
+        filename = os.path.join(
+            config["analysis"]["plot_directory"],
+            f"{ticker}_{token_pair.quote_token.ticker}.{config['analysis'].get('plot_format', 'png')}",
         )
+        Analysis(check_sim).plot_returns(
+            None,
+            f"{token_pair.base_token.ticker}/{token_pair.quote_token.ticker}",
+            type="fan",
+            n_sample_paths=20,
+            filename=filename,
+            seed=0,
+        )
+        logging.info(f"Fan chart of the simulated paths written to {filename}")
 
-        logging.debug(
-            f"The {key} threshold based on the analytical VaR for a confidence level of {ALPHA*100}% of {ticker}/{token_pair.quote_token.ticker} over {PERIODS[key]} days is: {round(thresholds[key]['analytical'] *100,3)}%"
+
+def analyse_portfolio(
+    collateral: Dict[str, dict], price_matrix: Price_Matrix, seed: np.random.SeedSequence
+) -> None:
+    """Simulates correlated paths of all collateral and compares the VaR of a portfolio that holds every collateral
+    up to its supply cap with the VaR of each collateral on its own, i.e. the diversification of the portfolio.
+
+    Args:
+        collateral (Dict[str, dict]): Config of the collateral by ticker.
+        price_matrix (Price_Matrix): USD prices of all collateral, proxies and the debt token.
+        seed (np.random.SeedSequence): Seed of the random number generator of the simulation.
+    """
+    # The value of the supply cap of each collateral in the debt currency is its weight in the portfolio.
+    # Collateral without a sufficient history moves like its proxy, like in the analysis of each collateral.
+    weights = {}
+    proxies = {}
+    for ticker, token in collateral.items():
+        if not token.get("supply_cap"):
+            logging.debug(f"{ticker} is not part of the portfolio because it has no supply cap")
+            continue
+        prices = price_matrix.pair(ticker, debt_token.ticker)
+        if not has_sufficient_prices(prices) and token.get("proxy"):
+            proxies[ticker] = next(iter(token["proxy"]))
+        if prices.empty:
+            prices = price_matrix.pair(proxies.get(ticker, ticker), debt_token.ticker)
+        weights[ticker] = token["supply_cap"] * prices["Price"].iloc[-1]
+
+    sim = Multi_Asset_Simulation.from_price_matrix(
+        price_matrix, list(weights), debt_token.ticker, proxies
+    )
+    logging.debug(f"Correlation of the daily returns of the collateral:\n{sim.correlation}")
+    # all paths of all collateral are kept in memory, so at most one chunk of paths is simulated
+    sim.simulate(
+        steps=1,
+        maturity=PERIODS["liquidation"],
+        n_simulations=min(config["analysis"]["n_simulations"], config["analysis"]["chunk_size"]),
+        mu=0,
+        seed=seed,
+        sampling=config["analysis"]["sampling"],
+        cache=simulation_cache,
+    )
+
+    analysis = Analysis(sim)
+    portfolio_var = analysis.get_portfolio_var(ALPHA, weights, list(PERIODS.values()))
+    single_asset_var = {
+        ticker: analysis.get_portfolio_var(ALPHA, {ticker: 1}, list(PERIODS.values()))
+        for ticker in weights
+    }
+    total = sum(weights.values())
+    for key, period in PERIODS.items():
+        undiversified_var = sum(
+            weight / total * single_asset_var[ticker][period] for ticker, weight in weights.items()
         )
-        logging.debug(
-            f"The {key} threshold based on the historic VaR for a confidence level of {ALPHA*100}% of {ticker}/{token_pair.quote_token.ticker} over {PERIODS[key]} days is: {round(thresholds[key]['historical'] *100,3)}%"
+        logging.info(
+            f"The simulated VaR of the portfolio of all collateral over {period} days ({key}) is {round(portfolio_var[period] * 100, 3)}%, "
+            f"the weighted VaR of each collateral on its own is {round(undiversified_var * 100, 3)}%"
         )
-        logging.info(f"The suggested {key} threshold is {rounded_threshold}%")
 
-# %%
+
+if __name__ == "__main__":
+    logger = logging.getLogger()
+    logging.basicConfig(filename="analysis.log", level=logging.DEBUG)
+    consoleHandler = logging.StreamHandler(sys.stdout)
+    consoleHandler.setLevel(logging.INFO)
+    logger.addHandler(consoleHandler)
+
+    print_banner()
+
+    logging.info(f"Date of the analysis: {datetime.today()}")
+    logging.info("====================================================================")
+    logging.info("Start running the collateral analysis with the following parameters:")
+    logging.info(
+        f"""
+    Debt currency:              {DEBT}
+    Data source:                {DATA_SOURCE}
+    Granularity of the prices:  {config["data"]["granularity"]}
+    Confidence level (alpha):   {ALPHA*100}%
+    Number of path simulations: {config["analysis"]["n_simulations"] if config["analysis"]["simulation_check"] else "only for processes other than the GBM (closed form)"}
+    Drawdowns of the GBM:       {"observed once per day" if config["analysis"].get("continuity_correction") else "observed continuously"}
+    Tolerance of the VaR:       {config["analysis"].get("tolerance") or "none (all paths)"}
+    Simulated process:          {config["analysis"].get("strategy", "GBM")}
+    Historical sample period:   {config["analysis"]["historical_sample_period"]}
+    Historical VaR mode:        {config["analysis"]["historical_mode"]}
+    Threshold period in days:
+        Safe Mint:              {PERIODS["liquidation"]}
+        Premium Redeem:         {PERIODS["premium_redeem"]}
+        Liquidations:           {PERIODS["safe_mint"]}
+    """
+    )
+    logging.info("====================================================================")
+
+    # Every collateral gets its own, independent random stream, spawned from a single seed.
+    # Logging the entropy of the seed makes the run reproducible.
+    collateral = config["collateral"][NETWORK]
+    seed_sequence = np.random.SeedSequence(config["analysis"].get("seed"))
+    logging.info(f"Seed of the simulation: {seed_sequence.entropy}")
+    seeds = seed_sequence.spawn(len(collateral))
+
+    # Request the USD prices of all collateral, proxies and the debt token concurrently.
+    # The prices of each pair are derived from them, so each asset is only requested once,
+    # independent of the debt currency.
+    price_matrix = Price_Matrix.from_assets(
+        get_assets(collateral, debt_token.ticker, debt_token.name),
+        data_source=DATA_SOURCE,
+        start_date=start_date,
+        cache=price_cache,
+        granularity=config["data"]["granularity"],
+    )
+
+    # Each collateral is analysed in a separate process. The log records of each job
+    # are emitted once the job is done, in the order of the config.
+    with tempfile.TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(
+        max_workers=config["analysis"].get("workers"), initializer=init_worker
+    ) as executor:
+        # The random numbers of the simulation can be drawn once and shared by all workers
+        # through a memory-mapped file, so that every collateral uses the same random numbers.
+        path_bank_file = None
+        if config["analysis"]["simulation_check"] and config["analysis"]["path_bank"]:
+            path_bank_file = os.path.join(tmp_dir, "path_bank.npy")
+            Path_Bank(
+                PERIODS["liquidation"],
+                config["analysis"]["n_simulations"],
+                seed=seed_sequence.spawn(1)[0],
+                sampling=config["analysis"]["sampling"],
+                filename=path_bank_file,
+            )
+
+        jobs = [
+            executor.submit(run_job, ticker, token, price_matrix, seed, path_bank_file)
+            for (ticker, token), seed in zip(collateral.items(), seeds)
+        ]
+        for job in jobs:
+            for record in job.result():
+                logger.handle(record)
+
+    # Optionally, simulate all collateral jointly to see the diversification and the joint crashes of a portfolio
+    if config["analysis"].get("portfolio_check"):
+        logging.info("====================================================================")
+        logging.info("Start analysing the portfolio of all collateral...")
+        try:
+            analyse_portfolio(collateral, price_matrix, seed_sequence.spawn(1)[0])
+        except Exception:
+            logging.exception("Failed to analyse the portfolio")
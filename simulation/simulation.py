@@ -1,4 +1,9 @@
-from data.data_request import Token_Pair
+from data.data_request import Token_Pair, granularities
+from data.price_matrix import Price_Matrix
+from analysis.drawdown import get_initial_drawdowns
+from analysis.quantile_sketch import Quantile_Sketch
+from simulation.simulation_cache import Simulation_Cache
+from typing import Dict, List
 import QuantLib as ql
 import numpy as np
 from datetime import datetime
@@ -17,7 +22,7 @@ def parse_date_to_quantlib(date: pd.Timestamp) -> ql.Date:
     date = datetime.strftime(date, "%d-%m-%Y")
     return ql.Date(*[int(i) for i in date.split("-")])
 
-def path_generator(process, maturity: float, nSteps: int):
+def path_generator(process, maturity: float, nSteps: int, seed: int = 0):
     """Returns a path generator for any process by first, generating a uniform_sequence_generator for the given dimensions.
     Secondly, it creates a gaussian_sequence_generator, using the uniform_sequence_generator. Lastly it returns a GaussianMultiPathGenerator iterator-object,
     which can be used to generate random paths using the given process.
@@ -28,6 +33,7 @@ def path_generator(process, maturity: float, nSteps: int):
             E.g. if you have steps that represent one day, you can create a time series with the maturity of two years by using 365 steps and a maturity of 2.
         nSteps (_type_): The number of steps within one period of the maturity. The unit is determined by the time units of the sample. 
             E.g. if you have estimate the mean and standard deviation from a sample of daily data, each step will be generated based on those values.
+        seed (int, optional): Seed of the uniform random generator. QuantLib seeds from the clock if 0. Defaults to 0.
 
     Returns:
         _type_: _description_
@@ -36,7 +42,7 @@ def path_generator(process, maturity: float, nSteps: int):
     times = ql.TimeGrid(maturity, nSteps)
 
     unifrom_sequence_generator = ql.UniformRandomSequenceGenerator(
-        dimensions * nSteps, ql.UniformRandomGenerator()
+        dimensions * nSteps, ql.UniformRandomGenerator(seed)
     )
     gaussian_sequence_generator = ql.GaussianRandomSequenceGenerator(
         unifrom_sequence_generator
@@ -44,6 +50,504 @@ def path_generator(process, maturity: float, nSteps: int):
     return ql.GaussianMultiPathGenerator(
         process, list(times), gaussian_sequence_generator, False
     )
+
+
+def brownian_bridge(gaussians: np.ndarray) -> np.ndarray:
+    """Turns independent standard normal variates into the increments of brownian motion paths using a brownian bridge
+    (see QuantLib's BrownianBridge). The first variate of each path determines its terminal value, the second one its mid point etc.,
+    so that most of the variance of the paths is driven by the first dimensions of a low discrepancy sequence.
+
+    Args:
+        gaussians (np.ndarray): Standard normal variates with the shape (nSteps, n_simulations).
+
+    Returns:
+        np.ndarray: Standard normal increments with the shape (nSteps, n_simulations).
+    """
+    bridge = ql.BrownianBridge(len(gaussians))
+    bridge_index, left_index, right_index = bridge.bridgeIndex(), bridge.leftIndex(), bridge.rightIndex()
+    left_weight, right_weight, std_deviation = bridge.leftWeight(), bridge.rightWeight(), bridge.stdDeviation()
+
+    path = np.empty_like(gaussians)
+    path[-1] = std_deviation[0] * gaussians[0]
+    for i in range(1, len(gaussians)):
+        path[bridge_index[i]] = right_weight[i] * path[right_index[i]] + std_deviation[i] * gaussians[i]
+        if left_index[i] != 0:
+            path[bridge_index[i]] += left_weight[i] * path[left_index[i] - 1]
+
+    path[1:] -= path[:-1].copy()
+    return path
+
+
+def sobol_gaussians(
+    dimension: int, n_simulations: int, rng: np.random.Generator
+) -> np.ndarray:
+    """Draws the points of a scrambled sobol sequence and turns them into standard normal variates.
+
+    Args:
+        dimension (int): Dimension of each point.
+        n_simulations (int): Number of points.
+        rng (np.random.Generator): Random number generator used to seed the scrambling.
+
+    Returns:
+        np.ndarray: Standard normal variates with the shape (dimension, n_simulations), where each column is one point.
+    """
+    # the scrambling is seeded from the generator, so every simulation gets an independent randomization
+    sequence_generator = ql.InvCumulativeBurley2020SobolGaussianRsg(
+        ql.Burley2020SobolRsg(
+            dimension, 42, ql.SobolRsg.Jaeckel, int(rng.integers(1, 2**31))
+        )
+    )
+    gaussians = np.array(
+        [sequence_generator.nextSequence().value() for _ in range(n_simulations)]
+    ).reshape(n_simulations, dimension)
+    return gaussians.T
+
+
+def standard_normal_increments(
+    out: np.ndarray, rng: np.random.Generator, sampling: str = "pseudo"
+) -> None:
+    """Fills 'out' with standard normal increments, where each column represents the increments of one path.
+
+    Args:
+        out (np.ndarray): Array with the shape (nSteps, n_simulations) that is filled with the increments.
+        rng (np.random.Generator): Random number generator used to draw the increments (or to seed the sobol sequence).
+        sampling (str, optional): "pseudo" draws independent pseudo-random numbers.
+            "antithetic" draws half of the paths and mirrors them to get the other half.
+            "sobol" uses a scrambled sobol sequence with a brownian bridge construction. Defaults to "pseudo".
+    """
+    nSteps, n_simulations = out.shape
+    if sampling == "pseudo":
+        rng.standard_normal(out=out)
+    elif sampling == "antithetic":
+        n_draws = (n_simulations + 1) // 2
+        out[:, :n_draws] = rng.standard_normal((nSteps, n_draws))
+        np.negative(out[:, : n_simulations - n_draws], out=out[:, n_draws:])
+    elif sampling == "sobol":
+        out[:] = brownian_bridge(sobol_gaussians(nSteps, n_simulations, rng))
+    else:
+        raise Exception(f"Sampling {sampling} is not supported.")
+
+
+def geometric_brownian_motion_paths(
+    initial_value: float,
+    mu: float,
+    sigma: float,
+    maturity: float,
+    nSteps: int,
+    n_simulations: int,
+    rng: np.random.Generator = None,
+    sampling: str = "pseudo",
+    increments: np.ndarray = None,
+) -> np.ndarray:
+    """Generates all paths of a geometric brownian motion at once.
+
+    The paths follow the same Euler discretization as QuantLib's GeometricBrownianMotionProcess
+    (x_t+dt = x_t * (1 + mu * dt + sigma * sqrt(dt) * z)), so the results have the same distribution
+    as the paths of the QuantLib path generator.
+
+    Args:
+        initial_value (float): The initial value of every path.
+        mu (float): The drift of the process per time unit.
+        sigma (float): The standard deviation of the process per time unit.
+        maturity (float): The maturity at which the process ends.
+        nSteps (int): The total number of steps between 0 and the maturity.
+        n_simulations (int): Number of paths to generate.
+        rng (np.random.Generator): Random number generator used to draw the gaussian increments.
+        sampling (str, optional): Sampling of the gaussian increments (see 'standard_normal_increments'). Defaults to "pseudo".
+        increments (np.ndarray, optional): Standard normal increments with the shape (nSteps, n_simulations) to use instead of drawing new ones,
+            e.g. from a 'Path_Bank'. Defaults to None.
+
+    Returns:
+        np.ndarray: Array with the shape (nSteps + 1, n_simulations) where each column is one path.
+    """
+    dt = maturity / nSteps
+    paths = np.empty((nSteps + 1, n_simulations))
+    paths[0] = initial_value
+    # the gaussian increments are written into the path array and turned into prices in place
+    # to avoid allocating a second array of the same size
+    if increments is None:
+        standard_normal_increments(paths[1:], rng, sampling)
+    else:
+        paths[1:] = increments
+    paths[1:] *= sigma * np.sqrt(dt)
+    paths[1:] += 1 + mu * dt
+    np.cumprod(paths, axis=0, out=paths)
+    return paths
+
+
+def merton_jump_diffusion_paths(
+    initial_value: float,
+    mu: float,
+    sigma: float,
+    maturity: float,
+    nSteps: int,
+    n_simulations: int,
+    jump_intensity: float,
+    mean_log_jump: float,
+    jump_volatility: float,
+    rng: np.random.Generator = None,
+    sampling: str = "pseudo",
+    increments: np.ndarray = None,
+) -> np.ndarray:
+    """Generates all paths of a Merton jump diffusion at once.
+
+    The log price of each step is the exact step of a GBM plus the sum of the normally distributed log jumps of the step.
+    The jumps of all paths are drawn at once, so the cost of the jumps grows with their number, not with the number of steps.
+    The drift is compensated for the mean jump, so that the expected price grows with 'mu' like the GBM.
+
+    Args:
+        initial_value (float): The initial value of every path.
+        mu (float): The drift of the process per time unit.
+        sigma (float): The standard deviation of the diffusion per time unit.
+        maturity (float): The maturity at which the process ends.
+        nSteps (int): The total number of steps between 0 and the maturity.
+        n_simulations (int): Number of paths to generate.
+        jump_intensity (float): Expected number of jumps per time unit.
+        mean_log_jump (float): Mean of the log of the jumps.
+        jump_volatility (float): Standard deviation of the log of the jumps.
+        rng (np.random.Generator, optional): Random number generator used to draw the increments and jumps. Defaults to None.
+        sampling (str, optional): Sampling of the gaussian increments of the diffusion (see 'standard_normal_increments'),
+            the jumps are always drawn pseudo-randomly. Defaults to "pseudo".
+        increments (np.ndarray, optional): Standard normal increments of the diffusion with the shape (nSteps, n_simulations)
+            to use instead of drawing new ones, e.g. from a 'Path_Bank'. Defaults to None.
+
+    Returns:
+        np.ndarray: Array with the shape (nSteps + 1, n_simulations) where each column is one path.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    dt = maturity / nSteps
+    # the log returns are accumulated in the path array and turned into prices in place
+    paths = np.empty((nSteps + 1, n_simulations))
+    paths[0] = 0
+    if increments is None:
+        standard_normal_increments(paths[1:], rng, sampling)
+    else:
+        paths[1:] = increments
+    compensator = jump_intensity * (np.exp(mean_log_jump + 0.5 * jump_volatility**2) - 1)
+    paths[1:] *= sigma * np.sqrt(dt)
+    paths[1:] += (mu - compensator - 0.5 * sigma**2) * dt
+
+    # The jumps of all steps and paths are drawn as one batch of events, each of which falls on a uniformly chosen
+    # step of a path, so that the number of jumps of every step is Poisson distributed with the mean 'jump_intensity * dt'.
+    n_steps = nSteps * n_simulations
+    n_jumps = rng.poisson(jump_intensity * dt * n_steps)
+    log_jumps = mean_log_jump + jump_volatility * rng.standard_normal(n_jumps)
+    log_returns = paths[1:].reshape(-1)
+    log_returns += np.bincount(rng.integers(0, n_steps, size=n_jumps), weights=log_jumps, minlength=n_steps)
+
+    np.cumsum(paths, axis=0, out=paths)
+    np.exp(paths, out=paths)
+    paths *= initial_value
+    return paths
+
+
+def heston_paths(
+    initial_value: float,
+    mu: float,
+    maturity: float,
+    nSteps: int,
+    n_simulations: int,
+    v0: float,
+    kappa: float,
+    theta: float,
+    rho: float,
+    vol_of_vol: float,
+    rng: np.random.Generator = None,
+    sampling: str = "pseudo",
+    increments: np.ndarray = None,
+) -> np.ndarray:
+    """Generates all paths of a Heston process at once with the full truncation Euler scheme, i.e. the variance may become
+    negative, but only its positive part is used in the drift and diffusion of the variance and the price.
+    Every step is a single vectorized update of all paths.
+
+    Args:
+        initial_value (float): The initial value of every path.
+        mu (float): The drift of the price per time unit.
+        maturity (float): The maturity at which the process ends.
+        nSteps (int): The total number of steps between 0 and the maturity.
+        n_simulations (int): Number of paths to generate.
+        v0 (float): Initial variance per time unit.
+        kappa (float): Speed of the mean reversion of the variance.
+        theta (float): Long run variance per time unit.
+        rho (float): Correlation between the price and its variance.
+        vol_of_vol (float): Volatility of the variance.
+        rng (np.random.Generator, optional): Random number generator used to draw the increments. Defaults to None.
+        sampling (str, optional): Sampling of the gaussian increments (see 'standard_normal_increments'). Defaults to "pseudo".
+        increments (np.ndarray, optional): Standard normal increments of the price with the shape (nSteps, n_simulations)
+            to use instead of drawing new ones, e.g. from a 'Path_Bank'. Defaults to None.
+
+    Returns:
+        np.ndarray: Array with the shape (nSteps + 1, n_simulations) where each column is one path.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    dt = maturity / nSteps
+    if increments is None:
+        increments = np.empty((nSteps, n_simulations))
+        standard_normal_increments(increments, rng, sampling)
+    # the increments of the variance are correlated with the increments of the price
+    variance_increments = np.empty((nSteps, n_simulations))
+    standard_normal_increments(variance_increments, rng, sampling)
+    variance_increments *= vol_of_vol * np.sqrt(1 - rho**2)
+    variance_increments += vol_of_vol * rho * increments
+
+    # the log prices are accumulated in the path array and turned into prices in place
+    paths = np.empty((nSteps + 1, n_simulations))
+    paths[0] = 0
+    variance = np.full(n_simulations, float(v0))
+    positive_variance = np.empty(n_simulations)
+    std_deviation = np.empty(n_simulations)
+    for i in range(nSteps):
+        np.maximum(variance, 0, out=positive_variance)
+        np.sqrt(positive_variance, out=std_deviation)
+        std_deviation *= np.sqrt(dt)
+        paths[i + 1] = paths[i] + (mu - 0.5 * positive_variance) * dt + std_deviation * increments[i]
+        variance += kappa * (theta - positive_variance) * dt + std_deviation * variance_increments[i]
+
+    np.exp(paths, out=paths)
+    paths *= initial_value
+    return paths
+
+
+def block_bootstrap_paths(
+    returns: np.ndarray,
+    initial_value: float,
+    nSteps: int,
+    n_simulations: int,
+    block_length: int,
+    rng: np.random.Generator = None,
+    stride: int = 1,
+) -> np.ndarray:
+    """Generates all paths at once by resampling blocks of consecutive historical returns (moving block bootstrap),
+    so that the paths have the empirical tails and the short term dependence of the returns.
+
+    The start of every block of every path is drawn at once, the indices of all returns of the paths are computed from
+    them in a single array and the returns are gathered into the path array with one 'np.take'.
+
+    Args:
+        returns (np.ndarray): Historical returns over one step, e.g. daily returns.
+        initial_value (float): The initial value of every path.
+        nSteps (int): The total number of steps of each path.
+        n_simulations (int): Number of paths to generate.
+        block_length (int): Number of consecutive returns in each block.
+        rng (np.random.Generator, optional): Random number generator used to draw the starts of the blocks. Defaults to None.
+        stride (int, optional): Number of returns between two consecutive returns of a block, e.g. 24 for daily returns
+            of hourly bars, which overlap. Defaults to 1.
+
+    Returns:
+        np.ndarray: Array with the shape (nSteps + 1, n_simulations) where each column is one path.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    span = (block_length - 1) * stride
+    if len(returns) <= span:
+        raise Exception(
+            f"{len(returns)} returns are not enough for blocks of {block_length} returns."
+        )
+
+    n_blocks = -(-nSteps // block_length)
+    starts = rng.integers(0, len(returns) - span, size=(n_blocks, 1, n_simulations))
+    offsets = (np.arange(block_length) * stride)[None, :, None]
+    indices = (starts + offsets).reshape(n_blocks * block_length, n_simulations)[:nSteps]
+
+    paths = np.empty((nSteps + 1, n_simulations))
+    paths[0] = initial_value
+    np.take(returns, indices, out=paths[1:])
+    paths[1:] += 1
+    np.cumprod(paths, axis=0, out=paths)
+    return paths
+
+
+def get_covariance_factor(covariance: np.ndarray) -> np.ndarray:
+    """Returns a factor L of the covariance matrix with L @ L.T = covariance, which turns independent standard normal
+    increments z into increments L @ z with that covariance.
+
+    The factor is the Cholesky decomposition. A covariance that is estimated from pairwise complete returns of assets with
+    different histories may not be positive semi-definite, and the covariance of an asset with its proxy may be singular,
+    in which case the factor is taken from the eigendecomposition with negative eigenvalues set to 0, i.e. it is the
+    factor of the nearest positive semi-definite matrix.
+
+    Args:
+        covariance (np.ndarray): Symmetric covariance matrix with the shape (n_assets, n_assets).
+
+    Returns:
+        np.ndarray: The factor with the shape (n_assets, n_assets).
+    """
+    try:
+        return np.linalg.cholesky(covariance)
+    except np.linalg.LinAlgError:
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        return eigenvectors * np.sqrt(np.clip(eigenvalues, 0, None))
+
+
+def correlated_geometric_brownian_motion_paths(
+    initial_values: np.ndarray,
+    mu: np.ndarray,
+    covariance: np.ndarray,
+    maturity: float,
+    nSteps: int,
+    n_simulations: int,
+    rng: np.random.Generator = None,
+    sampling: str = "pseudo",
+) -> np.ndarray:
+    """Generates all paths of several correlated geometric brownian motions at once.
+
+    The independent gaussian increments of all steps, paths and assets are drawn into a single array and correlated with
+    one batched matrix product with the factor of the covariance (see 'get_covariance_factor'). Each asset follows the same
+    Euler discretization as 'geometric_brownian_motion_paths'.
+
+    Args:
+        initial_values (np.ndarray): The initial value of every path of each asset.
+        mu (np.ndarray): The drift of each asset per time unit.
+        covariance (np.ndarray): Covariance matrix of the returns of the assets per time unit, with the shape (n_assets, n_assets).
+        maturity (float): The maturity at which the process ends.
+        nSteps (int): The total number of steps between 0 and the maturity.
+        n_simulations (int): Number of paths to generate.
+        rng (np.random.Generator): Random number generator used to draw the gaussian increments.
+        sampling (str, optional): Sampling of the gaussian increments (see 'standard_normal_increments'). Defaults to "pseudo".
+
+    Returns:
+        np.ndarray: Array with the shape (nSteps + 1, n_simulations, n_assets) where paths[:, i, j] is the i-th path of the j-th asset.
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    n_assets = len(covariance)
+    dt = maturity / nSteps
+    if sampling == "sobol":
+        # Each path is one point of the sequence with a dimension per step and asset. Consecutive points are stratified
+        # against each other, so the assets of a path can't be consecutive points, which would correlate them. The dimensions
+        # are ordered by the brownian bridge of all assets, so that the first dimensions drive the terminal values of all assets.
+        gaussians = brownian_bridge(
+            sobol_gaussians(nSteps * n_assets, n_simulations, rng)
+            .reshape(nSteps, n_assets, n_simulations)
+            .transpose(0, 2, 1)
+        )
+    else:
+        gaussians = np.empty((nSteps, n_simulations, n_assets))
+        # the assets of a path are consecutive columns, so that antithetic sampling mirrors whole paths for an even number of paths
+        standard_normal_increments(gaussians.reshape(nSteps, n_simulations * n_assets), rng, sampling)
+
+    paths = np.empty((nSteps + 1, n_simulations, n_assets))
+    paths[0] = initial_values
+    # the steps and paths are flattened into the rows of a single matrix product
+    np.matmul(
+        gaussians.reshape(-1, n_assets),
+        get_covariance_factor(np.asarray(covariance) * dt).T,
+        out=paths[1:].reshape(-1, n_assets),
+    )
+    paths[1:] += 1 + np.asarray(mu) * dt
+    np.cumprod(paths, axis=0, out=paths)
+    return paths
+
+
+class Path_Bank:
+    """A bank of standard normal increments that is generated once and turned into the paths of a GBM
+    for any sigma and mu with a single vectorized transform.
+
+    Using the same increments for every token pair (common random numbers) means that the random numbers
+    only need to be drawn once per run and that differences between the results of token pairs or configs
+    are caused by their parameters, not by the noise of the simulation.
+    """
+
+    def __init__(
+        self,
+        nSteps: int,
+        n_simulations: int,
+        seed: int = None,
+        sampling: str = "pseudo",
+        filename: str = None,
+    ):
+        """Initializing the path bank by drawing the increments.
+
+        Args:
+            nSteps (int): The total number of steps of each path.
+            n_simulations (int): Number of paths in the bank.
+            seed (int, optional): Seed of the random number generator. Defaults to None.
+            sampling (str, optional): Sampling of the increments (see 'standard_normal_increments'). Defaults to "pseudo".
+            filename (str, optional): If given, the increments are stored in a memory-mapped .npy file, so that
+                other processes can load the bank without copying it (see 'load'). Defaults to None.
+        """
+        if filename is None:
+            self._increments = np.empty((nSteps, n_simulations))
+        else:
+            self._increments = np.lib.format.open_memmap(
+                filename, mode="w+", shape=(nSteps, n_simulations)
+            )
+        standard_normal_increments(self._increments, np.random.default_rng(seed), sampling)
+        self._filename = filename
+        self._fingerprint = None
+
+    @classmethod
+    def load(cls, filename: str) -> "Path_Bank":
+        """Loads a path bank that has been stored in a file as a read-only memory map.
+
+        Args:
+            filename (str): The .npy file of the path bank.
+
+        Returns:
+            Path_Bank: The path bank.
+        """
+        path_bank = cls.__new__(cls)
+        path_bank._increments = np.load(filename, mmap_mode="r")
+        path_bank._filename = filename
+        path_bank._fingerprint = None
+        return path_bank
+
+    @property
+    def increments(self) -> np.ndarray:
+        return self._increments
+
+    @property
+    def filename(self) -> str:
+        return self._filename
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the increments, e.g. to identify the bank in the key of a 'Simulation_Cache'. It is computed once."""
+        if self._fingerprint is None:
+            self._fingerprint = Simulation_Cache.hash_array(self._increments)
+        return self._fingerprint
+
+    @property
+    def nSteps(self) -> int:
+        return self._increments.shape[0]
+
+    @property
+    def n_simulations(self) -> int:
+        return self._increments.shape[1]
+
+    def paths(
+        self,
+        sigma: float,
+        mu: float = 0,
+        maturity: float = None,
+        initial_value: float = 1,
+        start: int = 0,
+        stop: int = None,
+    ) -> np.ndarray:
+        """Turns the increments of the paths between 'start' and 'stop' into the paths of a GBM
+        (see 'geometric_brownian_motion_paths').
+
+        Args:
+            sigma (float): The standard deviation of the process per time unit.
+            mu (float, optional): The drift of the process per time unit. Defaults to 0.
+            maturity (float, optional): The maturity at which the process ends. If None, every step is one time unit. Defaults to None.
+            initial_value (float, optional): The initial value of every path. Defaults to 1.
+            start (int, optional): Index of the first path. Defaults to 0.
+            stop (int, optional): Index after the last path. If None, all paths after 'start' are used. Defaults to None.
+
+        Returns:
+            np.ndarray: Array with the shape (nSteps + 1, stop - start) where each column is one path.
+        """
+        increments = self._increments[:, start:stop]
+        return geometric_brownian_motion_paths(
+            initial_value,
+            mu,
+            sigma,
+            self.nSteps if maturity is None else maturity,
+            self.nSteps,
+            increments.shape[1],
+            increments=increments,
+        )
+
+
 class Simulation:
     """This class represents a simulation with different processes.
     """
@@ -84,37 +588,37 @@ class Simulation:
             self._params["sigma"],
         )
 
-    # TODO: Pass the hard coded values as args or kwargs
-    def heston_process(self) -> ql.Merton76Process:
+    def heston_process(self) -> ql.HestonProcess:
+        process_params = self._params["process"]
         riskFreeTS = ql.YieldTermStructureHandle(
             ql.FlatForward(self._params["start_date"],
-                           0.05, ql.Actual365Fixed())
+                           process_params["risk_free_rate"], ql.Actual365Fixed())
         )
         dividendTS = ql.YieldTermStructureHandle(
             ql.FlatForward(self._params["start_date"],
-                           0.01, ql.Actual365Fixed())
+                           process_params["dividend_yield"], ql.Actual365Fixed())
         )
 
-        v0, kappa, theta, rho, sigma = 0.005, 0.8, 0.008, 0.2, self._params["sigma"]
         return ql.HestonProcess(
             riskFreeTS,
             dividendTS,
             self._params["initial_value"],
-            v0,
-            kappa,
-            theta,
-            sigma,
-            rho,
+            process_params["v0"],
+            process_params["kappa"],
+            process_params["theta"],
+            process_params["vol_of_vol"],
+            process_params["rho"],
         )
 
     def merton_jump_diffusion(self) -> ql.Merton76Process:
+        process_params = self._params["process"]
         dividendTS = ql.YieldTermStructureHandle(
             ql.FlatForward(self._params["start_date"],
-                           0.02, ql.Actual365Fixed())
+                           process_params["dividend_yield"], ql.Actual365Fixed())
         )
         riskFreeTS = ql.YieldTermStructureHandle(
             ql.FlatForward(self._params["start_date"],
-                           0.01, ql.Actual365Fixed())
+                           process_params["risk_free_rate"], ql.Actual365Fixed())
         )
         volTS = ql.BlackVolTermStructureHandle(
             ql.BlackConstantVol(
@@ -125,15 +629,9 @@ class Simulation:
             )
         )
 
-        jumpIntensity = ql.QuoteHandle(ql.SimpleQuote(1.0))
-        jumpVolatility = ql.QuoteHandle(
-            ql.SimpleQuote(
-                self._params["sigma"] * np.sqrt(0.25 / jumpIntensity.value())
-            )
-        )
-        meanLogJump = ql.QuoteHandle(
-            ql.SimpleQuote(-jumpVolatility.value() * jumpVolatility.value())
-        )
+        jumpIntensity = ql.QuoteHandle(ql.SimpleQuote(process_params["jump_intensity"]))
+        jumpVolatility = ql.QuoteHandle(ql.SimpleQuote(process_params["jump_volatility"]))
+        meanLogJump = ql.QuoteHandle(ql.SimpleQuote(process_params["mean_log_jump"]))
 
         return ql.Merton76Process(
             self._params["initial_value"],
@@ -145,6 +643,79 @@ class Simulation:
             jumpVolatility,
         )
 
+    def set_params(
+        self,
+        steps: int,
+        maturity: int,
+        sigma: float = None,
+        mu: float = None,
+        initial_value: float = None,
+        process_params: dict = None,
+    ) -> None:
+        """Sets the parameters of the process without simulating any paths, e.g. for analytical estimations.
+        This is called by 'simulate', see there for the arguments.
+        """
+        self._params = {
+            "sigma": sigma if sigma is not None else self.token_pair.returns.std()[0],
+            "mu": mu if mu is not None else self.token_pair.returns.mean()[0],
+            "initial_value": ql.QuoteHandle(
+                ql.SimpleQuote(
+                    initial_value if initial_value else self.token_pair.prices.iloc[0][0])
+            ),
+            "start_date": parse_date_to_quantlib(self.token_pair.prices.index[0]),
+            "maturity": maturity,
+            "total_steps": int(maturity * steps),
+            "_paths": [],
+        }
+        self._params["process"] = self._get_process_params(process_params)
+
+    def _get_process_params(self, process_params: dict = None) -> dict:
+        """Returns the parameters of the jump diffusion, Heston process or bootstrap, see 'process_params' of 'simulate'.
+        Parameters that are not given default to the values of earlier versions, in which they were fixed.
+        Parameters of other processes are ignored, so that a config can hold the parameters of all of them."""
+        sigma = self._params["sigma"]
+        defaults = {
+            "merton_jump_diffusion": {
+                "risk_free_rate": 0.01,
+                "dividend_yield": 0.02,
+                "jump_intensity": 1.0,
+                "jump_volatility": None,
+                "mean_log_jump": None,
+            },
+            "heston_process": {
+                "risk_free_rate": 0.05,
+                "dividend_yield": 0.01,
+                "v0": 0.005,
+                "kappa": 0.8,
+                "theta": 0.008,
+                "rho": 0.2,
+                "vol_of_vol": sigma,
+            },
+            "bootstrap": {
+                "block_length": 5,
+                "volatility_rescaling": False,
+                "ewma_lambda": 0.94,
+            },
+        }
+
+        process_params = process_params or {}
+        unknown_params = set(process_params) - {key for params in defaults.values() for key in params}
+        if unknown_params:
+            raise Exception(
+                f"Unknown process parameters {sorted(unknown_params)}, supported parameters are {dict((strategy, list(params)) for strategy, params in defaults.items())}."
+            )
+        params = dict(defaults.get(self.strategy, {}))
+        params.update(
+            {key: value for key, value in process_params.items() if key in params and value is not None}
+        )
+
+        if self.strategy == "merton_jump_diffusion":
+            if params["jump_volatility"] is None:
+                params["jump_volatility"] = sigma * np.sqrt(0.25 / params["jump_intensity"])
+            if params["mean_log_jump"] is None:
+                params["mean_log_jump"] = -params["jump_volatility"] ** 2
+        return params
+
     def simulate(
         self,
         steps: int,
@@ -153,11 +724,25 @@ class Simulation:
         sigma: float = None,
         mu: float = None,
         initial_value: float = None,
+        backend: str = "quantlib",
+        seed: int = None,
+        sampling: str = "pseudo",
+        path_bank: Path_Bank = None,
+        process_params: dict = None,
+        cache: Simulation_Cache = None,
     ) -> None:
         """
         Given the time unit is days, the default arguments represent a path with a length of 1 year, consisting of 365 days.
         1000 of those paths will be simulated.
 
+        The "quantlib" backend draws the paths one by one from the QuantLib path generator and supports all strategies.
+        The "numpy" backend generates all paths at once into a single array (see 'path_array') and supports the "GBM",
+        "merton_jump_diffusion" and "heston_process" strategies, which drift with 'mu' like the GBM instead of the rates of QuantLib.
+        It also supports the "bootstrap" strategy, which resamples blocks of the daily returns of the token pair (see 'block_bootstrap_paths').
+        Its returns are shifted to the mean 'mu' and, with volatility rescaling, scaled to the current volatility of the
+        returns (filtered historical simulation), 'sigma' is not used.
+        It is much faster for a large number of simulations and the QuantLib backend can still be used to cross-check the results.
+
         Args:
             steps (int): Steps within a period of the maturity.
             maturity (int): Maturity periods determining the length of the simulation.
@@ -165,23 +750,217 @@ class Simulation:
             sigma (float, optional): The standard deviation of the random processes. If None, it defaults to the standard deviation of the sample.
             mu (float, optional): The mean drift of the random process. If None it defaults to the mean of the sample. 
             initial_value (float, optional): The initial value of the random process. If None, it defaults to the initial value of the sample.
+            backend (str, optional): Engine used to generate the paths, either "quantlib" or "numpy". Defaults to "quantlib".
+            seed (int, optional): Seed of the random number generator to make the simulation reproducible. Defaults to None.
+            sampling (str, optional): Sampling of the random numbers used by the numpy backend, either "pseudo", "antithetic" or "sobol"
+                (see 'standard_normal_increments'). The variance reduction of "antithetic" and "sobol" gives the same precision of the VaR
+                with fewer paths. Defaults to "pseudo".
+            path_bank (Path_Bank, optional): If given, the numpy backend uses the increments of the first 'n_simulations' paths of the bank
+                instead of drawing new ones. Defaults to None.
+            process_params (dict, optional): Parameters of the "merton_jump_diffusion" (jump_intensity, mean_log_jump, jump_volatility)
+                or the "heston_process" (v0, kappa, theta, rho, vol_of_vol) per time unit, and the risk_free_rate and dividend_yield
+                of their QuantLib processes. The "bootstrap" takes the block_length in days, volatility_rescaling and the ewma_lambda
+                of the daily volatility. Parameters that are not given keep their defaults. Defaults to None.
+            cache (Simulation_Cache, optional): If given, the paths of the numpy backend are loaded from the cache if they have been
+                simulated with the same parameters and seed before, and stored in it otherwise. Simulations without a seed are
+                not cached. Defaults to None.
 
         Returns:
             None
         """
 
-        self._params = {
-            "sigma": sigma if sigma else self.token_pair.returns.std()[0],
-            "mu": mu if mu else self.token_pair.returns.mean()[0],
-            "initial_value": ql.QuoteHandle(
-                ql.SimpleQuote(
-                    initial_value if initial_value else self.token_pair.prices.iloc[0][0])
-            ),
-            "start_date": parse_date_to_quantlib(self.token_pair.prices.index[0]),
-            "total_steps": int(maturity * steps),
-            "_paths": [],
-        }
+        self.set_params(steps, maturity, sigma, mu, initial_value, process_params)
 
+        if backend == "numpy":
+            self._simulate_numpy(maturity, n_simulations, seed, sampling, path_bank, cache)
+        elif backend == "quantlib":
+            if sampling != "pseudo":
+                raise Exception(
+                    f"Sampling {sampling} is not supported by the quantlib backend."
+                )
+            self._simulate_quantlib(maturity, n_simulations, seed)
+        else:
+            raise Exception(f"Backend {backend} is not supported.")
+
+    def _simulate_numpy(
+        self,
+        maturity: int,
+        n_simulations: int,
+        seed: int = None,
+        sampling: str = "pseudo",
+        path_bank: Path_Bank = None,
+        cache: Simulation_Cache = None,
+    ) -> None:
+        self._check_numpy_simulation(n_simulations, sampling, path_bank)
+        key = self._get_cache_key(cache, "paths", n_simulations, seed, sampling, path_bank)
+        result = cache.load(key) if key is not None else None
+        if result is not None:
+            self.path_array = result["paths"]
+        else:
+            self.path_array = self._numpy_paths(
+                maturity, n_simulations, np.random.default_rng(seed), sampling, path_bank
+            )
+            if key is not None:
+                cache.store(key, {"paths": self.path_array})
+        # the data frame is only a view on the array of paths, not a copy
+        self.paths = pd.DataFrame(self.path_array, copy=False)
+
+    def _check_numpy_simulation(
+        self, n_simulations: int, sampling: str, path_bank: Path_Bank = None
+    ) -> None:
+        if self.strategy not in ["GBM", "merton_jump_diffusion", "heston_process", "bootstrap"]:
+            raise Exception(
+                f"Strategy {self.strategy} is not supported by the numpy backend."
+            )
+        if self.strategy == "bootstrap":
+            # the bootstrap draws historical returns, not standard normal increments
+            if sampling != "pseudo" or path_bank is not None:
+                raise Exception(
+                    "The bootstrap strategy neither supports variance reduction nor a path bank."
+                )
+            if self._params["total_steps"] != self._params["maturity"]:
+                raise Exception("The bootstrap strategy needs one step per day.")
+        if path_bank is not None:
+            self._check_path_bank(path_bank, n_simulations)
+
+    def _get_cache_key(
+        self,
+        cache: Simulation_Cache,
+        kind: str,
+        n_simulations: int,
+        seed,
+        sampling: str,
+        path_bank: Path_Bank = None,
+        **params,
+    ) -> str:
+        """Returns the key of a result of the numpy backend in the cache, which is a hash of all parameters that determine it,
+        or None if there is no cache or no seed, in which case the result is random."""
+        if cache is None or seed is None:
+            return None
+        if isinstance(seed, np.random.SeedSequence):
+            seed = {"entropy": seed.entropy, "spawn_key": list(seed.spawn_key)}
+        return Simulation_Cache.get_key(
+            {
+                "kind": kind,
+                "strategy": self.strategy,
+                "sigma": self._params["sigma"],
+                "mu": self._params["mu"],
+                "initial_value": self._params["initial_value"].value(),
+                "maturity": self._params["maturity"],
+                "total_steps": self._params["total_steps"],
+                "process": self._params["process"],
+                "n_simulations": n_simulations,
+                "seed": seed,
+                "sampling": sampling,
+                "path_bank": path_bank.fingerprint if path_bank is not None else None,
+                # the bootstrap resamples the returns of the token pair, so they are part of the parameters
+                "returns": Simulation_Cache.hash_array(self._bootstrap_returns())
+                if self.strategy == "bootstrap"
+                else None,
+                **params,
+            }
+        )
+
+    def _bootstrap_returns(self) -> np.ndarray:
+        """Returns the daily returns of the token pair that are resampled by the bootstrap, shifted to the mean 'mu' and,
+        with volatility rescaling, divided by their EWMA volatility on the previous day and multiplied by the latest one."""
+        params = self._params["process"]
+        returns = self.token_pair.returns.iloc[:, 0]
+        if params["volatility_rescaling"]:
+            # the decay of the variance per bar, so that 'ewma_lambda' is the decay per day also for hourly bars
+            alpha = 1 - params["ewma_lambda"] ** (1 / self.token_pair.get_bars(1))
+            variance = (returns**2).ewm(alpha=alpha, adjust=False).mean()
+            # the volatility of each return is estimated from the returns before it
+            volatility = np.sqrt(variance.shift(1).fillna(returns.var()))
+            returns = returns / volatility * np.sqrt(variance.iloc[-1])
+        returns = returns.to_numpy(dtype=float)
+        return returns - returns.mean() + self._params["mu"]
+
+    def _numpy_paths(
+        self,
+        maturity: int,
+        n_simulations: int,
+        rng: np.random.Generator,
+        sampling: str = "pseudo",
+        path_bank: Path_Bank = None,
+        start: int = 0,
+    ) -> np.ndarray:
+        """Generates 'n_simulations' paths of the strategy with the numpy backend. With a path bank, the paths are
+        generated from its increments of the paths from 'start' on, the jumps and the variance are still drawn from 'rng'."""
+        params = self._params
+        initial_value = params["initial_value"].value()
+        if self.strategy == "bootstrap":
+            return block_bootstrap_paths(
+                self._bootstrap_returns(),
+                initial_value,
+                params["total_steps"],
+                n_simulations,
+                params["process"]["block_length"],
+                rng,
+                stride=self.token_pair.get_bars(1),
+            )
+
+        increments = None
+        if path_bank is not None:
+            if self.strategy == "GBM":
+                return path_bank.paths(
+                    params["sigma"], params["mu"], maturity, initial_value, start=start, stop=start + n_simulations
+                )
+            increments = path_bank.increments[:, start : start + n_simulations]
+
+        if self.strategy == "merton_jump_diffusion":
+            return merton_jump_diffusion_paths(
+                initial_value,
+                params["mu"],
+                params["sigma"],
+                maturity,
+                params["total_steps"],
+                n_simulations,
+                params["process"]["jump_intensity"],
+                params["process"]["mean_log_jump"],
+                params["process"]["jump_volatility"],
+                rng,
+                sampling,
+                increments,
+            )
+        if self.strategy == "heston_process":
+            return heston_paths(
+                initial_value,
+                params["mu"],
+                maturity,
+                params["total_steps"],
+                n_simulations,
+                params["process"]["v0"],
+                params["process"]["kappa"],
+                params["process"]["theta"],
+                params["process"]["rho"],
+                params["process"]["vol_of_vol"],
+                rng,
+                sampling,
+                increments,
+            )
+        return geometric_brownian_motion_paths(
+            initial_value,
+            params["mu"],
+            params["sigma"],
+            maturity,
+            params["total_steps"],
+            n_simulations,
+            rng,
+            sampling,
+        )
+
+    def _check_path_bank(self, path_bank: Path_Bank, n_simulations: int) -> None:
+        if path_bank.nSteps != self._params["total_steps"]:
+            raise Exception(
+                f"The path bank has {path_bank.nSteps} steps, but the simulation needs {self._params['total_steps']}."
+            )
+        if path_bank.n_simulations < n_simulations:
+            raise Exception(
+                f"The path bank only contains {path_bank.n_simulations} paths, but {n_simulations} are needed."
+            )
+
+    def _simulate_quantlib(self, maturity: int, n_simulations: int, seed: int = None) -> None:
         # TODO: Refactor this to allow more flexibility
         if self.strategy == "GBM":
             process = self.geometric_brownian_motion()
@@ -193,7 +972,7 @@ class Simulation:
             process = self.black_process()
 
         _path_generator = path_generator(
-            process, maturity, self._params["total_steps"]
+            process, maturity, self._params["total_steps"], seed if seed else 0
         )
         # TODO: should this be refactored? If so, how?
         for _ in range(n_simulations):
@@ -204,3 +983,261 @@ class Simulation:
 
         # TODO: Should this rather be stored in token_pair to make it easier to use with the analysis package?
         self.paths = pd.DataFrame(self._params["_paths"]).transpose()
+        self.path_array = self.paths.to_numpy()
+
+    def simulate_streaming(
+        self,
+        steps: int,
+        maturity: int,
+        at_steps: List[int],
+        alpha: float,
+        n_simulations: int = 10_000,
+        chunk_size: int = 100_000,
+        sigma: float = None,
+        mu: float = None,
+        initial_value: float = None,
+        seed: int = None,
+        sampling: str = "pseudo",
+        path_bank: Path_Bank = None,
+        process_params: dict = None,
+        tolerance: float = None,
+        confidence: float = 0.95,
+        cache: Simulation_Cache = None,
+    ) -> None:
+        """Simulates the paths in chunks of 'chunk_size' with the numpy backend and only keeps the initial drawdowns
+        of each chunk in a quantile sketch per step (see 'drawdown_sketches'). The paths themselves are dropped after each chunk.
+        This keeps the memory bounded by the chunk size and the tail of the drawdowns that is needed to read the VaR at 'alpha',
+        so that a very large number of paths can be simulated.
+
+        If a 'tolerance' is given, 'n_simulations' is the maximum number of paths and the simulation stops after the first chunk
+        at which the confidence interval of the VaR at 'alpha' (see 'Quantile_Sketch.get_var_interval') is narrower than the
+        tolerance at every step, so that processes with a low volatility need fewer paths. The number of simulated paths is the
+        count of the sketches.
+
+        Args:
+            steps (int): Steps within a period of the maturity.
+            maturity (int): Maturity periods determining the length of the simulation.
+            at_steps (List[int]): Steps at which the paths are truncated to compute the initial drawdowns (see 'Analysis.get_simulated_var').
+            alpha (float): Lowest confidence level at which the VaR will be read from the sketches.
+            n_simulations (int, optional): Number of paths to be simulated. Defaults to 10,000.
+            chunk_size (int, optional): Number of paths that are simulated at once. Defaults to 100,000.
+            sigma (float, optional): The standard deviation of the random processes. If None, it defaults to the standard deviation of the sample.
+            mu (float, optional): The mean drift of the random process. If None it defaults to the mean of the sample.
+            initial_value (float, optional): The initial value of the random process. If None, it defaults to the initial value of the sample.
+            seed (int, optional): Seed of the random number generator to make the simulation reproducible. Defaults to None.
+            sampling (str, optional): Sampling of the random numbers, either "pseudo", "antithetic" or "sobol". Defaults to "pseudo".
+            path_bank (Path_Bank, optional): If given, the chunks are read from the bank instead of drawing new random numbers. Defaults to None.
+            process_params (dict, optional): Parameters of the jump diffusion, Heston process or bootstrap, see 'simulate'. Defaults to None.
+            tolerance (float, optional): Width of the confidence interval of the VaR at which the simulation stops, e.g. 0.005
+                for 0.5 percentage points. If None, all 'n_simulations' paths are simulated. Defaults to None.
+            confidence (float, optional): Confidence level of the interval that is compared to the tolerance and that can be read
+                from the sketches afterwards. Defaults to 0.95.
+            cache (Simulation_Cache, optional): If given, the drawdown sketches are loaded from the cache if they have been simulated
+                with the same parameters and seed before, and stored in it otherwise. Simulations without a seed are not cached.
+                Defaults to None.
+
+        Returns:
+            None
+        """
+        self.set_params(steps, maturity, sigma, mu, initial_value, process_params)
+        self._check_numpy_simulation(n_simulations, sampling, path_bank)
+        self.paths = None
+        self.path_array = None
+        self.drawdown_sketches = {
+            # the tail also covers the confidence interval of the VaR (see 'Analysis.get_simulated_var_interval')
+            at_step: Quantile_Sketch.for_alpha(alpha, n_simulations, confidence)
+            for at_step in at_steps
+        }
+
+        key = self._get_cache_key(
+            cache,
+            "drawdown_sketches",
+            n_simulations,
+            seed,
+            sampling,
+            path_bank,
+            at_steps=at_steps,
+            alpha=alpha,
+            chunk_size=chunk_size,
+            tolerance=tolerance,
+            confidence=confidence,
+        )
+        result = cache.load(key) if key is not None else None
+        if result is not None:
+            self.drawdown_sketches = {
+                at_step: Quantile_Sketch.from_tail(
+                    int(result["capacities"][i]), result[f"tail_{i}"], int(result["counts"][i])
+                )
+                for i, at_step in enumerate(at_steps)
+            }
+            return
+
+        rng = np.random.default_rng(seed)
+        for start in range(0, n_simulations, chunk_size):
+            stop = min(start + chunk_size, n_simulations)
+            chunk = self._numpy_paths(maturity, stop - start, rng, sampling, path_bank, start)
+            initial_drawdowns = get_initial_drawdowns(chunk, at_steps)
+            for i, at_step in enumerate(at_steps):
+                self.drawdown_sketches[at_step].add(initial_drawdowns[i])
+
+            if tolerance is not None and all(
+                upper - lower <= tolerance
+                for lower, upper in (
+                    sketch.get_var_interval(alpha, confidence) for sketch in self.drawdown_sketches.values()
+                )
+            ):
+                break
+
+        if key is not None:
+            sketches = list(self.drawdown_sketches.values())
+            cache.store(
+                key,
+                {
+                    "capacities": np.array([sketch.capacity for sketch in sketches]),
+                    "counts": np.array([sketch.count for sketch in sketches]),
+                    **{f"tail_{i}": sketch.tail for i, sketch in enumerate(sketches)},
+                },
+            )
+
+
+class Multi_Asset_Simulation:
+    """Joint simulation of several assets, e.g. all collateral of a vault or lending market, whose returns are correlated
+    like their historical returns. The paths of all assets are kept in a single array with the shape (steps + 1, paths, assets),
+    from which the VaR of a portfolio of the assets is read (see 'Analysis.get_portfolio_var').
+    """
+
+    def __init__(self, returns: pd.DataFrame) -> None:
+        """Initializing the simulation.
+
+        Args:
+            returns (pd.DataFrame): Daily returns with one column per asset. Assets with a shorter history have missing returns
+                at the start, the covariance of each pair of assets is estimated from the days on which both have returns.
+        """
+        self._returns = returns
+        self.path_array = None
+
+    @classmethod
+    def from_price_matrix(
+        cls,
+        price_matrix: Price_Matrix,
+        tickers: List[str],
+        quote_ticker: str,
+        proxies: Dict[str, str] = None,
+    ) -> "Multi_Asset_Simulation":
+        """Derives the daily returns of the assets quoted in 'quote_ticker' from a price matrix, like 'Token_Pair.calculate_returns'.
+
+        Args:
+            price_matrix (Price_Matrix): USD prices of the assets, their proxies and the quote token.
+            tickers (List[str]): Tickers of the assets.
+            quote_ticker (str): Ticker of the quote token, e.g. the debt.
+            proxies (Dict[str, str], optional): Ticker of the asset whose prices are used instead, e.g. {"vdot": "dot"}
+                for assets without a sufficient history. Defaults to None.
+
+        Returns:
+            Multi_Asset_Simulation: The simulation.
+        """
+        proxies = proxies or {}
+        quoted_prices = price_matrix.quote(quote_ticker)
+        prices = pd.DataFrame(
+            {ticker: quoted_prices[proxies.get(ticker, ticker)] for ticker in tickers}
+        )
+        # the daily returns of hourly bars overlap, like the returns of a token pair
+        bars = int(pd.Timedelta(1, "D") / pd.Timedelta(granularities[price_matrix.granularity]))
+        return cls(prices.pct_change(periods=bars, fill_method=None).dropna(how="all"))
+
+    @property
+    def tickers(self) -> List[str]:
+        return list(self._returns.columns)
+
+    @property
+    def returns(self) -> pd.DataFrame:
+        return self._returns
+
+    @property
+    def covariance(self) -> pd.DataFrame:
+        """Covariance of the daily returns of each pair of assets."""
+        covariance = self._returns.cov()
+        if covariance.isna().any(axis=None):
+            raise Exception(
+                f"No returns to estimate the covariance of {', '.join(covariance.columns[covariance.isna().any()])}."
+            )
+        return covariance
+
+    @property
+    def correlation(self) -> pd.DataFrame:
+        return self._returns.corr()
+
+    def simulate(
+        self,
+        steps: int,
+        maturity: int,
+        n_simulations: int = 10_000,
+        mu: float = 0,
+        initial_values: float = 1,
+        seed: int = None,
+        sampling: str = "pseudo",
+        covariance: pd.DataFrame = None,
+        cache: Simulation_Cache = None,
+    ) -> None:
+        """Simulates correlated GBM paths of all assets at once (see 'correlated_geometric_brownian_motion_paths')
+        and stores them in 'path_array'.
+
+        Args:
+            steps (int): Steps within a period of the maturity.
+            maturity (int): Maturity periods determining the length of the simulation.
+            n_simulations (int, optional): Number of paths to be simulated. Defaults to 10,000.
+            mu (float, optional): The drift of every asset, or of each asset in the order of 'tickers'. Defaults to 0.
+            initial_values (float, optional): The initial value of every asset, or of each asset in the order of 'tickers'. Defaults to 1.
+            seed (int, optional): Seed of the random number generator to make the simulation reproducible. Defaults to None.
+            sampling (str, optional): Sampling of the random numbers, either "pseudo", "antithetic" or "sobol". Defaults to "pseudo".
+            covariance (pd.DataFrame, optional): Covariance of the daily returns to use instead of the estimated one
+                (see 'covariance'), e.g. a stressed covariance. Defaults to None.
+            cache (Simulation_Cache, optional): If given, the paths are loaded from the cache if they have been simulated
+                with the same parameters and seed before, and stored in it otherwise. Simulations without a seed are
+                not cached. Defaults to None.
+
+        Returns:
+            None
+        """
+        covariance = (self.covariance if covariance is None else covariance).loc[self.tickers, self.tickers]
+        n_assets = len(self.tickers)
+        mu = np.broadcast_to(np.asarray(mu, dtype=float), n_assets)
+        initial_values = np.broadcast_to(np.asarray(initial_values, dtype=float), n_assets)
+        total_steps = int(maturity * steps)
+
+        key = None
+        if cache is not None and seed is not None:
+            seed_key = seed
+            if isinstance(seed, np.random.SeedSequence):
+                seed_key = {"entropy": seed.entropy, "spawn_key": list(seed.spawn_key)}
+            key = Simulation_Cache.get_key(
+                {
+                    "kind": "correlated_paths",
+                    "tickers": self.tickers,
+                    "covariance": Simulation_Cache.hash_array(covariance.to_numpy(dtype=float)),
+                    "mu": mu.tolist(),
+                    "initial_values": initial_values.tolist(),
+                    "maturity": maturity,
+                    "total_steps": total_steps,
+                    "n_simulations": n_simulations,
+                    "seed": seed_key,
+                    "sampling": sampling,
+                }
+            )
+            result = cache.load(key)
+            if result is not None:
+                self.path_array = result["paths"]
+                return
+
+        self.path_array = correlated_geometric_brownian_motion_paths(
+            initial_values,
+            mu,
+            covariance.to_numpy(dtype=float),
+            maturity,
+            total_steps,
+            n_simulations,
+            np.random.default_rng(seed),
+            sampling,
+        )
+        if key is not None:
+            cache.store(key, {"paths": self.path_array})
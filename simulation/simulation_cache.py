@@ -0,0 +1,115 @@
+from typing import Dict
+import hashlib
+import json
+import os
+import numpy as np
+
+
+class Simulation_Cache:
+    """Local cache of simulation results, addressed by a hash of all parameters that determine them.
+
+    Each result is a set of arrays, e.g. the paths of a simulation or the tails of the drawdowns of a streamed simulation,
+    stored in its own .npz file named after the hash. Loading a result marks it as recently used and when the files of the
+    cache exceed 'max_size' bytes, the least recently used results are removed. Files are replaced atomically, so that
+    several processes can share the cache.
+    """
+
+    def __init__(self, directory: str = ".cache/simulations", max_size: int = 1_000_000_000):
+        """Initializing the cache.
+
+        Args:
+            directory (str, optional): Directory in which the results are stored. Defaults to ".cache/simulations".
+            max_size (int, optional): Maximum size of all results in bytes. Defaults to 1_000_000_000.
+        """
+        self._directory = directory
+        self._max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    @property
+    def directory(self) -> str:
+        return self._directory
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @staticmethod
+    def get_key(params: dict) -> str:
+        """Returns the hash of the parameters of a simulation.
+
+        Args:
+            params (dict): Parameters that can be serialized to json. Arrays, e.g. the returns of a bootstrap,
+                should be passed as their hash (see 'hash_array').
+
+        Returns:
+            str: The key of the result.
+        """
+        return hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=repr).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def hash_array(values: np.ndarray) -> str:
+        """Returns a hash of the shape and content of an array, e.g. to add the returns of a bootstrap to the parameters."""
+        values = np.ascontiguousarray(values)
+        digest = hashlib.blake2b(str(values.shape).encode() + str(values.dtype).encode())
+        digest.update(values.data)
+        return digest.hexdigest()
+
+    def _filename(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.npz")
+
+    def load(self, key: str) -> Dict[str, np.ndarray]:
+        """Loads a result from the cache and marks it as recently used.
+
+        Args:
+            key (str): Key of the result (see 'get_key').
+
+        Returns:
+            Dict[str, np.ndarray]: The arrays of the result, None if the result is not cached.
+        """
+        filename = self._filename(key)
+        try:
+            with np.load(filename, allow_pickle=False) as result:
+                arrays = {name: result[name] for name in result.files}
+            os.utime(filename)
+        except FileNotFoundError:
+            # the result may also have been evicted by another process in the meantime
+            return None
+        return arrays
+
+    def store(self, key: str, arrays: Dict[str, np.ndarray]) -> None:
+        """Stores a result in the cache and evicts the least recently used results if the cache is full.
+
+        Args:
+            key (str): Key of the result (see 'get_key').
+            arrays (Dict[str, np.ndarray]): The arrays of the result.
+        """
+        filename = self._filename(key)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_filename, filename)
+        self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used results until the size of the cache is at most 'max_size' bytes."""
+        entries = []
+        for name in os.listdir(self._directory):
+            if not name.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self._directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, name in sorted(entries):
+            if size <= self._max_size:
+                break
+            try:
+                os.remove(os.path.join(self._directory, name))
+            except FileNotFoundError:
+                pass
+            size -= entry_size
@@ -1,5 +1,7 @@
 import pytest
-from data.data_request import Token
+import numpy as np
+import pandas as pd
+from data.data_request import Token, Token_Pair
 
 @pytest.fixture(scope="module")
 def USD():
@@ -18,3 +20,14 @@ def BTC():
 def DOT():
     yield Token("polkadot", "DOT")
 
+
+@pytest.fixture(scope="module")
+def DOT_USD(DOT, USD):
+    """Token pair with a deterministic, synthetic price history so that tests don't need to query prices."""
+    rng = np.random.default_rng(42)
+    index = pd.date_range("2022-01-01", periods=366, freq="D")
+    prices = 10 * np.cumprod(1 + rng.normal(0, 0.05, len(index)))
+    pair = Token_Pair(DOT, USD)
+    pair.prices = pd.DataFrame({"Price": prices}, index=index)
+    pair.calculate_returns()
+    yield pair
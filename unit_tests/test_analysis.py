@@ -0,0 +1,235 @@
+import pytest
+import numpy as np
+import pandas as pd
+from simulation.simulation import Simulation, Multi_Asset_Simulation
+from analysis.analysis import Analysis, get_initial_drawdown
+from helper.helper import get_thresholds
+from unit_tests.conftest import *
+
+
+@pytest.fixture(scope="module")
+def GBM_simulation(DOT_USD: Token_Pair) -> Simulation:
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(steps=1, maturity=21, n_simulations=2_000, sigma=0.05, mu=0, initial_value=1, backend="numpy", seed=5)
+    yield sim
+
+
+def get_simulated_var_loop(simulation: Simulation, alpha: float, at_step: int) -> float:
+    """Reference implementation of the VaR that loops over every path."""
+    at_step = -1 if at_step is None else at_step
+    initial_drawdowns = [get_initial_drawdown(path[:at_step]) for _, path in simulation.paths.items()]
+    initial_drawdowns.sort(reverse=True)
+    return initial_drawdowns[int(len(initial_drawdowns) * alpha)]
+
+
+@pytest.mark.parametrize("alpha", [0.9, 0.99, 0.999])
+def test_simulated_var_multi_matches_loop(GBM_simulation: Simulation, alpha: float):
+    steps = [7, 14, 21, None]
+    var = Analysis(GBM_simulation).get_simulated_var_multi(alpha, steps=steps)
+
+    for at_step in steps:
+        assert var[at_step] == get_simulated_var_loop(GBM_simulation, alpha, at_step)
+
+
+def test_simulated_var_is_consistent_with_multi(GBM_simulation: Simulation):
+    analysis = Analysis(GBM_simulation)
+    var = analysis.get_simulated_var_multi(0.99, steps=[7, 21])
+
+    assert analysis.get_simulated_var(0.99, at_step=7) == var[7]
+    assert analysis.get_simulated_var(0.99, at_step=21) == var[21]
+
+
+def test_simulated_var_rejects_steps_beyond_path(GBM_simulation: Simulation):
+    with pytest.raises(Exception):
+        Analysis(GBM_simulation).get_simulated_var_multi(0.99, steps=[7, 30])
+
+
+def test_simulated_var_from_streamed_simulation_matches_in_memory(DOT_USD: Token_Pair):
+    parameters = dict(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1, seed=11)
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(n_simulations=5_000, backend="numpy", **parameters)
+    streamed_sim = Simulation(DOT_USD, strategy="GBM")
+    streamed_sim.simulate_streaming(
+        n_simulations=5_000, chunk_size=5_000, at_steps=[7, 14, 21], alpha=0.95, **parameters
+    )
+
+    var = Analysis(sim).get_simulated_var_multi(0.99, steps=[7, 14, 21])
+    streamed_var = Analysis(streamed_sim).get_simulated_var_multi(0.99, steps=[7, 14, 21])
+
+    assert streamed_sim.paths is None
+    assert var == streamed_var
+
+
+@pytest.mark.parametrize("sigma", [0.01, 0.05])
+@pytest.mark.parametrize("at_step", [7, 14, 21])
+def test_analytical_var_matches_simulation(DOT_USD: Token_Pair, sigma: float, at_step: int):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate_streaming(
+        steps=1, maturity=21, at_steps=[at_step], alpha=0.99, n_simulations=200_000,
+        sigma=sigma, mu=0, initial_value=1, seed=0, sampling="sobol",
+    )
+    analysis = Analysis(sim)
+    simulated_var = analysis.get_simulated_var(0.99, at_step=at_step)
+
+    # the running minimum of continuously observed paths is slightly more conservative than the daily one
+    assert analysis.get_analytical_var(0.99, at_step=at_step) < simulated_var
+    assert np.isclose(analysis.get_analytical_var(0.99, at_step=at_step), simulated_var, rtol=0.1)
+    assert np.isclose(
+        analysis.get_analytical_var(0.99, at_step=at_step, continuity_correction=True), simulated_var, rtol=0.05
+    )
+
+
+def test_analytical_var_does_not_need_paths(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.set_params(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1)
+
+    assert sim._params["mu"] == 0
+    assert Analysis(sim).get_analytical_var(0.99, at_step=21) < Analysis(sim).get_analytical_var(0.99, at_step=7) < 0
+
+
+def test_analytical_var_rejects_other_strategies(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="heston_process")
+    sim.set_params(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1)
+
+    with pytest.raises(Exception):
+        Analysis(sim).get_analytical_var(0.99, at_step=21)
+
+
+def test_sweep_matches_var_and_thresholds_of_each_grid_point(GBM_simulation: Simulation):
+    alphas = [0.9, 0.99]
+    period_grid = [{"liquidation": 21, "premium_redeem": 14, "safe_mint": 7}, {"liquidation": 10, "safe_mint": 5}]
+    risk_adjustments = [1, 1 / 0.95]
+    sweep = Analysis(GBM_simulation).sweep(alphas, period_grid, risk_adjustments)
+
+    assert len(sweep) == len(alphas) * len(risk_adjustments) * 5
+    for alpha in alphas:
+        var = Analysis(GBM_simulation).get_simulated_var_multi(alpha, steps=[21, 14, 10, 7, 5])
+        for i, periods in enumerate(period_grid):
+            for risk_adjustment in risk_adjustments:
+                thresholds = get_thresholds({key: (1 + var[step]) / risk_adjustment for key, step in periods.items()})
+                rows = sweep[(sweep["alpha"] == alpha) & (sweep["periods"] == i) & (sweep["risk_adjustment"] == risk_adjustment)]
+                for key, step in periods.items():
+                    row = rows[rows["threshold"] == key].iloc[0]
+                    assert row["horizon"] == step
+                    assert row["var"] == var[step]
+                    assert row["ratio"] == pytest.approx(thresholds[key])
+
+
+def test_sweep_of_streamed_simulation_reads_the_sketches(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate_streaming(steps=1, maturity=21, at_steps=[7, 21], alpha=0.95, n_simulations=5_000, chunk_size=1_000, sigma=0.05, mu=0, initial_value=1, seed=3)
+    sweep = Analysis(sim).sweep([0.95, 0.99], [{"liquidation": 21, "safe_mint": 7}])
+
+    for alpha in [0.95, 0.99]:
+        var = Analysis(sim).get_simulated_var_multi(alpha, steps=[7, 21])
+        assert sweep[sweep["alpha"] == alpha].set_index("horizon")["var"].to_dict() == var
+
+
+def test_quantile_bands_match_quantiles_of_each_step(GBM_simulation: Simulation):
+    quantiles = [0.01, 0.5, 0.99]
+    bands = Analysis(GBM_simulation).get_quantile_bands(quantiles)
+
+    assert bands.shape == (22, 3)
+    for step in [0, 7, 21]:
+        for quantile in quantiles:
+            assert bands.loc[step, quantile] == pytest.approx(np.quantile(GBM_simulation.path_array[step], quantile))
+
+
+@pytest.mark.parametrize("extension", ["png", "svg"])
+def test_fan_chart_is_saved(GBM_simulation: Simulation, tmp_path, extension: str):
+    filename = tmp_path / f"fan.{extension}"
+    figure = Analysis(GBM_simulation).plot_returns(None, "DOT/USD", type="fan", n_sample_paths=5, filename=str(filename), seed=1)
+
+    assert filename.stat().st_size > 0
+    # 3 bands, the median and the sample paths
+    subPlots = figure.axes[0]
+    assert len(subPlots.collections) == 3
+    assert len(subPlots.lines) == 1 + 5
+
+
+def test_plot_rejects_unknown_type(GBM_simulation: Simulation):
+    with pytest.raises(Exception):
+        Analysis(GBM_simulation).plot_returns(None, "DOT/USD", type="scatter")
+
+
+def test_simulated_var_interval_from_streamed_simulation_matches_in_memory(DOT_USD: Token_Pair):
+    parameters = dict(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1, seed=12)
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(n_simulations=5_000, backend="numpy", **parameters)
+    streamed_sim = Simulation(DOT_USD, strategy="GBM")
+    streamed_sim.simulate_streaming(
+        at_steps=[7, 21], alpha=0.99, n_simulations=5_000, chunk_size=5_000, **parameters
+    )
+
+    intervals = Analysis(sim).get_simulated_var_interval(0.99, steps=[7, 21])
+    assert Analysis(streamed_sim).get_simulated_var_interval(0.99, steps=[7, 21]) == intervals
+    for at_step, (lower, upper) in intervals.items():
+        assert lower < Analysis(sim).get_simulated_var(0.99, at_step=at_step) < upper
+
+
+def test_adaptive_simulation_stops_once_var_is_precise(DOT_USD: Token_Pair):
+    counts = {}
+    for sigma in [0.005, 0.05]:
+        sim = Simulation(DOT_USD, strategy="GBM")
+        sim.simulate_streaming(
+            steps=1, maturity=21, at_steps=[7, 21], alpha=0.99, n_simulations=200_000, chunk_size=10_000,
+            sigma=sigma, mu=0, initial_value=1, seed=0, tolerance=0.01,
+        )
+        counts[sigma] = sim.drawdown_sketches[21].count
+        intervals = Analysis(sim).get_simulated_var_interval(0.99, steps=[7, 21])
+        if counts[sigma] < 200_000:
+            assert all(upper - lower <= 0.01 for lower, upper in intervals.values())
+
+    # the VaR of the low volatility converges with the first chunk, the high volatility needs more paths
+    assert counts[0.005] == 10_000
+    assert 10_000 < counts[0.05]
+
+
+def test_simulated_var_interval_of_streamed_simulation_without_tolerance(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate_streaming(
+        steps=1, maturity=21, at_steps=[7, 21], alpha=0.99, n_simulations=20_000, chunk_size=5_000,
+        sigma=0.05, mu=0, initial_value=1, seed=2,
+    )
+    analysis = Analysis(sim)
+    intervals = analysis.get_simulated_var_interval(0.99, steps=[7, 21])
+
+    # all paths are simulated and the interval around the VaR can still be read from the sketches
+    assert sim.drawdown_sketches[21].count == 20_000
+    for at_step, (lower, upper) in intervals.items():
+        assert lower < analysis.get_simulated_var(0.99, at_step=at_step) < upper
+
+
+@pytest.fixture(scope="module")
+def multi_asset_simulation() -> Multi_Asset_Simulation:
+    returns = pd.DataFrame(np.random.default_rng(3).normal(0, [0.05, 0.03, 0.04], (365, 3)), columns=["dot", "btc", "usdt"])
+    sim = Multi_Asset_Simulation(returns)
+    sim.simulate(steps=1, maturity=21, n_simulations=20_000, initial_values=[10, 20_000, 1], seed=6)
+    yield sim
+
+
+def test_portfolio_var_of_a_single_asset_is_its_var(multi_asset_simulation: Multi_Asset_Simulation):
+    single_asset_sim = Simulation(None, strategy="GBM")
+    single_asset_sim.path_array = multi_asset_simulation.path_array[:, :, 0]
+
+    var = Analysis(multi_asset_simulation).get_portfolio_var(0.99, {"dot": 5}, steps=[7, 21])
+    assert var == pytest.approx(Analysis(single_asset_sim).get_simulated_var_multi(0.99, steps=[7, 21]))
+
+
+def test_portfolio_var_is_diversified(multi_asset_simulation: Multi_Asset_Simulation):
+    weights = {"dot": 0.5, "btc": 0.3, "usdt": 0.2}
+    analysis = Analysis(multi_asset_simulation)
+    var = analysis.get_portfolio_var(0.99, weights, steps=[21])[21]
+    single_asset_var = {ticker: analysis.get_portfolio_var(0.99, {ticker: 1}, steps=[21])[21] for ticker in weights}
+
+    # the assets are almost uncorrelated, so the portfolio loses much less than the weighted losses of its assets
+    assert sum(weight * single_asset_var[ticker] for ticker, weight in weights.items()) < var < 0
+    # the scale of the weights does not change the VaR
+    assert analysis.get_portfolio_var(0.99, {ticker: weight * 1e6 for ticker, weight in weights.items()}, steps=[21])[21] == pytest.approx(var)
+
+
+def test_portfolio_var_rejects_unknown_assets_and_single_asset_paths(multi_asset_simulation: Multi_Asset_Simulation, GBM_simulation: Simulation):
+    with pytest.raises(Exception):
+        Analysis(multi_asset_simulation).get_portfolio_var(0.99, {"ksm": 1})
+    with pytest.raises(Exception):
+        Analysis(GBM_simulation).get_portfolio_var(0.99, {"dot": 1})
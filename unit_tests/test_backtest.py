@@ -0,0 +1,62 @@
+import pytest
+import numpy as np
+from analysis.analysis import Analysis
+from analysis.backtest import Backtest, Rolling_Moments, Rolling_Order_Statistics
+from analysis.historical_var import Historical_VaR
+from helper.helper import get_thresholds
+from simulation.simulation import Simulation
+from unit_tests.conftest import *
+
+PERIODS = {"liquidation": 21, "premium_redeem": 14, "safe_mint": 7}
+
+
+def test_rolling_moments_match_window_std():
+    values = np.random.default_rng(0).normal(0, 0.05, 500)
+    moments = Rolling_Moments(100)
+    for i, value in enumerate(values):
+        moments.add(value)
+        if i >= 1:
+            window = values[max(0, i - 99) : i + 1]
+            assert moments.std == pytest.approx(np.std(window, ddof=1), rel=1e-9)
+            assert moments.mean == pytest.approx(np.mean(window), rel=1e-9)
+
+
+@pytest.mark.parametrize("alpha", [0.5, 0.9, 0.99])
+def test_rolling_order_statistics_match_sorted_window(alpha: float):
+    values = np.random.default_rng(1).normal(0, 0.05, 300)
+    order_statistics = Rolling_Order_Statistics(50)
+    for i, value in enumerate(values):
+        order_statistics.add(value)
+        window = sorted(values[max(0, i - 49) : i + 1], reverse=True)
+        assert order_statistics.get_var(alpha) == window[int(len(window) * alpha)]
+
+
+@pytest.mark.parametrize("historical_mode", ["return", "drawdown"])
+def test_last_day_matches_analysis_of_the_sample_period(DOT_USD: Token_Pair, historical_mode: str):
+    sample_period = 200
+    backtest = Backtest(DOT_USD, 0.99, PERIODS, sample_period, historical_mode).run()
+    last_day = backtest.iloc[-1]
+
+    # the thresholds of the last day from the prices of the last sample period only
+    pair = Token_Pair(DOT_USD.base_token, DOT_USD.quote_token)
+    pair.prices = DOT_USD.prices.iloc[-sample_period - 1 :]
+    pair.calculate_returns()
+    sim = Simulation(pair, strategy="GBM")
+    sim.set_params(steps=1, maturity=21, initial_value=1, sigma=pair.returns.std()[0], mu=0)
+    historical_var = Historical_VaR(pair, historical_mode).get_var_multi([0.99], list(PERIODS.values()))
+    analytical = get_thresholds({key: 1 + Analysis(sim).get_analytical_var(0.99, at_step=period) for key, period in PERIODS.items()})
+    historical = get_thresholds({key: 1 + historical_var[period][0.99] for key, period in PERIODS.items()})
+
+    assert last_day["sigma"] == pytest.approx(pair.returns.std()[0], rel=1e-9)
+    for key in PERIODS.keys():
+        assert last_day[f"{key}_analytical"] == pytest.approx(analytical[key], rel=1e-9)
+        assert last_day[f"{key}_historical"] == pytest.approx(historical[key], rel=1e-9)
+
+
+def test_backtest_starts_with_a_full_sample_period(DOT_USD: Token_Pair):
+    backtest = Backtest(DOT_USD, 0.99, PERIODS, sample_period=300).run()
+
+    assert len(backtest) == len(DOT_USD.prices) - 300
+    assert backtest.index[0] == DOT_USD.prices.index[300]
+    assert len(Backtest(DOT_USD, 0.99, PERIODS, sample_period=300).run(start_date="2022-12-01")) == 32
+    assert (backtest["safe_mint"] >= backtest["premium_redeem"]).all()
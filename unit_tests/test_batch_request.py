@@ -0,0 +1,124 @@
+import pytest
+import json
+import time
+import threading
+import pandas as pd
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from data.data_request import Data_Request
+from data.data_source import urls
+from data.price_cache import Price_Cache
+from data.rate_limiter import Rate_Limiter
+from unit_tests.conftest import *
+
+
+class Coingecko_Handler(BaseHTTPRequestHandler):
+    """Local stand-in for the market_chart endpoint of CoinGecko."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        coin_id = url.path.split("/")[-2]
+        days = int(parse_qs(url.query)["days"][0])
+        server = self.server
+        with server.lock:
+            server.requests.append(coin_id)
+            server.client_ports.add(self.client_address[1])
+            throttled = coin_id in server.throttle and coin_id not in server.throttled
+            server.throttled.add(coin_id)
+
+        if throttled:
+            self._send(429, {"status": {"error_code": 429}}, {"Retry-After": "0"})
+            return
+
+        dates = pd.date_range(end=pd.Timestamp(datetime.today().date()), periods=days + 1, freq="D")
+        prices = [[int(date.timestamp() * 1000), len(coin_id) + i] for i, date in enumerate(dates)]
+        self._send(200, {"prices": prices})
+
+    def _send(self, status: int, body: dict, headers: dict = {}):
+        content = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def coingecko(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Coingecko_Handler)
+    server.lock = threading.Lock()
+    server.requests, server.client_ports, server.throttle, server.throttled = [], set(), set(), set()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setitem(urls, "coingecko", f"http://127.0.0.1:{server.server_address[1]}/api/v3/coins/")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(scope="module")
+def token_pairs(USD, BTC, DOT, aUSD):
+    yield [Token_Pair(token, USD) for token in [BTC, DOT, aUSD]] + [Token_Pair(DOT, BTC)]
+
+
+def test_batch_request_fetches_every_pair_once(coingecko, token_pairs):
+    prices = Data_Request.batch_request_historic_prices(
+        token_pairs + token_pairs[:1], start_date="2022-01-01", end_date=None, rate_limiter=Rate_Limiter(100, 10)
+    )
+
+    assert set(prices.keys()) == {("bitcoin", "USD"), ("polkadot", "USD"), ("acala-dollar", "USD"), ("polkadot", "BTC")}
+    assert sorted(coingecko.requests) == ["acala-dollar", "bitcoin", "polkadot", "polkadot"]
+    assert all(len(price) > 1 for price in prices.values())
+
+
+def test_batch_request_reuses_connections(coingecko, token_pairs):
+    Data_Request.batch_request_historic_prices(
+        token_pairs * 3, start_date="2022-01-01", max_workers=2, rate_limiter=Rate_Limiter(100, 10)
+    )
+    Data_Request.batch_request_historic_prices(
+        [Token_Pair(Token(f"coin-{i}", f"C{i}"), Token("usd", "USD")) for i in range(10)],
+        start_date="2022-01-01",
+        max_workers=2,
+        rate_limiter=Rate_Limiter(100, 10),
+    )
+
+    assert len(coingecko.requests) == 14
+    assert len(coingecko.client_ports) <= 4
+
+
+def test_batch_request_retries_when_rate_limited(coingecko, token_pairs):
+    coingecko.throttle = {"bitcoin", "polkadot"}
+    prices = Data_Request.batch_request_historic_prices(
+        token_pairs[:2], start_date="2022-01-01", rate_limiter=Rate_Limiter(100, 10)
+    )
+
+    assert sorted(coingecko.requests) == ["bitcoin", "bitcoin", "polkadot", "polkadot"]
+    assert len(prices[("bitcoin", "USD")]) > 1
+
+
+def test_batch_request_prefetches_into_cache(coingecko, token_pairs, tmp_path):
+    cache = Price_Cache(str(tmp_path))
+    Data_Request.batch_request_historic_prices(
+        token_pairs, start_date="2022-01-01", cache=cache, rate_limiter=Rate_Limiter(100, 10)
+    )
+    pair = Token_Pair(token_pairs[0].base_token, token_pairs[0].quote_token)
+    pair.get_prices(start_date="2022-01-01", cache=cache)
+
+    assert len(coingecko.requests) == len(token_pairs)
+    assert len(pair.prices) > 1
+
+
+def test_rate_limiter_limits_the_rate():
+    rate_limiter = Rate_Limiter(rate=50, capacity=5)
+    start = time.monotonic()
+    for _ in range(15):
+        rate_limiter.acquire()
+
+    # the first 5 requests are a burst, the other 10 need at least 10 / 50 seconds
+    assert time.monotonic() - start >= 0.19
@@ -0,0 +1,23 @@
+from simulation.simulation import Simulation
+from analysis.convergence import get_convergence_report
+from unit_tests.conftest import *
+
+
+def test_convergence_report_compares_samplings(DOT_USD: Token_Pair):
+    report = get_convergence_report(
+        Simulation(DOT_USD, strategy="GBM"),
+        alpha=0.99,
+        at_steps=[7, 21],
+        path_counts=[1_024, 4_096],
+        n_repeats=5,
+        seed=0,
+        steps=1,
+        maturity=21,
+        sigma=0.05,
+        mu=0,
+        initial_value=1,
+    )
+
+    assert len(report) == 3 * 2 * 2
+    assert (report["standard_error"] > 0).all()
+    assert (report.loc[report["sampling"] == "pseudo", "efficiency"] == 1).all()
@@ -1,51 +1,166 @@
 import pytest
-from ..data.data_request import Token, Token_Pair, Data_Request
+import json
+import requests
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+from data.data_request import Token, Token_Pair
+from data.data_source import Local_Source, Replay_Source, get_data_source, register_data_source
+from data.price_cache import Price_Cache
 from unit_tests.conftest import *
 
-@pytest.mark.parametrize(
-    "name, ticker", 
-    [("acala-dollar", "aUSD"), ("bitcoin", "BTC"), ("polkadot", "DOT")])
+END_DATE = "2022-12-31"
+START_DATE = "2021-12-31"
+
+
+def coingecko_response(days: int, seed: int = 0) -> dict:
+    """Raw market chart response of CoinGecko with daily prices up to the end date."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=END_DATE, periods=days + 1, freq="D")
+    prices = 10 * np.cumprod(1 + rng.normal(0, 0.05, len(dates)))
+    return {"prices": [[int(date.timestamp() * 1000), price] for date, price in zip(dates, prices)]}
+
+
+@pytest.fixture(scope="module")
+def replay(tmp_path_factory) -> Replay_Source:
+    """Replay source with recorded responses of bitcoin, polkadot and acala-dollar in usd."""
+    source = Replay_Source(str(tmp_path_factory.mktemp("recordings")))
+    days = (datetime.strptime(END_DATE, "%Y-%m-%d") - datetime.strptime(START_DATE, "%Y-%m-%d")).days
+    for seed, coin_id in enumerate(["acala-dollar", "bitcoin", "polkadot"]):
+        with open(source.filename(coin_id, "usd", str(days), "daily"), "w") as f:
+            json.dump(coingecko_response(days, seed), f)
+    with open(source.filename("unknown", "usd", str(days), "daily"), "w") as f:
+        json.dump({"error": "coin not found"}, f)
+    yield source
+
+
+@pytest.mark.parametrize("name, ticker", [("acala-dollar", "aUSD"), ("bitcoin", "BTC"), ("polkadot", "DOT")])
 def test_can_create_token(name: str, ticker: str):
     t = Token(name, ticker)
-    breakpoint()
     assert t.name == name
     assert t.ticker == ticker
-    
-    
-@pytest.mark.parametrize(
-    "base_token",
-    [aUSD, BTC, DOT]
-)
-@pytest.mark.parametrize("quote_token", [USD])
-def test_can_create_token_pair(base_token: Token, quote_token: Token):
-    breakpoint()
-    pair = Token_Pair(base_token, quote_token)
+
+
+@pytest.mark.parametrize("base_token", ["aUSD", "BTC", "DOT"])
+def test_can_create_token_pair(base_token: str, USD: Token, request):
+    base_token = request.getfixturevalue(base_token)
+    pair = Token_Pair(base_token, USD)
     assert pair.base_token.name == base_token.name
-    assert pair.quote_token == quote_token.name
-
-    
-@pytest.mark.parametrize(
-    "base_token",
-    [aUSD, BTC, DOT]
-)
-@pytest.mark.parametrize("quote_token", [USD])
-def test_can_query_coingecko_prices(base_token: Token, quote_token: Token):
-    pair = Token_Pair(base_token, quote_token)
-    pair.get_prices(data_source="coingecko")
-    
-    assert pair.prices
-    
-
-@pytest.mark.parametrize(
-    "base_token, quote_token",
-    [(BTC, USD), (DOT,USD)]
-)
-@pytest.mark.parametrize("period",
-    ["daily", "weekly", "monthly", "annualy"])
-def test_can_calculate_geometric_returns(base_token: Token, quote_token: Token, period: str):
-    pair = Token_Pair(base_token, quote_token)
-    pair.get_prices(data_source="coingecko")
-    
-    pair.calculate_returns(period = period)
-    
-    assert pair.returns
+    assert pair.quote_token.name == USD.name
+
+
+@pytest.mark.parametrize("base_token", ["aUSD", "BTC", "DOT"])
+def test_can_replay_coingecko_prices(base_token: str, replay: Replay_Source, request):
+    pair = Token_Pair(request.getfixturevalue(base_token), Token("dollar", "usd"))
+    pair.get_prices(data_source=replay, start_date=START_DATE, end_date=END_DATE)
+
+    assert len(pair.prices) == 366
+    assert pair.prices.index[-1] == pd.Timestamp(END_DATE)
+
+
+def test_replay_is_deterministic(replay: Replay_Source, BTC: Token):
+    register_data_source("test_replay", replay)
+    first, second = Token_Pair(BTC, Token("dollar", "usd")), Token_Pair(BTC, Token("dollar", "usd"))
+    first.get_prices(data_source="test_replay", start_date=START_DATE, end_date=END_DATE)
+    second.get_prices(data_source="test_replay", start_date=START_DATE, end_date=END_DATE)
+
+    pd.testing.assert_frame_equal(first.prices, second.prices)
+
+
+def test_replay_of_unknown_coin_returns_no_prices(replay: Replay_Source):
+    pair = Token_Pair(Token("unknown", "unk"), Token("dollar", "usd"))
+    pair.get_prices(data_source=replay, start_date=START_DATE, end_date=END_DATE)
+
+    assert pair.prices.iloc[0, 0] == 0
+
+
+def test_replay_without_recording_returns_no_prices(replay: Replay_Source, DOT: Token):
+    with pytest.raises(KeyError, match="No recorded response"):
+        replay.request_prices("polkadot", "usd", "213", END_DATE, "daily")
+
+    # like a coin without prices, so that the proxy of the token is used
+    pair = Token_Pair(DOT, Token("dollar", "usd"))
+    pair.get_prices(data_source=replay, start_date="2022-06-01", end_date=END_DATE)
+    assert pair.prices.iloc[0, 0] == 0
+
+
+def test_record_saves_raw_responses(monkeypatch, tmp_path, DOT: Token):
+    def get(url: str, **kwargs):
+        response = requests.models.Response()
+        response.status_code = 200
+        response._content = json.dumps(coingecko_response(30)).encode()
+        return response
+
+    monkeypatch.setattr("data.data_request.requests.get", get)
+    start_date = (datetime.strptime(END_DATE, "%Y-%m-%d") - timedelta(30)).strftime("%Y-%m-%d")
+    recorded, replayed = Token_Pair(DOT, Token("dollar", "usd")), Token_Pair(DOT, Token("dollar", "usd"))
+
+    recorded.get_prices(data_source=Replay_Source(str(tmp_path), record=True), start_date=start_date, end_date=END_DATE)
+    monkeypatch.setattr("data.data_request.requests.get", None)
+    replayed.get_prices(data_source=Replay_Source(str(tmp_path)), start_date=start_date, end_date=END_DATE)
+
+    pd.testing.assert_frame_equal(recorded.prices, replayed.prices)
+
+
+def test_local_source_reads_the_requested_period(tmp_path, replay: Replay_Source, DOT: Token):
+    prices = replay._source.parse_response(coingecko_response(364))
+    prices.to_csv(tmp_path / "polkadot_usd.csv", index_label="Date")
+
+    pair = Token_Pair(DOT, Token("dollar", "usd"))
+    pair.get_prices(data_source=Local_Source(str(tmp_path)), start_date="2022-12-01", end_date=END_DATE)
+
+    assert len(pair.prices) == 31
+    assert pair.prices.index[0] == pd.Timestamp("2022-12-01")
+
+
+def test_local_source_reads_a_price_cache(tmp_path, replay: Replay_Source, DOT: Token):
+    cache = Price_Cache(str(tmp_path))
+    prices = replay._source.parse_response(coingecko_response(364))
+    cache.store("polkadot", "usd", "daily", prices, prices.index[0])
+
+    pair = Token_Pair(DOT, Token("dollar", "usd"))
+    pair.get_prices(data_source=Local_Source(cache.directory), start_date=START_DATE, end_date=END_DATE, cache=cache)
+
+    pd.testing.assert_frame_equal(pair.prices, prices, check_freq=False)
+
+
+def test_unknown_data_source_raises():
+    with pytest.raises(Exception, match="Unknown data source"):
+        get_data_source("binance")
+
+
+@pytest.mark.parametrize("period", ["daily", "weekly", "monthly", "annualy"])
+def test_can_calculate_geometric_returns(period: str, replay: Replay_Source, BTC: Token):
+    pair = Token_Pair(BTC, Token("dollar", "usd"))
+    pair.get_prices(data_source=replay, start_date=START_DATE, end_date=END_DATE)
+
+    pair.calculate_returns(period=period)
+
+    assert not pair.returns.empty
+
+
+def test_prices_are_resampled_to_daily_bars(DOT: Token, USD: Token):
+    # a gap of two days and an intraday price after the last daily price
+    index = pd.to_datetime(["2022-01-01 00:00", "2022-01-02 00:00", "2022-01-05 00:00", "2022-01-06 00:00", "2022-01-06 13:37"])
+    pair = Token_Pair(DOT, USD)
+    pair.prices = pd.DataFrame({"Price": [1.0, 2, 5, 6, 7]}, index=pd.Index(index, name="Date"))
+
+    assert pair.prices.index.tolist() == pd.date_range("2022-01-01", "2022-01-06", freq="D").tolist()
+    assert pair.prices["Price"].tolist() == [1.0, 2, 2, 2, 5, 7]
+    assert pair.prices.attrs["granularity"] == "daily"
+
+
+def test_windows_cover_days_for_hourly_bars(DOT: Token, USD: Token):
+    index = pd.date_range("2022-01-01", periods=24 * 10, freq="H", name="Date")
+    pair = Token_Pair(DOT, USD, granularity="hourly")
+    pair.prices = pd.DataFrame({"Price": np.arange(1.0, len(index) + 1)}, index=index)
+    pair.calculate_returns(period="weekly")
+
+    assert pair.get_bars(7) == 24 * 7
+    assert len(pair.returns) == 24 * 3
+    assert pair.returns["Price"].iloc[0] == 24 * 7
+
+
+def test_unknown_granularity_raises(DOT: Token, USD: Token):
+    with pytest.raises(Exception, match="Unknown granularity"):
+        Token_Pair(DOT, USD, granularity="minutely")
@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+import pandas as pd
+from analysis.depeg import get_depeg_statistics, load_depeg_adjustments, write_depeg_adjustments
+from data.price_matrix import Price_Matrix
+from helper.helper import get_total_risk_adjustment
+from unit_tests.conftest import *
+
+
+@pytest.fixture(scope="module")
+def price_matrix() -> Price_Matrix:
+    index = pd.date_range("2022-01-01", periods=10, freq="D", name="Date")
+    prices = pd.DataFrame(
+        {
+            "dot": 10.0,
+            # depegged by 5% for two days, then by 2% for three days
+            "vdot": [10.0, 10, 9.5, 9.5, 10, 9.8, 9.8, 9.8, 10, 10],
+            "ksm": [np.nan, np.nan, 20, 22, 24, 22, 20, 18, 20, 24],
+            "vksm": [np.nan, np.nan, np.nan, 22, 24, 22, 20, 18, 20, 24],
+            "usd": 1.0,
+        },
+        index=index,
+    )
+    yield Price_Matrix(prices)
+
+
+def test_depeg_statistics(price_matrix: Price_Matrix):
+    statistics = get_depeg_statistics(price_matrix, {"vdot": "dot", "vksm": "ksm"})
+
+    assert statistics.loc["vdot", "max_depeg"] == pytest.approx(-0.05)
+    assert statistics.loc["vdot", "max_drawdown"] == pytest.approx(-0.05)
+    assert statistics.loc["vdot", "depeg_days"] == 5
+    assert statistics.loc["vdot", "longest_depeg_days"] == 3
+    # vKSM only has prices from the 4th day and is pegged to KSM on all of them
+    assert statistics.loc["vksm", "max_depeg"] == pytest.approx(0)
+    assert statistics.loc["vksm", "depeg_days"] == 0
+
+
+def test_depeg_statistics_match_cumulative_returns_of_each_pair(price_matrix: Price_Matrix):
+    pegs = {"vdot": "dot", "vksm": "ksm", "ksm": "dot"}
+    statistics = get_depeg_statistics(price_matrix, pegs)
+
+    for ticker, proxy in pegs.items():
+        # the computation of helper/max_depeg.py
+        returns = price_matrix.pair(ticker, proxy).pct_change().dropna()
+        max_depeg = returns.add(1).cumprod().sub(1).min()["Price"]
+        assert statistics.loc[ticker, "max_depeg"] == pytest.approx(min(max_depeg, 0))
+
+
+def test_depeg_adjustments_are_used_as_risk_adjustment(price_matrix: Price_Matrix, tmp_path):
+    filename = str(tmp_path / "depeg_adjustments.yaml")
+    write_depeg_adjustments(get_depeg_statistics(price_matrix, {"vdot": "dot"}), "polkadot", filename)
+    write_depeg_adjustments(get_depeg_statistics(price_matrix, {"vksm": "ksm"}), "kusama", filename)
+    config = {
+        "depeg": {"file": filename},
+        "collateral": {
+            "polkadot": {
+                "vdot": {"risk_adjustment": {"liquidity_adjustment": None, "depeg_adjustment": None}},
+                "dot": {"risk_adjustment": {"liquidity_adjustment": None, "depeg_adjustment": 0}},
+            }
+        },
+    }
+
+    assert load_depeg_adjustments(filename) == {"polkadot": {"vdot": 0.05}, "kusama": {"vksm": 0.0}}
+    assert get_total_risk_adjustment("vdot", "polkadot", config) == pytest.approx(1 / 0.95)
+    assert get_total_risk_adjustment("dot", "polkadot", config) == 1
@@ -0,0 +1,75 @@
+import pytest
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from analysis.analysis import Analysis, get_initial_drawdown
+from analysis.drawdown import sliding_window_min
+from analysis.historical_var import Historical_VaR
+from simulation.simulation import Simulation
+from unit_tests.conftest import *
+
+
+def get_historical_var_sort(token_pair: Token_Pair, alpha: float, horizon: int) -> float:
+    """Reference implementation that sorts the rolling returns of the prices."""
+    returns = token_pair.prices.pct_change(horizon).dropna()
+    returns = returns.sort_values("Price", ascending=False)
+    return returns.iloc[int(len(returns) * alpha)]["Price"]
+
+
+@pytest.mark.parametrize("horizon", [1, 7, 14, 21])
+def test_var_multi_matches_sort(DOT_USD: Token_Pair, horizon: int):
+    alphas = [0.9, 0.95, 0.99]
+    var = Historical_VaR(DOT_USD).get_var_multi(alphas, [horizon])
+
+    for alpha in alphas:
+        assert var[horizon][alpha] == get_historical_var_sort(DOT_USD, alpha, horizon)
+
+
+def test_window_returns_match_pct_change(DOT_USD: Token_Pair):
+    returns = Historical_VaR(DOT_USD).get_window_returns(7)
+
+    np.testing.assert_allclose(returns, DOT_USD.prices["Price"].pct_change(7).dropna())
+
+
+def test_var_table_has_a_row_per_alpha_and_horizon(DOT_USD: Token_Pair):
+    historical_var = Historical_VaR(DOT_USD)
+    table = historical_var.get_var_table([0.9, 0.99], [7, 14, 21])
+
+    assert list(table.columns) == ["horizon", "alpha", "var"]
+    assert len(table) == 6
+    row = table[(table["horizon"] == 14) & (table["alpha"] == 0.99)]
+    assert row["var"].iloc[0] == historical_var.get_var(0.99, 14)
+
+
+def test_too_short_history_raises(DOT_USD: Token_Pair):
+    with pytest.raises(Exception, match="Not enough prices"):
+        Historical_VaR(DOT_USD).get_var(0.99, 400)
+
+
+@pytest.mark.parametrize("horizon", [1, 7, 21])
+def test_window_drawdowns_match_initial_drawdown_of_each_window(DOT_USD: Token_Pair, horizon: int):
+    prices = DOT_USD.prices["Price"]
+    expected = [get_initial_drawdown(prices[i : i + horizon]) for i in range(len(prices) - horizon + 1)]
+
+    np.testing.assert_allclose(Historical_VaR(DOT_USD, mode="drawdown").get_window_drawdowns(horizon), expected)
+
+
+def test_drawdown_var_is_at_most_return_var(DOT_USD: Token_Pair):
+    # the drawdown windows of horizon + 1 prices span the same days as the returns over the horizon
+    for horizon in [7, 14, 21]:
+        assert Historical_VaR(DOT_USD, mode="drawdown").get_var(0.99, horizon + 1) <= Historical_VaR(DOT_USD).get_var(0.99, horizon)
+
+
+@pytest.mark.parametrize("horizon", [7, 21])
+def test_drawdown_var_matches_simulated_var_of_the_same_windows(DOT_USD: Token_Pair, horizon: int):
+    # every historical window of the prices is one path, which is truncated at the step of the horizon
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.path_array = sliding_window_view(DOT_USD.prices["Price"].to_numpy(), horizon).T.copy()
+
+    assert Historical_VaR(DOT_USD, mode="drawdown").get_var(0.99, horizon) == Analysis(sim).get_simulated_var(0.99, at_step=horizon)
+
+
+@pytest.mark.parametrize("window", [1, 2, 7, 100, 366])
+def test_sliding_window_min_matches_window_view(DOT_USD: Token_Pair, window: int):
+    values = DOT_USD.prices["Price"].to_numpy()
+
+    np.testing.assert_array_equal(sliding_window_min(values, window), sliding_window_view(values, window).min(axis=1))
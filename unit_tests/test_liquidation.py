@@ -0,0 +1,71 @@
+import pytest
+import numpy as np
+from analysis.analysis import Analysis
+from analysis.liquidation import get_liquidation_shortfalls
+from data.market import Automted_Market_Maker
+from simulation.simulation import Simulation
+from unit_tests.conftest import *
+
+
+@pytest.fixture(scope="module")
+def GBM_simulation(DOT_USD: Token_Pair) -> Simulation:
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(steps=1, maturity=7, n_simulations=2_000, sigma=0.05, mu=0, initial_value=1, backend="numpy", seed=11)
+    yield sim
+
+
+def get_liquidation_shortfall_loop(path: np.ndarray, TVL: float, debt_outstanding: float, threshold: float, DOT: Token, USD: Token) -> float:
+    """Reference implementation that sells the collateral of each step to an AMM object."""
+    invariant = (TVL / 2) ** 2 / path[0]
+    debt_per_step = debt_outstanding / (len(path) - 1)
+    collateral_per_step = threshold * debt_per_step / path[0]
+    shortfall = 0
+    for price in path[1:]:
+        amm = Automted_Market_Maker(DOT, USD, np.sqrt(invariant / price), np.sqrt(invariant * price))
+        quote_token_amount = amm.quote_token_amount
+        amm.exact_input_swap(DOT, collateral_per_step)
+        shortfall += max(0, debt_per_step - (quote_token_amount - amm.quote_token_amount)) / debt_per_step
+    return shortfall / (len(path) - 1)
+
+
+@pytest.mark.parametrize("TVL, debt_outstanding", [(1e6, 1e4), (1e6, 5e5), (1e5, 1e6)])
+def test_shortfalls_match_amm_loop(GBM_simulation: Simulation, DOT: Token, USD: Token, TVL: float, debt_outstanding: float):
+    paths = GBM_simulation.path_array[:, :20]
+    shortfalls = get_liquidation_shortfalls(paths, TVL, debt_outstanding, threshold=1.1)
+
+    expected = [get_liquidation_shortfall_loop(paths[:, i], TVL, debt_outstanding, 1.1, DOT, USD) for i in range(paths.shape[1])]
+    np.testing.assert_allclose(shortfalls, expected)
+
+
+def test_shortfall_is_the_debt_not_paid_by_the_amm():
+    # 110 collateral are sold to an AMM with 1_000 collateral and 1_000 debt, which pays 1_000 * 110 / 1_110 for them
+    shortfalls = get_liquidation_shortfalls(np.array([[1.0], [1.0]]), TVL=2_000, debt_outstanding=100, threshold=1.1)
+
+    assert shortfalls[0] == pytest.approx(1 - 1_000 * 110 / 1_110 / 100)
+
+
+def test_shortfalls_without_slippage_only_depend_on_the_price(GBM_simulation: Simulation):
+    paths = GBM_simulation.path_array
+    shortfalls = get_liquidation_shortfalls(paths, TVL=1e15, debt_outstanding=1, threshold=1.1)
+
+    expected = np.maximum(0, 1 - 1.1 * paths[1:] / paths[0]).mean(axis=0)
+    np.testing.assert_allclose(shortfalls, expected, atol=1e-6)
+
+
+def test_liquidation_shortfall_table(GBM_simulation: Simulation):
+    table = Analysis(GBM_simulation).get_liquidation_shortfall([1e5, 1e6], [1e4, 1e5, 1e6], threshold=1.1, alphas=[0.9, 0.99])
+
+    assert list(table.columns) == ["TVL", "debt_outstanding", "mean", "probability", "quantile_0.9", "quantile_0.99"]
+    assert len(table) == 6
+    # more liquidity and less debt reduce the shortfall
+    assert table.set_index(["TVL", "debt_outstanding"])["mean"].loc[(1e6, 1e4)] < table.set_index(["TVL", "debt_outstanding"])["mean"].loc[(1e5, 1e4)]
+
+
+def test_liquidation_threshold_is_the_lowest_threshold_without_shortfall(GBM_simulation: Simulation):
+    analysis = Analysis(GBM_simulation)
+    threshold = analysis.get_liquidation_threshold(TVL=1e6, debt_outstanding=1e5, alpha=0.99)
+    paths = GBM_simulation.path_array
+
+    assert np.quantile(get_liquidation_shortfalls(paths, 1e6, 1e5, threshold), 0.99) == 0
+    assert np.quantile(get_liquidation_shortfalls(paths, 1e6, 1e5, threshold - 1e-3), 0.99) > 0
+    assert threshold < analysis.get_liquidation_threshold(TVL=1e5, debt_outstanding=1e5, alpha=0.99)
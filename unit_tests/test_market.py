@@ -0,0 +1,89 @@
+import pytest
+import numpy as np
+from data.market import Automted_Market_Maker, constant_product_swap, get_liquidity_adjustment
+from helper.helper import get_total_risk_adjustment
+from unit_tests.conftest import *
+
+
+@pytest.fixture
+def amm(DOT: Token, USD: Token) -> Automted_Market_Maker:
+    yield Automted_Market_Maker(DOT, USD, base_token_amount=1_000, quote_token_amount=10_000)
+
+
+@pytest.mark.parametrize("swap_type", ["exact_input", "exact_output"])
+@pytest.mark.parametrize("token", ["DOT", "USD"])
+def test_batch_matches_constant_product_reserves(amm: Automted_Market_Maker, swap_type: str, token: str, request):
+    amounts = np.linspace(1, 500, 50)
+    base_token_amounts, quote_token_amounts, slippages = amm.calculate_params_batch(request.getfixturevalue(token), amounts, swap_type)
+
+    # the reserve of the swapped token grows by an exact input and shrinks by an exact output,
+    # the other reserve keeps the product of the reserves of 1_000 DOT and 10_000 USD
+    change = amounts if swap_type == "exact_input" else -amounts
+    if token == "DOT":
+        expected_base, expected_quote = 1_000 + change, 1_000 * 10_000 / (1_000 + change)
+    else:
+        expected_base, expected_quote = 1_000 * 10_000 / (10_000 + change), 10_000 + change
+    np.testing.assert_allclose(base_token_amounts, expected_base)
+    np.testing.assert_allclose(quote_token_amounts, expected_quote)
+    np.testing.assert_allclose(slippages, (expected_quote / expected_base) / 10 - 1)
+    for i, amount in enumerate(amounts):
+        assert amm.calculate_params(request.getfixturevalue(token), amount, swap_type) == pytest.approx(
+            (base_token_amounts[i], quote_token_amounts[i], slippages[i])
+        )
+
+
+def test_exact_input_swap_of_base_token(amm: Automted_Market_Maker, DOT: Token):
+    # 100 DOT into a pool of 1_000 DOT and 10_000 USD
+    assert amm.calculate_params(DOT, 100, "exact_input") == pytest.approx((1_100, 9_090.909090909, -0.173553719))
+
+
+def test_exact_output_swap_of_base_token_keeps_invariant(amm: Automted_Market_Maker, DOT: Token):
+    amm.exact_output_swap(DOT, 100)
+
+    assert amm.base_token_amount == 900
+    assert amm.base_token_amount * amm.quote_token_amount == pytest.approx(1_000 * 10_000)
+
+
+def test_swaps_in_many_pools_at_once():
+    base_token_amounts = np.array([100.0, 1_000, 10_000])
+    _, _, slippages = constant_product_swap(base_token_amounts, 10 * base_token_amounts, 10, "base", "exact_input")
+
+    np.testing.assert_allclose(slippages, (base_token_amounts / (base_token_amounts + 10)) ** 2 - 1)
+
+
+def test_exact_output_swap_larger_than_reserves_raises(amm: Automted_Market_Maker, USD: Token):
+    with pytest.raises(Exception, match="Swap amount must be smaller"):
+        amm.calculate_params_batch(USD, [100, 10_000], "exact_output")
+
+
+def test_slippage_curve_interpolates_and_is_cached(amm: Automted_Market_Maker, DOT: Token):
+    curve = amm.get_slippage_curve(DOT, max_amount=500, n_points=10_000)
+
+    assert amm.get_slippage_curve(DOT, max_amount=500, n_points=10_000) is curve
+    np.testing.assert_allclose(curve.get_slippage([10, 123.4, 500]), amm.calculate_params_batch(DOT, [10, 123.4, 500], "exact_input")[2], atol=1e-6)
+
+    amm.exact_input_swap(DOT, 10)
+    assert amm.get_slippage_curve(DOT, max_amount=500, n_points=10_000) is not curve
+
+
+def test_liquidity_adjustment_from_supply_cap():
+    # selling 10% of the supply cap of 100 into a pool with 100 tokens
+    assert get_liquidity_adjustment(100, 100) == pytest.approx(1 - (100 / 110) ** 2)
+
+
+def test_total_risk_adjustment_derives_liquidity_adjustment():
+    config = {
+        "collateral": {
+            "polkadot": {
+                "dot": {"risk_adjustment": {"liquidity_adjustment": None, "depeg_adjustment": 0}, "supply_cap": 100, "pool_liquidity": 100},
+                "ksm": {"risk_adjustment": {"liquidity_adjustment": 0.05, "depeg_adjustment": 0}, "supply_cap": 100, "pool_liquidity": 100},
+            }
+        }
+    }
+
+    assert get_total_risk_adjustment("dot", "polkadot", config) == pytest.approx(1 / (100 / 110) ** 2)
+    assert get_total_risk_adjustment("ksm", "polkadot", config) == pytest.approx(1 / 0.95)
+
+    # selling 20% of the supply cap instead
+    config["analysis"] = {"liquidity_trade_share": 0.2}
+    assert get_total_risk_adjustment("dot", "polkadot", config) == pytest.approx(1 / (100 / 120) ** 2)
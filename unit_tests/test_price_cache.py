@@ -0,0 +1,86 @@
+import pytest
+import requests
+import pandas as pd
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+from data.price_cache import Price_Cache
+from unit_tests.conftest import *
+
+
+class Fake_Coingecko:
+    """Stands in for requests.get and returns daily prices for the requested number of days."""
+
+    def __init__(self):
+        self.requested_days = []
+
+    def __call__(self, url: str, **kwargs):
+        days = int(parse_qs(urlparse(url).query)["days"][0])
+        self.requested_days.append(days)
+        today = pd.Timestamp(datetime.today().date())
+        dates = pd.date_range(end=today, periods=days + 1, freq="D")
+        prices = [[int(date.timestamp() * 1000), float(date.dayofyear)] for date in dates]
+        response = requests.models.Response()
+        response._content = str({"prices": prices}).encode().replace(b"'", b'"')
+        return response
+
+
+@pytest.fixture
+def coingecko(monkeypatch) -> Fake_Coingecko:
+    fake = Fake_Coingecko()
+    monkeypatch.setattr("data.data_request.requests.get", fake)
+    yield fake
+
+
+def test_cold_cache_requests_full_period(coingecko: Fake_Coingecko, tmp_path, DOT: Token, USD: Token):
+    cache = Price_Cache(str(tmp_path))
+    pair = Token_Pair(DOT, USD)
+    pair.get_prices(start_date=(datetime.today() - timedelta(30)).strftime("%Y-%m-%d"), cache=cache)
+
+    assert coingecko.requested_days == [30]
+    assert len(pair.prices) == 31
+    assert cache.load("polkadot", "USD", "daily")[0] is not None
+
+
+def test_warm_cache_does_not_request_prices(coingecko: Fake_Coingecko, tmp_path, DOT: Token, USD: Token):
+    cache = Price_Cache(str(tmp_path))
+    start_date = (datetime.today() - timedelta(30)).strftime("%Y-%m-%d")
+    Token_Pair(DOT, USD).get_prices(start_date=start_date, cache=cache)
+
+    pair = Token_Pair(DOT, USD)
+    pair.get_prices(start_date=start_date, cache=cache)
+
+    assert coingecko.requested_days == [30]
+    assert len(pair.prices) == 31
+
+
+def test_stale_cache_only_requests_missing_days(coingecko: Fake_Coingecko, tmp_path, DOT: Token, USD: Token):
+    cache = Price_Cache(str(tmp_path))
+    Token_Pair(DOT, USD).get_prices(start_date=(datetime.today() - timedelta(30)).strftime("%Y-%m-%d"), cache=cache)
+    # drop the last three days from the cache
+    cached, _ = cache.load("polkadot", "USD", "daily")
+    cached.iloc[:-3].to_csv(cache._filename("polkadot", "USD", "daily"), index_label="Date")
+
+    pair = Token_Pair(DOT, USD)
+    pair.get_prices(start_date=(datetime.today() - timedelta(20)).strftime("%Y-%m-%d"), cache=cache)
+
+    assert coingecko.requested_days == [30, 4]
+    assert len(pair.prices) == 21
+    assert not pair.prices.index.duplicated().any()
+    assert pair.prices.index.is_monotonic_increasing
+
+
+def test_cache_is_used_offline(monkeypatch, coingecko: Fake_Coingecko, tmp_path, DOT: Token, USD: Token):
+    cache = Price_Cache(str(tmp_path))
+    start_date = (datetime.today() - timedelta(30)).strftime("%Y-%m-%d")
+    Token_Pair(DOT, USD).get_prices(start_date=start_date, cache=cache)
+    cached, _ = cache.load("polkadot", "USD", "daily")
+    cached.iloc[:-3].to_csv(cache._filename("polkadot", "USD", "daily"), index_label="Date")
+
+    def offline(url: str, **kwargs):
+        raise requests.exceptions.ConnectionError("offline")
+
+    monkeypatch.setattr("data.data_request.requests.get", offline)
+    pair = Token_Pair(DOT, USD)
+    pair.get_prices(start_date=start_date, cache=cache)
+
+    assert len(pair.prices) == 28
@@ -0,0 +1,55 @@
+import pytest
+import numpy as np
+import pandas as pd
+from data.price_matrix import Price_Matrix
+from data.data_request import Data_Request
+from unit_tests.conftest import *
+
+
+@pytest.fixture(scope="module")
+def price_matrix() -> Price_Matrix:
+    index = pd.date_range("2022-01-01", periods=5, freq="D", name="Date")
+    prices = pd.DataFrame(
+        {
+            "btc": [20_000.0, 21_000, 19_000, 18_000, 20_000],
+            "dot": [np.nan, 20.0, 19, 15, 10],
+            "usd": 1.0,
+        },
+        index=index,
+    )
+    yield Price_Matrix(prices)
+
+
+def test_pair_divides_usd_prices(price_matrix: Price_Matrix):
+    prices = price_matrix.pair("dot", "btc")
+
+    assert list(prices.columns) == ["Price"]
+    assert len(prices) == 4
+    np.testing.assert_allclose(prices["Price"], [20 / 21_000, 19 / 19_000, 15 / 18_000, 10 / 20_000])
+
+
+def test_pair_is_inverse_of_inverted_pair(price_matrix: Price_Matrix):
+    np.testing.assert_allclose(price_matrix.pair("btc", "dot")["Price"], 1 / price_matrix.pair("dot", "btc")["Price"])
+
+
+def test_quote_in_usd_is_identity(price_matrix: Price_Matrix):
+    pd.testing.assert_frame_equal(price_matrix.quote("usd"), price_matrix.prices)
+
+
+def test_from_assets_requests_each_asset_once_in_usd(monkeypatch):
+    requested = []
+
+    def batch_request(token_pairs, *args, **kwargs):
+        requested.extend((pair.base_token.name, pair.quote_token.ticker) for pair in token_pairs)
+        index = pd.to_datetime(["2022-01-01 00:00", "2022-01-02 00:00", "2022-01-02 13:37"])
+        return {
+            key: pd.DataFrame({"Price": [1.0, 2.0, 3.0]}, index=pd.Index(index, name="Date")) for key in requested
+        }
+
+    monkeypatch.setattr(Data_Request, "batch_request_historic_prices", batch_request)
+    price_matrix = Price_Matrix.from_assets({"btc": "bitcoin", "dot": "polkadot", "usd": "dollar"})
+
+    assert requested == [("bitcoin", "usd"), ("polkadot", "usd")]
+    assert sorted(price_matrix.tickers) == ["btc", "dot", "usd"]
+    # the intraday price replaces the daily price of the same day
+    assert price_matrix.pair("btc", "usd")["Price"].tolist() == [1.0, 3.0]
@@ -0,0 +1,79 @@
+import pytest
+import numpy as np
+from analysis.quantile_sketch import Quantile_Sketch, get_var_interval_ranks
+
+
+def sorted_var(values: np.ndarray, alpha: float) -> float:
+    return np.sort(values)[::-1][int(len(values) * alpha)]
+
+
+@pytest.mark.parametrize("chunk_size", [1_000, 3_333, 10_000])
+@pytest.mark.parametrize("alpha", [0.99, 0.999])
+def test_sketch_is_exact_in_the_tail(chunk_size: int, alpha: float):
+    values = np.random.default_rng(0).normal(size=10_000)
+    sketch = Quantile_Sketch.for_alpha(0.99, len(values))
+    for start in range(0, len(values), chunk_size):
+        sketch.add(values[start : start + chunk_size])
+
+    assert sketch.count == len(values)
+    assert len(sketch.tail) == sketch.capacity
+    assert sketch.get_var(alpha) == sorted_var(values, alpha)
+
+
+def test_merged_sketches_are_exact_in_the_tail():
+    values = np.random.default_rng(1).normal(size=10_000)
+    sketches = [Quantile_Sketch.for_alpha(0.99, len(values)) for _ in range(2)]
+    sketches[0].add(values[:4_000])
+    sketches[1].add(values[4_000:])
+
+    assert sketches[0].merge(sketches[1]).get_var(0.99) == sorted_var(values, 0.99)
+
+
+def test_sketch_rejects_alpha_outside_of_tail():
+    sketch = Quantile_Sketch.for_alpha(0.99, 1_000)
+    sketch.add(np.random.default_rng(2).normal(size=1_000))
+
+    with pytest.raises(Exception):
+        sketch.get_var(0.9)
+
+
+def test_var_interval_contains_var_and_shrinks_with_more_values():
+    values = np.random.default_rng(2).normal(size=100_000)
+    widths = []
+    for n_values in [10_000, 100_000]:
+        sketch = Quantile_Sketch.for_alpha(0.99, n_values, confidence=0.95)
+        sketch.add(values[:n_values])
+        lower, upper = sketch.get_var_interval(0.99)
+        assert lower <= sketch.get_var(0.99) <= upper
+        widths.append(upper - lower)
+
+    # the width shrinks with the square root of the number of values
+    assert np.isclose(widths[0] / widths[1], np.sqrt(10), rtol=0.3)
+
+
+def test_var_interval_covers_true_quantile():
+    rng = np.random.default_rng(3)
+    # the 1% quantile of the standard normal distribution
+    true_var = -2.3263478740408408
+    covered = []
+    for _ in range(200):
+        sketch = Quantile_Sketch.for_alpha(0.99, 5_000, confidence=0.95)
+        sketch.add(rng.normal(size=5_000))
+        lower, upper = sketch.get_var_interval(0.99, confidence=0.95)
+        covered.append(lower <= true_var <= upper)
+
+    assert 0.9 <= np.mean(covered) <= 0.99
+
+
+def test_var_interval_ranks_are_within_values():
+    assert get_var_interval_ranks(10, 0.99) == (0, 1)
+    lower, upper = get_var_interval_ranks(100_000, 0.99)
+    assert lower < 100_000 - 1 - 99_000 < upper
+
+
+def test_sketch_without_confidence_is_too_small_for_the_interval():
+    sketch = Quantile_Sketch.for_alpha(0.99, 10_000)
+    sketch.add(np.random.default_rng(4).normal(size=10_000))
+
+    with pytest.raises(Exception):
+        sketch.get_var_interval(0.99)
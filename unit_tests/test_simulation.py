@@ -0,0 +1,416 @@
+import pytest
+import numpy as np
+import QuantLib as ql
+from simulation.simulation import (
+    Simulation,
+    Path_Bank,
+    brownian_bridge,
+    standard_normal_increments,
+    merton_jump_diffusion_paths,
+    heston_paths,
+    block_bootstrap_paths,
+    correlated_geometric_brownian_motion_paths,
+    get_covariance_factor,
+    Multi_Asset_Simulation,
+)
+from simulation.simulation_cache import Simulation_Cache
+from data.price_matrix import Price_Matrix
+import simulation.simulation as simulation_module
+import pandas as pd
+from analysis.analysis import Analysis
+from unit_tests.conftest import *
+
+
+def test_numpy_backend_returns_paths_as_view(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(
+        steps=1, maturity=21, n_simulations=1_000, sigma=0.05, mu=0.001, initial_value=1, backend="numpy", seed=1
+    )
+
+    assert sim.path_array.shape == (22, 1_000)
+    assert np.shares_memory(sim.paths.to_numpy(), sim.path_array)
+    assert (sim.path_array[0] == 1).all()
+
+
+def test_numpy_backend_is_reproducible(DOT_USD: Token_Pair):
+    sims = []
+    for _ in range(2):
+        sim = Simulation(DOT_USD, strategy="GBM")
+        sim.simulate(steps=1, maturity=7, n_simulations=100, sigma=0.05, mu=0.001, initial_value=1, backend="numpy", seed=7)
+        sims.append(sim)
+
+    np.testing.assert_array_equal(sims[0].path_array, sims[1].path_array)
+
+
+@pytest.mark.parametrize("steps, maturity", [(1, 21), (24, 2)])
+def test_numpy_backend_matches_quantlib_distribution(DOT_USD: Token_Pair, steps: int, maturity: int):
+    n_simulations = 20_000
+    terminal_values = {}
+    for backend in ["quantlib", "numpy"]:
+        sim = Simulation(DOT_USD, strategy="GBM")
+        sim.simulate(
+            steps=steps,
+            maturity=maturity,
+            n_simulations=n_simulations,
+            sigma=0.05,
+            mu=0.002,
+            initial_value=1,
+            backend=backend,
+            seed=3,
+        )
+        terminal_values[backend] = sim.path_array[-1]
+
+    # the difference of the means and standard deviations must be within a few standard errors
+    standard_error = terminal_values["quantlib"].std() / np.sqrt(n_simulations)
+    assert abs(terminal_values["numpy"].mean() - terminal_values["quantlib"].mean()) < 5 * standard_error
+    assert np.isclose(terminal_values["numpy"].std(), terminal_values["quantlib"].std(), rtol=0.03)
+    assert np.isclose(
+        np.quantile(terminal_values["numpy"], 0.01), np.quantile(terminal_values["quantlib"], 0.01), rtol=0.03
+    )
+
+
+def test_numpy_backend_rejects_unsupported_strategy(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="black_process")
+    with pytest.raises(Exception):
+        sim.simulate(steps=1, maturity=7, n_simulations=10, sigma=0.05, mu=0.001, initial_value=1, backend="numpy")
+
+
+def test_brownian_bridge_matches_quantlib():
+    gaussians = np.random.default_rng(0).normal(size=(21, 3))
+    increments = brownian_bridge(gaussians)
+
+    for i in range(gaussians.shape[1]):
+        expected = ql.BrownianBridge(21).transform(list(gaussians[:, i]))
+        np.testing.assert_allclose(increments[:, i], expected)
+
+
+def test_antithetic_sampling_mirrors_paths():
+    increments = np.empty((7, 10))
+    standard_normal_increments(increments, np.random.default_rng(0), "antithetic")
+
+    np.testing.assert_array_equal(increments[:, :5], -increments[:, 5:])
+
+
+@pytest.mark.parametrize("sampling", ["antithetic", "sobol"])
+def test_sampling_is_standard_normal(sampling: str):
+    increments = np.empty((21, 2**14))
+    standard_normal_increments(increments, np.random.default_rng(0), sampling)
+
+    assert abs(increments.mean()) < 0.01
+    assert np.isclose(increments.std(), 1, rtol=0.01)
+    # the increments of a path must be independent, so the variance of their sum is the number of steps
+    assert np.isclose(increments.sum(axis=0).var(), 21, rtol=0.05)
+
+
+def test_quantlib_backend_rejects_variance_reduction(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    with pytest.raises(Exception):
+        sim.simulate(steps=1, maturity=7, n_simulations=10, sigma=0.05, mu=0.001, initial_value=1, sampling="sobol")
+
+
+def test_path_bank_matches_simulation_with_same_increments(DOT_USD: Token_Pair):
+    path_bank = Path_Bank(21, 1_000, seed=3)
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(steps=1, maturity=21, n_simulations=1_000, sigma=0.05, mu=0, initial_value=1, backend="numpy", seed=3)
+
+    np.testing.assert_allclose(path_bank.paths(sigma=0.05), sim.path_array)
+
+
+def test_path_bank_rescales_common_random_numbers(DOT_USD: Token_Pair):
+    path_bank = Path_Bank(21, 1_000, seed=0)
+    sims = []
+    for sigma in [0.01, 0.05]:
+        sim = Simulation(DOT_USD, strategy="GBM")
+        sim.simulate(
+            steps=1, maturity=21, n_simulations=500, sigma=sigma, mu=0, initial_value=1, backend="numpy", path_bank=path_bank
+        )
+        sims.append(sim)
+
+    # with common random numbers, the paths only differ by their scale
+    np.testing.assert_allclose(sims[0].path_array[1] - 1, (sims[1].path_array[1] - 1) / 5)
+
+
+def test_path_bank_can_be_loaded_from_memory_map(DOT_USD: Token_Pair, tmp_path):
+    filename = str(tmp_path / "path_bank.npy")
+    path_bank = Path_Bank(21, 1_000, seed=0, filename=filename)
+    loaded_path_bank = Path_Bank.load(filename)
+
+    assert isinstance(loaded_path_bank.increments, np.memmap)
+    np.testing.assert_array_equal(loaded_path_bank.paths(sigma=0.05), path_bank.paths(sigma=0.05))
+
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate_streaming(
+        steps=1, maturity=21, at_steps=[21], alpha=0.99, n_simulations=1_000, chunk_size=300,
+        sigma=0.05, mu=0, initial_value=1, path_bank=loaded_path_bank,
+    )
+    assert sim.drawdown_sketches[21].count == 1_000
+
+
+def test_path_bank_rejects_simulations_that_do_not_fit(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="GBM")
+    with pytest.raises(Exception):
+        sim.simulate(steps=1, maturity=14, n_simulations=100, sigma=0.05, mu=0, initial_value=1, backend="numpy", path_bank=Path_Bank(21, 100))
+    with pytest.raises(Exception):
+        sim.simulate(steps=1, maturity=21, n_simulations=200, sigma=0.05, mu=0, initial_value=1, backend="numpy", path_bank=Path_Bank(21, 100))
+
+
+def test_merton_jump_diffusion_matches_moments():
+    mu, sigma, maturity, jump_intensity, mean_log_jump, jump_volatility = 0.001, 0.03, 21, 0.2, -0.05, 0.08
+    paths = merton_jump_diffusion_paths(
+        1, mu, sigma, maturity, 21, 200_000, jump_intensity, mean_log_jump, jump_volatility, np.random.default_rng(0)
+    )
+    log_returns = np.log(paths[-1])
+
+    # the drift is compensated for the jumps and the variance of the log returns is the sum of the diffusion and the jumps
+    assert np.isclose(paths[-1].mean(), np.exp(mu * maturity), rtol=0.005)
+    assert np.isclose(log_returns.var(), (sigma**2 + jump_intensity * (mean_log_jump**2 + jump_volatility**2)) * maturity, rtol=0.02)
+    # the jumps make the tails fatter than those of a normal distribution
+    standardized = (log_returns - log_returns.mean()) / log_returns.std()
+    assert (standardized**4).mean() > 3.2
+
+
+def test_merton_jump_diffusion_without_jumps_is_lognormal():
+    paths = merton_jump_diffusion_paths(2, 0, 0.05, 21, 21, 100_000, 0, 0, 0, np.random.default_rng(0))
+
+    assert paths.shape == (22, 100_000)
+    assert (paths[0] == 2).all()
+    assert np.isclose(np.log(paths[-1] / 2).std(), 0.05 * np.sqrt(21), rtol=0.01)
+
+
+def test_heston_with_constant_variance_is_lognormal():
+    variance = 0.05**2
+    paths = heston_paths(1, 0, 21, 21, 100_000, variance, 1.0, variance, 0.5, 0, np.random.default_rng(0))
+
+    assert np.isclose(np.log(paths[-1]).std(), 0.05 * np.sqrt(21), rtol=0.01)
+
+
+def test_heston_full_truncation_keeps_paths_finite():
+    # a large volatility of the variance drives the variance below 0 on many steps
+    paths = heston_paths(1, 0, 21, 21, 10_000, 0.0025, 0.1, 0.0025, -0.7, 0.2, np.random.default_rng(0))
+
+    assert np.isfinite(paths).all()
+    assert (paths > 0).all()
+
+
+def test_heston_numpy_backend_matches_quantlib_distribution(DOT_USD: Token_Pair):
+    n_simulations = 10_000
+    process_params = {"v0": 0.0025, "theta": 0.0025, "kappa": 0.8, "rho": -0.5, "vol_of_vol": 0.05}
+    terminal_values = {}
+    for backend, mu in [("quantlib", None), ("numpy", 0.04)]:
+        sim = Simulation(DOT_USD, strategy="heston_process")
+        # the quantlib process drifts with the risk free rate minus the dividend yield, 0.05 - 0.01 by default
+        sim.simulate(
+            steps=1, maturity=7, n_simulations=n_simulations, mu=mu, initial_value=1, backend=backend, seed=3,
+            process_params=process_params,
+        )
+        terminal_values[backend] = sim.path_array[-1]
+
+    standard_error = terminal_values["quantlib"].std() / np.sqrt(n_simulations)
+    assert abs(terminal_values["numpy"].mean() - terminal_values["quantlib"].mean()) < 5 * standard_error
+    assert np.isclose(terminal_values["numpy"].std(), terminal_values["quantlib"].std(), rtol=0.05)
+
+
+def test_process_params_default_to_fixed_values_and_can_be_set(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="merton_jump_diffusion")
+    sim.set_params(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1)
+    assert sim._params["process"]["jump_intensity"] == 1.0
+    assert sim._params["process"]["jump_volatility"] == pytest.approx(0.025)
+
+    # parameters of the heston process are ignored by the jump diffusion
+    sim.set_params(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1, process_params={"jump_intensity": 0.25, "kappa": 2})
+    assert sim._params["process"]["jump_volatility"] == pytest.approx(0.05)
+    assert "kappa" not in sim._params["process"]
+
+    with pytest.raises(Exception):
+        sim.set_params(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1, process_params={"jump_size": 0.1})
+
+
+@pytest.mark.parametrize("strategy", ["merton_jump_diffusion", "heston_process"])
+def test_fat_tailed_strategies_can_be_streamed_from_path_bank(DOT_USD: Token_Pair, strategy: str):
+    parameters = dict(steps=1, maturity=21, sigma=0.05, mu=0, initial_value=1, process_params={"jump_intensity": 0.1})
+    path_bank = Path_Bank(21, 2_000, seed=0)
+    sim = Simulation(DOT_USD, strategy=strategy)
+    sim.simulate(n_simulations=2_000, backend="numpy", seed=1, path_bank=path_bank, **parameters)
+    streamed_sim = Simulation(DOT_USD, strategy=strategy)
+    streamed_sim.simulate_streaming(
+        at_steps=[21], alpha=0.9, n_simulations=2_000, chunk_size=2_000, seed=1, path_bank=path_bank, **parameters
+    )
+
+    # a single chunk draws the same random numbers as the simulation in memory
+    assert streamed_sim.drawdown_sketches[21].count == 2_000
+    assert Analysis(streamed_sim).get_simulated_var(0.9, at_step=21) == Analysis(sim).get_simulated_var(0.9, at_step=21)
+
+
+@pytest.mark.parametrize("block_length, stride", [(1, 1), (5, 1), (3, 24)])
+def test_block_bootstrap_resamples_consecutive_returns(block_length: int, stride: int):
+    # distinct returns, so that the index of each return can be recovered from the paths
+    returns = np.arange(200) / 10_000
+    paths = block_bootstrap_paths(returns, 1, 21, 1_000, block_length, np.random.default_rng(0), stride=stride)
+    indices = np.rint((paths[1:] / paths[:-1] - 1) * 10_000).astype(int)
+
+    assert paths.shape == (22, 1_000)
+    assert (paths[0] == 1).all()
+    for start in range(0, 21 - 1, block_length):
+        block = indices[start : start + block_length]
+        np.testing.assert_array_equal(np.diff(block, axis=0), stride)
+    # every return can start a block
+    assert indices[0].min() == 0 and indices[0].max() == 200 - 1 - (block_length - 1) * stride
+
+
+def test_bootstrap_returns_are_shifted_to_mu(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="bootstrap")
+    sim.simulate(steps=1, maturity=21, n_simulations=20_000, mu=0.001, initial_value=1, backend="numpy", seed=0)
+    step_returns = sim.path_array[1:] / sim.path_array[:-1] - 1
+
+    standard_error = step_returns.std() / np.sqrt(step_returns.size)
+    assert abs(step_returns.mean() - 0.001) < 5 * standard_error
+    # the returns are resampled, so their distribution is the one of the historical returns
+    historical_returns = DOT_USD.returns.iloc[:, 0]
+    assert np.isclose(step_returns.std(), historical_returns.std(ddof=0), rtol=0.02)
+
+
+def test_bootstrap_volatility_rescaling_scales_to_latest_volatility(DOT_USD: Token_Pair):
+    pair = Token_Pair(DOT_USD.base_token, DOT_USD.quote_token)
+    # the volatility of the returns rises from 1% to 4% in the middle of the sample
+    volatility = np.where(np.arange(366) < 183, 0.01, 0.04)
+    pair.prices = pd.DataFrame(
+        {"Price": 10 * np.cumprod(1 + volatility * np.random.default_rng(1).standard_normal(366))},
+        index=pd.date_range("2022-01-01", periods=366, freq="D"),
+    )
+    pair.calculate_returns()
+
+    std = {}
+    for volatility_rescaling in [False, True]:
+        sim = Simulation(pair, strategy="bootstrap")
+        sim.simulate(
+            steps=1, maturity=7, n_simulations=20_000, mu=0, initial_value=1, backend="numpy", seed=0,
+            process_params={"block_length": 1, "volatility_rescaling": volatility_rescaling},
+        )
+        std[volatility_rescaling] = (sim.path_array[1] - 1).std()
+
+    assert np.isclose(std[False], np.sqrt((0.01**2 + 0.04**2) / 2), rtol=0.15)
+    assert np.isclose(std[True], 0.04, rtol=0.25)
+
+
+def test_bootstrap_rejects_random_numbers_it_does_not_use(DOT_USD: Token_Pair):
+    sim = Simulation(DOT_USD, strategy="bootstrap")
+    parameters = dict(steps=1, maturity=21, n_simulations=100, mu=0, initial_value=1, backend="numpy")
+    with pytest.raises(Exception):
+        sim.simulate(sampling="antithetic", **parameters)
+    with pytest.raises(Exception):
+        sim.simulate(path_bank=Path_Bank(21, 100), **parameters)
+    with pytest.raises(Exception):
+        sim.simulate(**{**parameters, "steps": 24})
+
+
+def test_bootstrap_can_be_streamed(DOT_USD: Token_Pair):
+    parameters = dict(steps=1, maturity=21, mu=0, initial_value=1, seed=4)
+    sim = Simulation(DOT_USD, strategy="bootstrap")
+    sim.simulate(n_simulations=3_000, backend="numpy", **parameters)
+    streamed_sim = Simulation(DOT_USD, strategy="bootstrap")
+    streamed_sim.simulate_streaming(at_steps=[7, 21], alpha=0.9, n_simulations=3_000, chunk_size=3_000, **parameters)
+
+    for at_step in [7, 21]:
+        assert Analysis(streamed_sim).get_simulated_var(0.9, at_step=at_step) == Analysis(sim).get_simulated_var(0.9, at_step=at_step)
+
+
+def test_correlated_paths_have_the_covariance_of_the_returns():
+    covariance = np.array([[0.05**2, 0.8 * 0.05 * 0.03, 0], [0.8 * 0.05 * 0.03, 0.03**2, 0], [0, 0, 0.01**2]])
+    paths = correlated_geometric_brownian_motion_paths([1, 2, 3], [0, 0.001, 0], covariance, 21, 21, 100_000, np.random.default_rng(0))
+    returns = (paths[1:] / paths[:-1] - 1).reshape(-1, 3)
+
+    assert paths.shape == (22, 100_000, 3)
+    np.testing.assert_array_equal(paths[0], np.broadcast_to([1, 2, 3], (100_000, 3)))
+    np.testing.assert_allclose(np.cov(returns.T), covariance, atol=2e-6)
+    np.testing.assert_allclose(returns.mean(axis=0), [0, 0.001, 0], atol=2e-4)
+
+
+@pytest.mark.parametrize("sampling", ["pseudo", "antithetic", "sobol"])
+@pytest.mark.parametrize("n_assets", [2, 3])
+def test_correlated_paths_of_independent_assets_are_uncorrelated(sampling: str, n_assets: int):
+    covariance = np.eye(n_assets) * 0.05**2
+    paths = correlated_geometric_brownian_motion_paths(
+        np.ones(n_assets), 0, covariance, 21, 21, 20_000, np.random.default_rng(0), sampling
+    )
+    returns = (paths[1:] / paths[:-1] - 1).reshape(-1, n_assets)
+    terminal_returns = paths[-1] - 1
+
+    for values in [returns, terminal_returns]:
+        correlation = np.corrcoef(values.T)
+        np.testing.assert_allclose(correlation[np.triu_indices(n_assets, 1)], 0, atol=0.03)
+    np.testing.assert_allclose(returns.std(axis=0), 0.05, rtol=0.02)
+
+
+@pytest.mark.parametrize("sampling", ["pseudo", "antithetic", "sobol"])
+def test_correlated_paths_have_the_correlation_for_every_sampling(sampling: str):
+    correlation = np.array([[1, 0.6, -0.3], [0.6, 1, 0], [-0.3, 0, 1]])
+    paths = correlated_geometric_brownian_motion_paths(
+        np.ones(3), 0, correlation * 0.04**2, 21, 21, 20_000, np.random.default_rng(1), sampling
+    )
+
+    np.testing.assert_allclose(np.corrcoef((paths[-1] - 1).T), correlation, atol=0.03)
+
+
+def test_covariance_factor_of_singular_and_indefinite_matrices():
+    # an asset and its proxy are perfectly correlated
+    singular = np.array([[1.0, 1, 0.5], [1, 1, 0.5], [0.5, 0.5, 1]])
+    factor = get_covariance_factor(singular)
+    np.testing.assert_allclose(factor @ factor.T, singular, atol=1e-12)
+
+    # pairwise correlations that no joint distribution can have
+    indefinite = np.array([[1.0, 0.9, -0.9], [0.9, 1, 0.9], [-0.9, 0.9, 1]])
+    factor = get_covariance_factor(indefinite)
+    eigenvalues = np.linalg.eigvalsh(factor @ factor.T)
+    assert eigenvalues.min() > -1e-12
+    assert np.all(np.isfinite(factor))
+
+
+@pytest.fixture(scope="module")
+def price_matrix() -> Price_Matrix:
+    rng = np.random.default_rng(7)
+    index = pd.date_range("2022-01-01", periods=500, freq="D", name="Date")
+    market, idiosyncratic = rng.normal(0, 0.04, (2, len(index)))
+    dot = 10 * np.cumprod(1 + market + idiosyncratic * 0.5)
+    btc = 20_000 * np.cumprod(1 + 0.5 * market + 0.02 * rng.normal(size=len(index)))
+    # vdot only has the last 100 days
+    vdot = np.where(np.arange(len(index)) >= 400, dot * 1.2, np.nan)
+    yield Price_Matrix(pd.DataFrame({"dot": dot, "btc": btc, "vdot": vdot, "usd": 1.0}, index=index))
+
+
+def test_multi_asset_simulation_estimates_covariance_of_pairs(price_matrix: Price_Matrix):
+    sim = Multi_Asset_Simulation.from_price_matrix(price_matrix, ["dot", "btc", "vdot"], "usd")
+    returns = price_matrix.quote("usd").pct_change(fill_method=None)
+
+    assert sim.tickers == ["dot", "btc", "vdot"]
+    assert sim.covariance.loc["dot", "btc"] == pytest.approx(returns["dot"].cov(returns["btc"]))
+    assert sim.covariance.loc["vdot", "vdot"] == pytest.approx(returns["vdot"].var())
+    # the proxy replaces the prices of vdot
+    proxied_sim = Multi_Asset_Simulation.from_price_matrix(price_matrix, ["dot", "vdot"], "usd", proxies={"vdot": "dot"})
+    assert proxied_sim.correlation.loc["dot", "vdot"] == pytest.approx(1)
+
+
+def test_multi_asset_simulation_draws_correlated_paths(price_matrix: Price_Matrix):
+    sim = Multi_Asset_Simulation.from_price_matrix(price_matrix, ["dot", "btc", "vdot"], "btc", proxies={"vdot": "dot"})
+    sim.simulate(steps=1, maturity=21, n_simulations=50_000, seed=1)
+    returns = (sim.path_array[1:] / sim.path_array[:-1] - 1).reshape(-1, 3)
+
+    assert sim.path_array.shape == (22, 50_000, 3)
+    # btc is the quote, so its paths are constant, and vdot moves like its proxy
+    assert (sim.path_array[:, :, 1] == 1).all()
+    np.testing.assert_allclose(sim.path_array[:, :, 0], sim.path_array[:, :, 2])
+    assert np.sqrt(returns[:, 0].var()) == pytest.approx(np.sqrt(sim.covariance.loc["dot", "dot"]), rel=0.01)
+
+
+def test_multi_asset_simulation_is_reproducible_and_cached(price_matrix: Price_Matrix, tmp_path, monkeypatch):
+    cache = Simulation_Cache(str(tmp_path))
+    sim = Multi_Asset_Simulation.from_price_matrix(price_matrix, ["dot", "btc"], "usd")
+    sim.simulate(steps=1, maturity=7, n_simulations=1_000, seed=np.random.SeedSequence(2), cache=cache)
+
+    monkeypatch.setattr(simulation_module, "correlated_geometric_brownian_motion_paths", None)
+    cached_sim = Multi_Asset_Simulation.from_price_matrix(price_matrix, ["dot", "btc"], "usd")
+    cached_sim.simulate(steps=1, maturity=7, n_simulations=1_000, seed=np.random.SeedSequence(2), cache=cache)
+    np.testing.assert_array_equal(cached_sim.path_array, sim.path_array)
+
+    # a stressed covariance is a different result
+    with pytest.raises(Exception):
+        cached_sim.simulate(steps=1, maturity=7, n_simulations=1_000, seed=np.random.SeedSequence(2), cache=cache, covariance=sim.covariance * 2)
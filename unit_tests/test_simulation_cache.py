@@ -0,0 +1,99 @@
+import os
+import time
+import pytest
+import numpy as np
+from simulation.simulation import Simulation, Path_Bank
+from simulation.simulation_cache import Simulation_Cache
+from analysis.analysis import Analysis
+from unit_tests.conftest import *
+
+
+def test_cache_returns_stored_arrays(tmp_path):
+    cache = Simulation_Cache(str(tmp_path))
+    key = Simulation_Cache.get_key({"sigma": 0.05, "seed": 1})
+    cache.store(key, {"paths": np.arange(6.0).reshape(2, 3)})
+
+    np.testing.assert_array_equal(cache.load(key)["paths"], np.arange(6.0).reshape(2, 3))
+    assert cache.load(Simulation_Cache.get_key({"sigma": 0.05, "seed": 2})) is None
+
+
+def test_cache_evicts_least_recently_used_results(tmp_path):
+    values = np.zeros(10_000)
+    cache = Simulation_Cache(str(tmp_path))
+    for i, key in enumerate(["a", "b", "c"]):
+        cache.store(key, {"values": values})
+        # the results were last used one after the other
+        past = time.time() - 100 + i
+        os.utime(os.path.join(str(tmp_path), f"{key}.npz"), (past, past))
+    size = os.path.getsize(os.path.join(str(tmp_path), "a.npz"))
+
+    cache = Simulation_Cache(str(tmp_path), max_size=3 * size)
+    cache.load("a")
+    cache.store("d", {"values": values})
+
+    # b is the least recently used result, because a has been loaded
+    assert cache.load("b") is None
+    assert all(cache.load(key) is not None for key in ["a", "c", "d"])
+
+
+def test_simulation_is_loaded_from_cache(DOT_USD: Token_Pair, tmp_path, monkeypatch):
+    cache = Simulation_Cache(str(tmp_path))
+    parameters = dict(steps=1, maturity=21, n_simulations=1_000, sigma=0.05, mu=0, initial_value=1, backend="numpy", seed=3)
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(cache=cache, **parameters)
+
+    def fail(*args, **kwargs):
+        raise Exception("The paths should have been loaded from the cache.")
+
+    cached_sim = Simulation(DOT_USD, strategy="GBM")
+    monkeypatch.setattr(cached_sim, "_numpy_paths", fail)
+    cached_sim.simulate(cache=cache, **parameters)
+    np.testing.assert_array_equal(cached_sim.path_array, sim.path_array)
+
+    # any other parameter is a different result
+    with pytest.raises(Exception):
+        cached_sim.simulate(cache=cache, **{**parameters, "sigma": 0.051})
+    with pytest.raises(Exception):
+        cached_sim.simulate(cache=cache, **{**parameters, "seed": np.random.SeedSequence(3)})
+
+
+def test_simulation_without_seed_is_not_cached(DOT_USD: Token_Pair, tmp_path):
+    cache = Simulation_Cache(str(tmp_path))
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate(steps=1, maturity=21, n_simulations=100, sigma=0.05, mu=0, initial_value=1, backend="numpy", cache=cache)
+
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_streamed_simulation_is_loaded_from_cache(DOT_USD: Token_Pair, tmp_path, monkeypatch):
+    cache = Simulation_Cache(str(tmp_path))
+    path_bank = Path_Bank(21, 5_000, seed=0)
+    parameters = dict(
+        steps=1, maturity=21, at_steps=[7, 21], alpha=0.99, n_simulations=5_000, chunk_size=1_000,
+        sigma=0.05, mu=0, initial_value=1, seed=np.random.SeedSequence(5), path_bank=path_bank, tolerance=0.02,
+    )
+    sim = Simulation(DOT_USD, strategy="GBM")
+    sim.simulate_streaming(cache=cache, **parameters)
+
+    cached_sim = Simulation(DOT_USD, strategy="GBM")
+    monkeypatch.setattr(cached_sim, "_numpy_paths", None)
+    cached_sim.simulate_streaming(cache=cache, **parameters)
+
+    for at_step in [7, 21]:
+        assert cached_sim.drawdown_sketches[at_step].count == sim.drawdown_sketches[at_step].count
+        np.testing.assert_array_equal(cached_sim.drawdown_sketches[at_step].tail, sim.drawdown_sketches[at_step].tail)
+    assert Analysis(cached_sim).get_simulated_var_interval(0.99, [7, 21]) == Analysis(sim).get_simulated_var_interval(0.99, [7, 21])
+
+
+def test_bootstrap_is_cached_by_its_returns(DOT_USD: Token_Pair, tmp_path):
+    cache = Simulation_Cache(str(tmp_path))
+    parameters = dict(steps=1, maturity=21, n_simulations=100, mu=0, initial_value=1, backend="numpy", seed=1, cache=cache)
+    Simulation(DOT_USD, strategy="bootstrap").simulate(**parameters)
+
+    pair = Token_Pair(DOT_USD.base_token, DOT_USD.quote_token)
+    pair.prices = DOT_USD.prices * 1.0
+    pair.prices.iloc[-1] *= 1.1
+    pair.calculate_returns()
+    Simulation(pair, strategy="bootstrap").simulate(**parameters)
+
+    assert len(os.listdir(str(tmp_path))) == 2